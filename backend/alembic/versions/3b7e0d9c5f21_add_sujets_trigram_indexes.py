@@ -0,0 +1,30 @@
+"""add sujets trigram indexes
+
+Revision ID: 3b7e0d9c5f21
+Revises: 9d4f6c2a71e8
+Create Date: 2026-10-18 15:04:52.771903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e0d9c5f21'
+down_revision: Union[str, Sequence[str], None] = '9d4f6c2a71e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX ix_sujets_titre_trgm ON sujets USING GIN (titre gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_sujets_keywords_trgm ON sujets USING GIN (keywords gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_sujets_keywords_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_sujets_titre_trgm")
@@ -0,0 +1,46 @@
+"""add user_recommendations
+
+Revision ID: 5e2b8f13a6d4
+Revises: c41e7a9d2b10
+Create Date: 2026-10-18 11:02:37.540219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8f13a6d4'
+down_revision: Union[str, Sequence[str], None] = 'c41e7a9d2b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_recommendations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('sujet_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('raisons', sa.JSON(), nullable=True),
+        sa.Column('profile_hash', sa.String(length=64), nullable=False),
+        sa.Column('catalog_position', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['sujet_id'], ['sujets.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_recommendations_id'), 'user_recommendations', ['id'], unique=False)
+    op.create_index('ix_user_recommendations_user_rank', 'user_recommendations', ['user_id', 'rank'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_recommendations_user_rank', table_name='user_recommendations')
+    op.drop_index(op.f('ix_user_recommendations_id'), table_name='user_recommendations')
+    op.drop_table('user_recommendations')
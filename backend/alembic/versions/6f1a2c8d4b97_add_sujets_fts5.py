@@ -0,0 +1,65 @@
+"""add sujets fts5 (SQLite)
+
+Revision ID: 6f1a2c8d4b97
+Revises: 3b7e0d9c5f21
+Create Date: 2026-10-18 21:40:17.503126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f1a2c8d4b97'
+down_revision: Union[str, Sequence[str], None] = '3b7e0d9c5f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Table FTS5 du moteur "sqlite_fts" (app/search.py), tenue à jour par triggers.
+# La mise à jour ne se déclenche que sur les colonnes indexées: les compteurs
+# (vue_count, like_count) ne réécrivent pas la ligne FTS.
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS sujets_fts USING fts5(
+        titre, keywords, "problématique", description,
+        content='sujets', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    "DROP TRIGGER IF EXISTS sujets_fts_ai",
+    """CREATE TRIGGER sujets_fts_ai AFTER INSERT ON sujets BEGIN
+        INSERT INTO sujets_fts(rowid, titre, keywords, "problématique", description)
+        VALUES (new.id, new.titre, new.keywords, new."problématique", new.description);
+    END""",
+    "DROP TRIGGER IF EXISTS sujets_fts_ad",
+    """CREATE TRIGGER sujets_fts_ad AFTER DELETE ON sujets BEGIN
+        INSERT INTO sujets_fts(sujets_fts, rowid, titre, keywords, "problématique", description)
+        VALUES ('delete', old.id, old.titre, old.keywords, old."problématique", old.description);
+    END""",
+    # Remplace le trigger AFTER UPDATE sur toutes les colonnes des versions précédentes
+    "DROP TRIGGER IF EXISTS sujets_fts_au",
+    """CREATE TRIGGER sujets_fts_au
+        AFTER UPDATE OF titre, keywords, "problématique", description, is_active ON sujets BEGIN
+        INSERT INTO sujets_fts(sujets_fts, rowid, titre, keywords, "problématique", description)
+        VALUES ('delete', old.id, old.titre, old.keywords, old."problématique", old.description);
+        INSERT INTO sujets_fts(rowid, titre, keywords, "problématique", description)
+        VALUES (new.id, new.titre, new.keywords, new."problématique", new.description);
+    END""",
+    # Indexation du catalog existant
+    "INSERT INTO sujets_fts(sujets_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in SCHEMA:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("sujets_fts_au", "sujets_fts_ad", "sujets_fts_ai"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS sujets_fts")
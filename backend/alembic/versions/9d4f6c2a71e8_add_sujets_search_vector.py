@@ -0,0 +1,50 @@
+"""add sujets search_vector
+
+Revision ID: 9d4f6c2a71e8
+Revises: 5e2b8f13a6d4
+Create Date: 2026-10-18 14:21:09.318472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f6c2a71e8'
+down_revision: Union[str, Sequence[str], None] = '5e2b8f13a6d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'french_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION french_unaccent (COPY = french);
+                ALTER TEXT SEARCH CONFIGURATION french_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+            END IF;
+        END
+        $$
+    """)
+    op.execute("""
+        ALTER TABLE sujets ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('french_unaccent', coalesce(titre, '')), 'A') ||
+            setweight(to_tsvector('french_unaccent', coalesce(keywords, '')), 'B') ||
+            setweight(to_tsvector('french_unaccent',
+                coalesce("problématique", '') || ' ' || coalesce(description, '')), 'C')
+        ) STORED
+    """)
+    op.execute("CREATE INDEX ix_sujets_search_vector ON sujets USING GIN (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_sujets_search_vector")
+    op.execute("ALTER TABLE sujets DROP COLUMN IF EXISTS search_vector")
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS french_unaccent")
@@ -0,0 +1,39 @@
+"""add sujet_changes outbox
+
+Revision ID: c41e7a9d2b10
+Revises: 8a73693c7b51
+Create Date: 2026-10-18 09:12:04.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e7a9d2b10'
+down_revision: Union[str, Sequence[str], None] = '8a73693c7b51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'sujet_changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sujet_id', sa.Integer(), nullable=False),
+        sa.Column('operation', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sujet_changes_id'), 'sujet_changes', ['id'], unique=False)
+    op.create_index(op.f('ix_sujet_changes_sujet_id'), 'sujet_changes', ['sujet_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sujet_changes_sujet_id'), table_name='sujet_changes')
+    op.drop_index(op.f('ix_sujet_changes_id'), table_name='sujet_changes')
+    op.drop_table('sujet_changes')
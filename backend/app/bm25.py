@@ -0,0 +1,287 @@
+# app/bm25.py
+"""
+Moteur de recherche BM25 en mémoire, pour les déploiements sans PostgreSQL
+(SQLite en local, hors ligne).
+
+- analyse française: minuscules, accents retirés, mots vides, racinisation légère
+  ("réseaux" -> "reseau", "données" -> "donne")
+- listes de postings en tableaux compacts (array): numéros de documents et
+  fréquences pondérées par champ (titre > keywords > problématique/description)
+- mises à jour incrémentales via catalog_events: l'ancienne version d'un sujet est
+  marquée supprimée, la nouvelle ajoutée en fin de tableau; compactage quand les
+  documents supprimés deviennent nombreux
+"""
+import math
+import re
+import threading
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+from app.keyword_index import normalize_keyword
+
+try:
+    import snowballstemmer
+    _snowball = snowballstemmer.stemmer("french")
+except ImportError:
+    _snowball = None
+
+K1 = 1.2
+B = 0.75
+# Scores arrondis: ils reviennent tels quels dans les curseurs de pagination
+SCORE_DECIMALS = 6
+FIELD_WEIGHTS = (
+    ("titre", 3.0),
+    ("keywords", 2.0),
+    ("problématique", 1.0),
+    ("description", 1.0),
+)
+# Compactage quand plus d'un quart des documents sont supprimés
+COMPACT_RATIO = 0.25
+COMPACT_MIN_DEAD = 1000
+
+STOPWORDS = frozenset("""
+a au aux avec ce ces dans de des du elle en et eux il je la le les leur lui ma mais me meme mes moi
+mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une
+vos votre vous c d j l m n s t y ete est sont etre cas cadre vers via entre sans sous chez
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+# ======================
+# ANALYSE DU TEXTE
+# ======================
+
+@lru_cache(maxsize=65536)
+def light_stem(token: str) -> str:
+    """
+    Racinisation française légère (pluriels, féminins, infinitifs en -er), sur un
+    token déjà sans accents. Utilise snowballstemmer s'il est installé.
+    """
+    if _snowball is not None:
+        return _snowball.stemWord(token)
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith("eaux"):
+        token = token[:-1]
+    elif token.endswith("aux") and len(token) > 5:
+        token = token[:-3] + "al"
+    elif token[-1] in "sx" and not token.endswith("ss"):
+        token = token[:-1]
+    if token.endswith("er") and len(token) > 5:
+        token = token[:-1]
+    if token.endswith("e") and len(token) > 4:
+        token = token[:-1]
+    if token.endswith("e") and len(token) > 4:
+        token = token[:-1]
+    return token
+
+
+def analyze(text: Optional[str]) -> List[str]:
+    """Termes indexés d'un texte (ordre conservé, doublons compris)"""
+    if not text:
+        return []
+    return [
+        light_stem(token) for token in _TOKEN.findall(normalize_keyword(text))
+        if token not in STOPWORDS
+    ]
+
+
+# ======================
+# INDEX
+# ======================
+
+class BM25Index:
+    """Index inversé des sujets actifs, classement BM25"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.is_built = False
+
+    def _reset(self) -> None:
+        self._doc_ids = array("q")        # n° de document -> sujet_id
+        self._lengths = array("f")        # longueur pondérée de chaque document
+        self._alive = bytearray()         # 1 si le document est la version courante du sujet
+        self._positions: Dict[int, int] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._total_length = 0.0
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def build(self, rows: Iterable[Dict]) -> None:
+        """Reconstruit l'index à partir de lignes (id, titre, keywords, problématique, description)"""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._add(dict(row._mapping) if hasattr(row, "_mapping") else row)
+            self.is_built = True
+
+    # Abonnement aux changements du catalog (catalog_events)
+    def upsert_sujet(self, row: Dict) -> None:
+        if self.is_built:
+            with self._lock:
+                self._remove(row["id"])
+                self._add(row)
+                self._maybe_compact()
+
+    def remove_sujet(self, sujet_id: int) -> None:
+        if self.is_built:
+            with self._lock:
+                self._remove(sujet_id)
+                self._maybe_compact()
+
+    def _add(self, row: Dict) -> None:
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS:
+            for term in analyze(row.get(field)):
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+                length += weight
+        if not frequencies:
+            return
+
+        doc = len(self._doc_ids)
+        self._doc_ids.append(row["id"])
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._positions[row["id"]] = doc
+        self._total_length += length
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("f"))
+            postings[0].append(doc)
+            postings[1].append(frequency)
+
+    def _remove(self, sujet_id: int) -> None:
+        doc = self._positions.pop(sujet_id, None)
+        if doc is None:
+            return
+        self._alive[doc] = 0
+        self._total_length -= self._lengths[doc]
+        self._dead += 1
+
+    def _maybe_compact(self) -> None:
+        """Retire les documents supprimés des tableaux et renumérote"""
+        if self._dead < COMPACT_MIN_DEAD or self._dead < COMPACT_RATIO * len(self._doc_ids):
+            return
+        renumber = array("i", [-1]) * len(self._doc_ids)
+        doc_ids, lengths = array("q"), array("f")
+        for doc, alive in enumerate(self._alive):
+            if alive:
+                renumber[doc] = len(doc_ids)
+                doc_ids.append(self._doc_ids[doc])
+                lengths.append(self._lengths[doc])
+        postings = {}
+        for term, (docs, frequencies) in self._postings.items():
+            kept = [(renumber[d], f) for d, f in zip(docs, frequencies) if renumber[d] >= 0]
+            if kept:
+                postings[term] = (array("i", (d for d, _ in kept)), array("f", (f for _, f in kept)))
+        self._doc_ids, self._lengths = doc_ids, lengths
+        self._alive = bytearray([1]) * len(doc_ids)
+        self._positions = {sujet_id: doc for doc, sujet_id in enumerate(doc_ids)}
+        self._postings = postings
+        self._dead = 0
+
+    # ======================
+    # RECHERCHE
+    # ======================
+
+    def search(
+        self,
+        text: str,
+        limit: int = 1000,
+        match_all: bool = True,
+        after: Optional[Tuple[float, int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Sujets les plus pertinents pour `text`: [(sujet_id, score)], meilleurs d'abord,
+        scores arrondis à SCORE_DECIMALS.
+        match_all: tous les termes doivent apparaître (comme websearch_to_tsquery),
+        sinon au moins un.
+        after: (score, sujet_id) du dernier résultat déjà vu: seuls les suivants sont
+        retournés (page suivante au-delà des `limit` premiers).
+        """
+        terms = list(dict.fromkeys(analyze(text)))
+        if not terms:
+            return []
+        with self._lock:
+            count = len(self._positions)
+            if not count:
+                return []
+            if match_all and any(term not in self._postings for term in terms):
+                return []
+            average_length = self._total_length / count
+            if NUMPY_AVAILABLE:
+                return self._search_numpy(terms, count, average_length, limit, match_all, after)
+            return self._search_python(terms, count, average_length, limit, match_all, after)
+
+    def _search_numpy(self, terms, count, average_length, limit, match_all, after):
+        alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+        lengths = np.frombuffer(self._lengths, dtype=np.float32)
+        scores = np.zeros(len(self._doc_ids), dtype=np.float64)
+        hits = np.zeros(len(self._doc_ids), dtype=np.int32)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings[0], dtype=np.int32)
+            frequencies = np.frombuffer(postings[1], dtype=np.float32)
+            mask = alive[docs]
+            docs, frequencies = docs[mask], frequencies[mask]
+            if not len(docs):
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = K1 * (1 - B + B * lengths[docs] / average_length)
+            scores[docs] += idf * frequencies * (K1 + 1) / (frequencies + norm)
+            hits[docs] += 1
+        matched = np.flatnonzero(hits == len(terms) if match_all else hits > 0)
+        if not len(matched):
+            return []
+        # Ex æquo départagés par id décroissant, comme la pagination SQL
+        doc_ids = np.frombuffer(self._doc_ids, dtype=np.int64)[matched]
+        rounded = np.round(scores[matched], SCORE_DECIMALS)
+        if after is not None:
+            keep = (rounded < after[0]) | ((rounded == after[0]) & (doc_ids < after[1]))
+            doc_ids, rounded = doc_ids[keep], rounded[keep]
+        order = np.lexsort((-doc_ids, -rounded))[:limit]
+        return [(int(doc_ids[i]), float(rounded[i])) for i in order]
+
+    def _search_python(self, terms, count, average_length, limit, match_all, after):
+        scores: Dict[int, float] = {}
+        hits: Dict[int, int] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            live = [(d, f) for d, f in zip(*postings) if self._alive[d]]
+            if not live:
+                continue
+            idf = math.log(1 + (count - len(live) + 0.5) / (len(live) + 0.5))
+            for doc, frequency in live:
+                norm = K1 * (1 - B + B * self._lengths[doc] / average_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+                hits[doc] = hits.get(doc, 0) + 1
+        ranked = [
+            (round(scores[doc], SCORE_DECIMALS), self._doc_ids[doc])
+            for doc, n in hits.items() if n == len(terms) or not match_all
+        ]
+        if after is not None:
+            ranked = [key for key in ranked if key < tuple(after)]
+        ranked.sort(reverse=True)
+        return [(sujet_id, score) for score, sujet_id in ranked[:limit]]
+
+
+# Instance globale de l'index BM25
+bm25_index = BM25Index()
@@ -0,0 +1,94 @@
+# app/cache.py
+"""
+Cache mémoire borné (LRU + expiration) avec compteurs de hits / misses.
+
+Les clés incluent la version du catalog (catalog_events.get_catalog_version())
+quand le résultat en dépend: une écriture sur les sujets invalide ainsi les
+entrées concernées sans vidage explicite.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+_MISSING = object()
+
+_caches: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """LRU borné à `maxsize` entrées, chacune valable `ttl` secondes"""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Compteurs (hits, misses) par catégorie de requête, si get() en reçoit une
+        self._labels: Dict[str, List[int]] = {}
+        _caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None, label: Optional[str] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            counts = self._labels.setdefault(label, [0, 0]) if label else None
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                if counts:
+                    counts[0] += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            if counts:
+                counts[1] += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+        if self._labels:
+            stats["by_label"] = {
+                label: {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+                }
+                for label, (hits, misses) in sorted(self._labels.items())
+            }
+        return stats
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Compteurs de tous les caches créés (exposés par /api/v1/system/status)"""
+    return {name: cache.stats() for name, cache in _caches.items()}
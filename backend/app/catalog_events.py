@@ -0,0 +1,238 @@
+# app/catalog_events.py
+"""
+Propagation des écritures sur les sujets vers les index en mémoire.
+
+- Hooks SQLAlchemy after_insert / after_update / after_delete sur Sujet:
+  les changements sont mémorisés pendant le flush puis appliqués (delta par ligne)
+  aux index enregistrés quand la transaction est validée.
+- Chaque changement est aussi écrit dans l'outbox `sujet_changes`, que les
+  autres workers rejouent avec sync_from_outbox(). Les ids de l'outbox sont
+  attribués à l'insertion mais visibles au commit: une transaction longue peut
+  rendre visible un id plus petit qu'un id déjà lu. Chaque lecture reprend donc
+  une fenêtre de OUTBOX_REPLAY_WINDOW ids avant la dernière position, et les ids
+  déjà traités (ou écrits par ce worker) sont ignorés.
+- prune_outbox() est appelé par le job nocturne (precompute_recommendations.py).
+- Un compteur de version est incrémenté à chaque changement appliqué, pour
+  invalider précisément les caches.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from app.models import Sujet, SujetChange
+
+# Colonnes utilisées par les index: une écriture qui ne touche que vue_count/like_count
+# n'invalide rien
+INDEXED_FIELDS = (
+    "titre", "keywords", "domaine", "faculté", "niveau", "difficulté",
+    "problématique", "description", "is_active",
+)
+SNAPSHOT_FIELDS = ("id",) + INDEXED_FIELDS + ("vue_count", "like_count")
+
+# Intervalle minimum entre deux lectures de l'outbox (secondes)
+OUTBOX_POLL_INTERVAL = float(os.getenv("CATALOG_OUTBOX_POLL_INTERVAL", "2"))
+# Ids relus avant la dernière position (commits dans le désordre)
+OUTBOX_REPLAY_WINDOW = int(os.getenv("CATALOG_OUTBOX_REPLAY_WINDOW", "1000"))
+
+_PENDING_KEY = "catalog_pending_changes"
+_OUTBOX_IDS_KEY = "catalog_outbox_ids"
+
+_lock = threading.RLock()
+_version = 0
+_listeners: List[Any] = []
+_last_outbox_id: Optional[int] = None
+_last_poll = 0.0
+# Ids déjà appliqués (lus ou écrits par ce worker), limités à la fenêtre de relecture
+_seen_outbox_ids: Set[int] = set()
+
+
+# ======================
+# VERSION & ABONNEMENTS
+# ======================
+
+def get_catalog_version() -> int:
+    """Version courante du catalog en mémoire"""
+    return _version
+
+
+def register_listener(listener) -> None:
+    """
+    Abonne un index aux changements du catalog.
+    Le listener expose upsert_sujet(row: dict) et remove_sujet(sujet_id: int).
+    """
+    with _lock:
+        if listener not in _listeners:
+            _listeners.append(listener)
+
+
+def snapshot_sujet(sujet) -> Dict[str, Any]:
+    """Copie des colonnes utiles d'un sujet (ORM ou ligne de requête)"""
+    return {field: getattr(sujet, field, None) for field in SNAPSHOT_FIELDS}
+
+
+def apply_changes(changes: Dict[int, Optional[Dict[str, Any]]]) -> None:
+    """Applique des deltas {sujet_id: ligne ou None si supprimé} aux index"""
+    global _version
+    if not changes:
+        return
+    with _lock:
+        for sujet_id, row in changes.items():
+            for listener in _listeners:
+                try:
+                    if row is None or not row.get("is_active", True):
+                        listener.remove_sujet(sujet_id)
+                    else:
+                        listener.upsert_sujet(row)
+                except Exception as e:
+                    print(f"⚠️ Erreur mise à jour index ({type(listener).__name__}): {e}")
+        _version += 1
+
+
+# ======================
+# HOOKS SQLALCHEMY
+# ======================
+
+def _record(connection, target, operation: str) -> None:
+    session = Session.object_session(target)
+    row = None if operation == "delete" else snapshot_sujet(target)
+
+    result = connection.execute(
+        SujetChange.__table__.insert().values(sujet_id=target.id, operation=operation)
+    )
+
+    if session is None:
+        return
+    session.info.setdefault(_PENDING_KEY, {})[target.id] = row
+    if result.inserted_primary_key:
+        session.info.setdefault(_OUTBOX_IDS_KEY, []).append(result.inserted_primary_key[0])
+
+
+@event.listens_for(Sujet, "after_insert")
+def _sujet_inserted(mapper, connection, target):
+    _record(connection, target, "upsert")
+
+
+@event.listens_for(Sujet, "after_update")
+def _sujet_updated(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+        return
+    _record(connection, target, "upsert" if target.is_active else "delete")
+
+
+@event.listens_for(Sujet, "after_delete")
+def _sujet_deleted(mapper, connection, target):
+    _record(connection, target, "delete")
+
+
+@event.listens_for(Session, "after_commit")
+def _session_committed(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    outbox_ids = session.info.pop(_OUTBOX_IDS_KEY, None)
+    if outbox_ids:
+        with _lock:
+            # Sans position de départ, sync_from_outbox ne lit rien: inutile de les garder
+            if _last_outbox_id is not None:
+                _seen_outbox_ids.update(outbox_ids)
+    if changes:
+        apply_changes(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _session_rolled_back(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_OUTBOX_IDS_KEY, None)
+
+
+# ======================
+# OUTBOX (MULTI-WORKERS)
+# ======================
+
+def mark_outbox_position(db: Session) -> None:
+    """
+    À appeler avant de (re)construire un index depuis la base:
+    seuls les changements postérieurs seront rejoués.
+    """
+    global _last_outbox_id
+    last_id = db.query(func.max(SujetChange.id)).scalar() or 0
+    with _lock:
+        if _last_outbox_id is not None and last_id >= _last_outbox_id:
+            return
+    # Les ids déjà visibles de la fenêtre sont couverts par la construction;
+    # ceux qui seront validés plus tard seront rejoués
+    visible = db.query(SujetChange.id).filter(
+        SujetChange.id > last_id - OUTBOX_REPLAY_WINDOW, SujetChange.id <= last_id
+    ).all()
+    with _lock:
+        if _last_outbox_id is None or last_id < _last_outbox_id:
+            _last_outbox_id = last_id
+            _seen_outbox_ids.clear()
+            _seen_outbox_ids.update(entry.id for entry in visible)
+
+
+def sync_from_outbox(db: Session, force: bool = False) -> int:
+    """
+    Rejoue les changements écrits par les autres workers depuis la dernière lecture.
+    Retourne le nombre de sujets mis à jour.
+    """
+    global _last_outbox_id, _last_poll
+
+    now = time.monotonic()
+    if _last_outbox_id is None or (not force and now - _last_poll < OUTBOX_POLL_INTERVAL):
+        return 0
+    _last_poll = now
+
+    entries = db.query(SujetChange.id, SujetChange.sujet_id).filter(
+        SujetChange.id > _last_outbox_id - OUTBOX_REPLAY_WINDOW
+    ).order_by(SujetChange.id).all()
+    if not entries:
+        return 0
+
+    with _lock:
+        sujet_ids = set()
+        for entry in entries:
+            if entry.id not in _seen_outbox_ids:
+                _seen_outbox_ids.add(entry.id)
+                sujet_ids.add(entry.sujet_id)
+        _last_outbox_id = max(_last_outbox_id, entries[-1].id)
+        floor = _last_outbox_id - OUTBOX_REPLAY_WINDOW
+        _seen_outbox_ids.difference_update([seen for seen in _seen_outbox_ids if seen <= floor])
+
+    if not sujet_ids:
+        return 0
+
+    # L'état actuel de la ligne fait foi, quelle que soit l'opération enregistrée
+    rows = db.query(*[getattr(Sujet, field) for field in SNAPSHOT_FIELDS]).filter(
+        Sujet.id.in_(sujet_ids)
+    ).all()
+    current = {row.id: snapshot_sujet(row) for row in rows}
+    apply_changes({sujet_id: current.get(sujet_id) for sujet_id in sujet_ids})
+    return len(sujet_ids)
+
+
+def build_from_db(db: Session, structure, columns: List[Any]) -> None:
+    """
+    Construction complète d'un index depuis les sujets actifs (premier appel seulement).
+    Si une écriture est appliquée pendant la lecture, on recommence.
+    """
+    for _ in range(3):
+        version = get_catalog_version()
+        mark_outbox_position(db)
+        rows = db.query(*columns).filter(Sujet.is_active == True).order_by(Sujet.id).all()
+        structure.build(rows)
+        if get_catalog_version() == version:
+            break
+
+
+def prune_outbox(db: Session, keep_seconds: int = 7 * 24 * 3600) -> int:
+    """Supprime les entrées d'outbox plus anciennes que keep_seconds"""
+    from datetime import datetime, timedelta
+
+    cutoff = datetime.utcnow() - timedelta(seconds=keep_seconds)
+    deleted = db.query(SujetChange).filter(SujetChange.created_at < cutoff).delete()
+    db.commit()
+    return deleted
@@ -0,0 +1,322 @@
+# app/catalog_matrix.py
+"""
+Représentation colonnaire du catalog pour le scoring vectorisé des recommandations.
+
+- mots-clés et titre: matrice creuse binaire (phrase × n-gramme haché), une ligne
+  par mot-clé plus une pour le titre, dont la similarité est pondérée par TITLE_WEIGHT
+- niveau / faculté / domaine / difficulté: tableaux d'entiers (codes du vocabulaire)
+
+Le score d'une requête est calculé pour tout le catalog en quelques opérations
+NumPy/SciPy, avec la même pondération que RecommendationEngine.score_sujet.
+"""
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+    NUMPY_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ NumPy/SciPy non disponibles, scoring vectorisé désactivé: {e}")
+    np = None
+    sparse = None
+    NUMPY_AVAILABLE = False
+
+from app.keyword_index import MIN_SIMILARITY, TITLE_WEIGHT, char_ngrams, normalize_keyword, split_keywords
+
+# Nombre de colonnes de la matrice des n-grammes (hashing trick)
+N_FEATURES = 2 ** 18
+
+CRITERIA_FIELDS = ("niveau", "faculté", "domaine", "difficulté")
+# Critères comparés par égalité, les autres par inclusion (comme score_sujet)
+EXACT_FIELDS = ("niveau", "difficulté")
+
+
+def hash_features(term: str) -> List[int]:
+    """
+    Colonnes des n-grammes d'un terme normalisé.
+    crc32 plutôt que hash(): stable d'un processus à l'autre.
+    """
+    return sorted({zlib.crc32(gram.encode("utf-8")) & (N_FEATURES - 1) for gram in char_ngrams(term)})
+
+
+class CatalogMatrix:
+    """Instantané colonnaire du catalog actif"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ids = None
+        self.active = None
+        self.phrases = None
+        self.phrase_sizes = None
+        self.phrase_weights = None
+        self.phrase_owner = None
+        self.phrase_starts = None
+        self.owners_with_phrases = None
+        self.codes: Dict[str, Any] = {}
+        self.vocabularies: Dict[str, List[str]] = {}
+        self._vocab_index: Dict[str, Dict[str, int]] = {}
+        self._positions: Dict[int, int] = {}
+        self.is_built = False
+
+    def __len__(self) -> int:
+        """Nombre de sujets actifs"""
+        return len(self._positions)
+
+    def __getstate__(self):
+        # Le verrou n'est pas picklable (envoi aux processus de scoring par lot)
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def snapshot(self) -> "CatalogMatrix":
+        """Copie figée, indépendante des mises à jour incrémentales suivantes"""
+        with self._lock:
+            copy = CatalogMatrix()
+            copy.__dict__.update({key: value for key, value in self.__dict__.items() if key != "_lock"})
+            copy.active = self.active.copy()
+            copy.codes = dict(self.codes)
+            copy.vocabularies = dict(self.vocabularies)
+            copy._vocab_index = {field: dict(vocab) for field, vocab in self._vocab_index.items()}
+            copy._positions = dict(self._positions)
+            return copy
+
+    def build(self, rows: Iterable[Tuple]) -> None:
+        """rows: (id, keywords, titre, niveau, faculté, domaine, difficulté)"""
+        vocab_index = {field: {} for field in CRITERIA_FIELDS}
+        ids, phrases, weights, owners, columns = self._encode_rows(rows, vocab_index)
+        # Début de chaque groupe de mots-clés d'un même sujet (pour np.maximum.reduceat)
+        owners_with_phrases, phrase_starts = np.unique(owners, return_index=True)
+
+        with self._lock:
+            self.ids = ids
+            self.active = np.ones(len(ids), dtype=bool)
+            self.phrases = phrases
+            self.phrase_sizes = np.diff(phrases.indptr).astype(np.float32)
+            self.phrase_weights = weights
+            self.phrase_owner = owners
+            self.phrase_starts = phrase_starts
+            self.owners_with_phrases = owners_with_phrases
+            self.codes = columns
+            self._vocab_index = vocab_index
+            self.vocabularies = {
+                field: sorted(vocab_index[field], key=vocab_index[field].get) for field in CRITERIA_FIELDS
+            }
+            self._positions = {int(sujet_id): row for row, sujet_id in enumerate(ids)}
+            self.is_built = True
+
+    def _encode_rows(self, rows: Iterable[Tuple], vocab_index: Dict[str, Dict[str, int]], first_row: int = 0):
+        """
+        Encode des lignes du catalog: ids, matrice des phrases (mots-clés puis titre),
+        poids et propriétaire de chaque phrase, codes
+        """
+        ids = []
+        indptr = [0]
+        indices = []
+        weights = []
+        owners = []
+        columns = {field: [] for field in CRITERIA_FIELDS}
+
+        for row, (sujet_id, keywords, titre, *values) in enumerate(rows, start=first_row):
+            ids.append(sujet_id)
+            terms = [(term, 1.0) for term in split_keywords(keywords)]
+            title = normalize_keyword(titre)
+            if title:
+                terms.append((title, TITLE_WEIGHT))
+            for term, weight in terms:
+                indices.extend(hash_features(term))
+                indptr.append(len(indices))
+                weights.append(weight)
+                owners.append(row)
+            for field, value in zip(CRITERIA_FIELDS, values):
+                columns[field].append(self._encode(vocab_index[field], value))
+
+        phrases = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(owners), N_FEATURES)
+        )
+        return (
+            np.array(ids, dtype=np.int64),
+            phrases,
+            np.array(weights, dtype=np.float32),
+            np.array(owners, dtype=np.int64),
+            {field: np.array(columns[field], dtype=np.int32) for field in CRITERIA_FIELDS},
+        )
+
+    # ======================
+    # MISE À JOUR INCRÉMENTALE (catalog_events)
+    # ======================
+
+    def upsert_sujet(self, row: Dict[str, Any]) -> None:
+        """Désactive l'ancienne ligne du sujet et ajoute la nouvelle en fin de matrice"""
+        if not self.is_built:
+            return
+        with self._lock:
+            self._deactivate(row["id"])
+            first_row = len(self.ids)
+            ids, phrases, weights, owners, columns = self._encode_rows(
+                [(row["id"], row.get("keywords"), row.get("titre")) + tuple(row.get(field) for field in CRITERIA_FIELDS)],
+                self._vocab_index,
+                first_row=first_row
+            )
+            if phrases.shape[0]:
+                self.owners_with_phrases = np.append(self.owners_with_phrases, first_row)
+                self.phrase_starts = np.append(self.phrase_starts, self.phrases.shape[0])
+                self.phrases = sparse.vstack([self.phrases, phrases], format="csr")
+                self.phrase_sizes = np.diff(self.phrases.indptr).astype(np.float32)
+                self.phrase_weights = np.concatenate([self.phrase_weights, weights])
+                self.phrase_owner = np.concatenate([self.phrase_owner, owners])
+            self.ids = np.concatenate([self.ids, ids])
+            self.active = np.append(self.active, True)
+            for field in CRITERIA_FIELDS:
+                self.codes[field] = np.concatenate([self.codes[field], columns[field]])
+                vocab = self._vocab_index[field]
+                self.vocabularies[field] = sorted(vocab, key=vocab.get)
+            self._positions[int(row["id"])] = first_row
+            self._compact_if_needed()
+
+    def remove_sujet(self, sujet_id: int) -> None:
+        if not self.is_built:
+            return
+        with self._lock:
+            self._deactivate(sujet_id)
+            self._compact_if_needed()
+
+    def _deactivate(self, sujet_id: int) -> None:
+        position = self._positions.pop(int(sujet_id), None)
+        if position is not None:
+            self.active[position] = False
+
+    def _compact_if_needed(self) -> None:
+        """Supprime physiquement les lignes désactivées quand elles dépassent 25% de la matrice"""
+        inactive = len(self.active) - int(self.active.sum())
+        if inactive == 0 or inactive < 0.25 * len(self.active):
+            return
+
+        keep = np.flatnonzero(self.active)
+        new_position = np.full(len(self.active), -1, dtype=np.int64)
+        new_position[keep] = np.arange(len(keep))
+
+        kept_phrases = np.flatnonzero(self.active[self.phrase_owner])
+        self.phrases = self.phrases[kept_phrases]
+        self.phrase_sizes = self.phrase_sizes[kept_phrases]
+        self.phrase_weights = self.phrase_weights[kept_phrases]
+        self.phrase_owner = new_position[self.phrase_owner[kept_phrases]]
+        self.owners_with_phrases, self.phrase_starts = np.unique(self.phrase_owner, return_index=True)
+
+        self.ids = self.ids[keep]
+        self.active = np.ones(len(keep), dtype=bool)
+        for field in CRITERIA_FIELDS:
+            self.codes[field] = self.codes[field][keep]
+        self._positions = {int(sujet_id): row for row, sujet_id in enumerate(self.ids)}
+
+    @staticmethod
+    def _encode(vocab: Dict[str, int], value: Optional[str]) -> int:
+        if not value:
+            return -1
+        return vocab.setdefault(value.lower(), len(vocab))
+
+    def keyword_scores(self, interests: List[str]):
+        """
+        Score mots-clés (0-100) de chaque sujet: moyenne sur les intérêts de la meilleure
+        similarité avec un mot-clé ou le titre (pondérée)
+        """
+        n_sujets = 0 if self.ids is None else len(self.ids)
+        terms = [normalize_keyword(interest) for interest in interests]
+        if not terms or n_sujets == 0:
+            return np.zeros(n_sujets, dtype=np.float32)
+
+        indptr = [0]
+        indices = []
+        for term in terms:
+            if term:
+                indices.extend(hash_features(term))
+            indptr.append(len(indices))
+        query = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(terms), N_FEATURES)
+        )
+        query_sizes = np.diff(query.indptr).astype(np.float32)
+
+        # n-grammes communs (mot-clé × intérêt) puis coefficient de Dice
+        shared = (self.phrases @ query.T).toarray()
+        similarity = 2 * shared / (self.phrase_sizes[:, None] + query_sizes[None, :] + 1e-9)
+        similarity[similarity < MIN_SIMILARITY] = 0.0
+        similarity *= self.phrase_weights[:, None]
+
+        best = np.zeros((n_sujets, len(terms)), dtype=np.float32)
+        if len(self.phrase_starts):
+            best[self.owners_with_phrases] = np.maximum.reduceat(similarity, self.phrase_starts, axis=0)
+
+        return best.mean(axis=1) * 100
+
+    def criteria_mask(self, field: str, value: Optional[str]):
+        """Masque booléen des sujets respectant un critère"""
+        value = value.lower()
+        vocab = self.vocabularies[field]
+        if field in EXACT_FIELDS:
+            matches = [v == value for v in vocab]
+        else:
+            matches = [value in v for v in vocab]
+        # Dernier élément à False: les codes -1 (valeur absente) tombent dessus
+        table = np.array(matches + [False], dtype=bool)
+        return table[self.codes[field]]
+
+    def score(
+        self,
+        interests: List[str],
+        criteria_weight: float,
+        niveau: Optional[str] = None,
+        faculté: Optional[str] = None,
+        domaine: Optional[str] = None,
+        difficulté: Optional[str] = None
+    ):
+        """Scores (0-100), scores mots-clés et ids de tout le catalog (mêmes positions)"""
+        with self._lock:
+            if interests:
+                keyword_scores = self.keyword_scores(interests)
+            else:
+                keyword_scores = np.zeros(len(self.ids), dtype=np.float32)
+            scores = keyword_scores * 0.4
+            for field, value in zip(CRITERIA_FIELDS, (niveau, faculté, domaine, difficulté)):
+                if value:
+                    scores = scores + criteria_weight * self.criteria_mask(field, value)
+            # Lignes remplacées ou supprimées depuis la construction
+            scores = np.where(self.active, scores, 0.0)
+            return scores, keyword_scores, self.ids.copy()
+
+    def add_bonus(self, scores, ids, bonus: Dict[int, float]):
+        """
+        Ajoute des points par sujet (filtrage collaboratif), score plafonné à 100.
+        `ids` est le tableau retourné par score() avec ces scores.
+        """
+        if not bonus:
+            return scores
+        positions, points = [], []
+        with self._lock:
+            for sujet_id, value in bonus.items():
+                position = self._positions.get(int(sujet_id))
+                # Ligne ajoutée après le calcul des scores: ignorée
+                if position is not None and position < len(ids) and ids[position] == sujet_id:
+                    positions.append(position)
+                    points.append(value)
+        scores = scores.copy()
+        scores[positions] += np.array(points, dtype=scores.dtype)
+        return np.minimum(scores, 100.0)
+
+    def top_k(self, scores, k: int, min_score: float) -> List[int]:
+        """Positions des k meilleurs scores > min_score, par score décroissant"""
+        eligible = np.flatnonzero(scores > min_score)
+        if len(eligible) > k:
+            eligible = np.sort(eligible[np.argpartition(-scores[eligible], k - 1)[:k]])
+        order = np.argsort(-scores[eligible], kind="stable")
+        return eligible[order].tolist()
+
+
+# Instance globale
+catalog_matrix = CatalogMatrix() if NUMPY_AVAILABLE else None
@@ -0,0 +1,304 @@
+# app/collaborative.py
+"""
+Filtrage collaboratif item-item à partir des feedbacks.
+
+- matrice utilisateur × sujet (SciPy sparse) pondérée par rating / pertinence /
+  intéressé / sélectionné
+- similarité cosinus entre sujets, on garde les N plus proches voisins de chaque sujet
+- modèle persistant sur disque (tableaux .npy chargés en mémoire mappée), un
+  sous-dossier par version, écrit puis renommé atomiquement
+- mise à jour incrémentale: seules les lignes des sujets touchés par les nouveaux
+  feedbacks sont recalculées, hors requête (job nocturne ou thread de fond); les
+  requêtes ne font que charger la dernière version publiée
+
+Les voisins sont stockés en CSR (indptr / neighbours / similarities), triés par
+similarité décroissante: similar() est une simple tranche de tableau.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.catalog_matrix import NUMPY_AVAILABLE
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+    from scipy import sparse
+else:
+    np = None
+    sparse = None
+
+# Voisins conservés par sujet
+NEIGHBOURS_PER_SUJET = int(os.getenv("COLLABORATIVE_NEIGHBOURS", "50"))
+# Sujets traités par produit matriciel (borne la mémoire)
+SIMILARITY_BLOCK_SIZE = 1024
+# Versions du modèle gardées sur disque
+KEEP_VERSIONS = 2
+
+DEFAULT_MODEL_DIR = os.getenv(
+    "COLLABORATIVE_MODEL_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "data", "collaborative")
+)
+
+ARRAYS = ("ids", "indptr", "neighbours", "similarities")
+
+
+def feedback_weight(
+    rating: Optional[int],
+    pertinence: Optional[int],
+    intéressé: Optional[bool],
+    sélectionné: Optional[bool]
+) -> float:
+    """Intensité de l'intérêt d'un utilisateur pour un sujet (0 = aucun signal positif)"""
+    weight = 0.0
+    if rating:
+        # 1-2 étoiles: pas un signal d'intérêt
+        weight += max(rating - 2, 0) / 3
+    if pertinence:
+        weight += pertinence / 10
+    if intéressé:
+        weight += 1.0
+    if sélectionné:
+        weight += 2.0
+    return weight
+
+
+class CollaborativeModel:
+    """Voisins les plus proches de chaque sujet selon les feedbacks"""
+
+    def __init__(self, directory: str = DEFAULT_MODEL_DIR):
+        self._lock = threading.RLock()
+        self.directory = directory
+        self.ids = None
+        self.indptr = None
+        self.neighbours = None
+        self.similarities = None
+        self._positions: Dict[int, int] = {}
+        self.last_feedback_id = 0
+        self.n_feedbacks = 0
+        self.is_built = False
+        self.last_check = 0.0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    # ======================
+    # CALCUL
+    # ======================
+
+    @staticmethod
+    def _normalized_interactions(rows: Iterable[Tuple]):
+        """
+        rows: (id, user_id, sujet_id, rating, pertinence, intéressé, sélectionné)
+        Retourne la matrice utilisateur × sujet normalisée par colonne (CSC), les ids
+        des sujets (colonnes) et le nombre de feedbacks lus.
+        """
+        weights: Dict[Tuple[int, int], float] = {}
+        count = 0
+        for _, user_id, sujet_id, *signals in rows:
+            count += 1
+            weight = feedback_weight(*signals)
+            if weight > weights.get((user_id, sujet_id), 0.0):
+                weights[(user_id, sujet_id)] = weight
+
+        item_ids = np.array(sorted({sujet_id for _, sujet_id in weights}), dtype=np.int64)
+        user_positions = {user_id: i for i, user_id in enumerate(sorted({user_id for user_id, _ in weights}))}
+        item_positions = {int(sujet_id): i for i, sujet_id in enumerate(item_ids)}
+
+        matrix = sparse.csc_matrix(
+            (
+                np.array(list(weights.values()), dtype=np.float32),
+                (
+                    np.array([user_positions[u] for u, _ in weights], dtype=np.int64),
+                    np.array([item_positions[s] for _, s in weights], dtype=np.int64),
+                )
+            ),
+            shape=(len(user_positions), len(item_ids))
+        )
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        return (matrix @ sparse.diags(1.0 / norms)).tocsc(), item_ids, count
+
+    @staticmethod
+    def _top_neighbours(normalized, item_ids, columns: List[int]) -> Dict[int, Tuple]:
+        """Voisins (ids, similarités) des sujets aux colonnes données, par blocs"""
+        result = {}
+        transposed = normalized.T.tocsr()
+        for start in range(0, len(columns), SIMILARITY_BLOCK_SIZE):
+            block = columns[start:start + SIMILARITY_BLOCK_SIZE]
+            similarity = (transposed[block] @ normalized).tocsr()
+            for row, column in enumerate(block):
+                begin, end = similarity.indptr[row], similarity.indptr[row + 1]
+                indices = similarity.indices[begin:end]
+                values = similarity.data[begin:end]
+                keep = indices != column
+                indices, values = indices[keep], values[keep]
+                if len(values) > NEIGHBOURS_PER_SUJET:
+                    best = np.argpartition(-values, NEIGHBOURS_PER_SUJET - 1)[:NEIGHBOURS_PER_SUJET]
+                    indices, values = indices[best], values[best]
+                order = np.argsort(-values, kind="stable")
+                result[int(item_ids[column])] = (item_ids[indices[order]], values[order].astype(np.float32))
+        return result
+
+    def _set_neighbours(self, neighbours: Dict[int, Tuple], last_feedback_id: int, n_feedbacks: int) -> None:
+        ids = sorted(neighbours)
+        indptr = [0]
+        for sujet_id in ids:
+            indptr.append(indptr[-1] + len(neighbours[sujet_id][0]))
+        empty_ids, empty_values = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        with self._lock:
+            self.ids = np.array(ids, dtype=np.int64)
+            self.indptr = np.array(indptr, dtype=np.int64)
+            self.neighbours = np.concatenate([neighbours[i][0] for i in ids] or [empty_ids]).astype(np.int64)
+            self.similarities = np.concatenate([neighbours[i][1] for i in ids] or [empty_values]).astype(np.float32)
+            self._positions = {sujet_id: i for i, sujet_id in enumerate(ids)}
+            self.last_feedback_id = last_feedback_id
+            self.n_feedbacks = n_feedbacks
+            self.is_built = True
+
+    def build(self, rows: List[Tuple]) -> None:
+        """Calcul complet à partir de tous les feedbacks"""
+        last_feedback_id = max((row[0] for row in rows), default=0)
+        normalized, item_ids, count = self._normalized_interactions(rows)
+        neighbours = self._top_neighbours(normalized, item_ids, list(range(len(item_ids))))
+        self._set_neighbours(neighbours, last_feedback_id, count)
+
+    def refresh(self, rows: List[Tuple]) -> int:
+        """
+        Mise à jour après de nouveaux feedbacks (rows: tous les feedbacks).
+        Une nouvelle interaction (u, j) ne modifie que les similarités entre sujets
+        co-notés par u, et celles de j (sa norme change): seules ces lignes sont recalculées.
+        Retourne le nombre de sujets recalculés.
+        """
+        new_rows = [row for row in rows if row[0] > self.last_feedback_id]
+        if not self.is_built or len(rows) != self.n_feedbacks + len(new_rows):
+            # Feedbacks supprimés entre-temps: on recalcule tout
+            self.build(rows)
+            return len(self)
+        if not new_rows:
+            return 0
+
+        normalized, item_ids, count = self._normalized_interactions(rows)
+        item_positions = {int(sujet_id): i for i, sujet_id in enumerate(item_ids)}
+
+        changed_users = {row[1] for row in new_rows}
+        changed_items = {row[2] for row in new_rows}
+        user_items: Dict[int, Set[int]] = defaultdict(set)
+        for _, user_id, sujet_id, *signals in rows:
+            if feedback_weight(*signals) > 0:
+                user_items[user_id].add(sujet_id)
+
+        affected = set()
+        for user_id, sujets in user_items.items():
+            if user_id in changed_users or sujets & changed_items:
+                affected |= sujets
+
+        columns = sorted(item_positions[sujet_id] for sujet_id in affected if sujet_id in item_positions)
+        updated = self._top_neighbours(normalized, item_ids, columns)
+
+        neighbours = {}
+        for sujet_id in item_ids.tolist():
+            if sujet_id in updated:
+                neighbours[sujet_id] = updated[sujet_id]
+            else:
+                neighbours[sujet_id] = self._neighbours_of(sujet_id)
+        self._set_neighbours(neighbours, max(row[0] for row in new_rows), count)
+        return len(columns)
+
+    # ======================
+    # PERSISTANCE
+    # ======================
+
+    def save(self) -> None:
+        """Écrit une nouvelle version dans son propre dossier puis la publie par renommage"""
+        os.makedirs(self.directory, exist_ok=True)
+        target = os.path.join(self.directory, f"{self.last_feedback_id:012d}")
+        if os.path.isdir(target):
+            return
+
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        with self._lock:
+            for name in ARRAYS:
+                np.save(os.path.join(staging, f"{name}.npy"), np.asarray(getattr(self, name)))
+            meta = {"last_feedback_id": self.last_feedback_id, "n_feedbacks": self.n_feedbacks}
+        with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Un autre worker a publié la même version
+            shutil.rmtree(staging, ignore_errors=True)
+        self._prune()
+
+    def _versions(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.isdigit())
+
+    def _prune(self) -> None:
+        for name in self._versions()[:-KEEP_VERSIONS]:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def latest_version(self) -> int:
+        """Dernier feedback couvert par la version publiée sur disque (0 si aucune)"""
+        versions = self._versions()
+        return int(versions[-1]) if versions else 0
+
+    def load(self) -> bool:
+        """Charge la dernière version publiée (tableaux en mémoire mappée)"""
+        versions = self._versions()
+        if not versions:
+            return False
+        path = os.path.join(self.directory, versions[-1])
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ARRAYS}
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Modèle collaboratif illisible ({path}): {e}")
+            return False
+
+        with self._lock:
+            for name, array in arrays.items():
+                setattr(self, name, array)
+            self._positions = {int(sujet_id): i for i, sujet_id in enumerate(arrays["ids"])}
+            self.last_feedback_id = meta["last_feedback_id"]
+            self.n_feedbacks = meta["n_feedbacks"]
+            self.is_built = True
+        return True
+
+    # ======================
+    # LECTURE
+    # ======================
+
+    def _neighbours_of(self, sujet_id: int) -> Tuple:
+        position = self._positions.get(int(sujet_id))
+        if position is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        begin, end = self.indptr[position], self.indptr[position + 1]
+        return np.asarray(self.neighbours[begin:end]), np.asarray(self.similarities[begin:end])
+
+    def similar(self, sujet_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        """Sujets les plus proches (id, similarité 0-1), par similarité décroissante"""
+        with self._lock:
+            ids, values = self._neighbours_of(sujet_id)
+            return [(int(i), float(v)) for i, v in zip(ids[:limit], values[:limit])]
+
+    def scores_for_history(self, sujet_ids: Iterable[int]) -> Dict[int, float]:
+        """Meilleure similarité (0-1) de chaque sujet avec l'historique d'un utilisateur"""
+        history = set(sujet_ids)
+        scores: Dict[int, float] = {}
+        with self._lock:
+            for sujet_id in history:
+                ids, values = self._neighbours_of(sujet_id)
+                for neighbour, value in zip(ids.tolist(), values.tolist()):
+                    if neighbour not in history and value > scores.get(neighbour, 0.0):
+                        scores[neighbour] = value
+        return scores
+
+
+# Instance globale
+collaborative_model = CollaborativeModel() if NUMPY_AVAILABLE else None
@@ -1,18 +1,21 @@
 # app/crud.py
 import fastapi
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import Optional, List, Dict, Any
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import and_, case, func, desc, literal, tuple_
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from datetime import datetime, timedelta
 import json
 from fastapi import Query
 from app.models import (
     User, UserPreference, Sujet, Feedback, 
     UserProfile, UserSkill, UserHistory, 
-    ConversationMessage, UserSettings
+    ConversationMessage, UserSettings, UserRecommendation
 )
 from app import schemas
 from app.auth import get_password_hash
+from app import pagination
+from app import search as fulltext
+from app import catalog_events  # noqa: F401 - enregistre les hooks d'écriture sur Sujet
 
 
 # ========== USER FUNCTIONS ==========
@@ -55,35 +58,48 @@ def update_user(db: Session, user_id: int, user_data: Dict[str, Any]) -> Optiona
     return user
 
 def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    return db.query(User).offset(skip).limit(limit).all()
+    return pagination.order_by_keys(db.query(User), [User.id]).offset(skip).limit(limit).all()
+
+def get_users_page(db: Session, cursor: Optional[str] = None, limit: int = 100) -> Tuple[List[User], Optional[str]]:
+    """Utilisateurs par id croissant (comme get_users), par curseur"""
+    return pagination.paginate(db.query(User), [User.id], limit, cursor=cursor)
 
 
 # ========== SUJET FUNCTIONS ==========
 def get_sujet(db: Session, sujet_id: int) -> Optional[Sujet]:
     return db.query(Sujet).filter(Sujet.id == sujet_id).first()
 
-def get_sujets(
+def _sujets_query(
     db: Session,
-    skip: int = 0,
-    limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = None,
     domaine: Optional[str] = None,
     faculté: Optional[str] = None,
     niveau: Optional[str] = None,
     difficulté: Optional[str] = None,
-    is_active: bool = True
-) -> List[Sujet]:
+    is_active: bool = True,
+    fuzzy: bool = False,
+    after: Optional[List[Any]] = None
+):
+    """
+    Requête filtrée des sujets et clés de tri: (pertinence, id) décroissants pour une
+    recherche classée, sinon id croissant (voir pagination.is_descending).
+    after: clés du curseur de la page demandée, transmises au moteur de recherche.
+    """
     query = db.query(Sujet)
+    keys = [Sujet.id]
     
     if is_active:
         query = query.filter(Sujet.is_active == True)
     
     if search:
-        query = query.filter(
-            Sujet.titre.contains(search) |
-            Sujet.keywords.contains(search) |
-            Sujet.description.contains(search)
-        )
+        if fuzzy and fulltext.is_trigram_enabled(db):
+            # Sous-chaînes et fautes de frappe via les index pg_trgm
+            query, score = fulltext.trigram_search(db, query, search)
+        else:
+            # Moteur configuré (PostgreSQL, FTS5, BM25 ou LIKE), voir app/search.py
+            query, score = fulltext.get_backend(db).search(db, query, search, after=after)
+        if score is not None:
+            keys = [score, Sujet.id]
     
     if domaine:
         query = query.filter(Sujet.domaine == domaine)
@@ -97,7 +113,139 @@ def get_sujets(
     if difficulté:
         query = query.filter(Sujet.difficulté == difficulté)
     
-    return query.offset(skip).limit(limit).all()
+    return query, keys
+
+def get_sujets(
+    db: Session,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = None,
+    domaine: Optional[str] = None,
+    faculté: Optional[str] = None,
+    niveau: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    is_active: bool = True,
+    fuzzy: bool = False
+) -> List[Sujet]:
+    query, keys = _sujets_query(db, search, domaine, faculté, niveau, difficulté, is_active, fuzzy)
+    return pagination.order_by_keys(query, keys).offset(skip).limit(limit).all()
+
+def get_sujets_page(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    search: Optional[str] = None,
+    domaine: Optional[str] = None,
+    faculté: Optional[str] = None,
+    niveau: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    is_active: bool = True,
+    fuzzy: bool = False,
+    state: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Sujet], Optional[str]]:
+    """Comme get_sujets, par curseur: (sujets, curseur de la page suivante)"""
+    after = None
+    if cursor and search:
+        try:
+            after = pagination.decode_cursor(cursor, 2)
+        except ValueError:
+            after = None  # curseur d'une liste non classée: validé par paginate
+    query, keys = _sujets_query(db, search, domaine, faculté, niveau, difficulté, is_active, fuzzy, after=after)
+    sujets, next_cursor = pagination.paginate(query, keys, limit, cursor=cursor, state=state)
+    if next_cursor is None and search and len(keys) == 2 and not (fuzzy and fulltext.is_trigram_enabled(db)):
+        # Fenêtre BM25 épuisée avant la recherche: la page suivante repart après elle
+        window_end = fulltext.get_backend(db).window_end(db, search, after)
+        if window_end is not None:
+            next_cursor = pagination.encode_cursor(list(window_end), state)
+    return sujets, next_cursor
+
+def iter_sujets(
+    db: Session,
+    columns: List[Any],
+    batch_size: int = 500,
+    search: Optional[str] = None,
+    domaine: Optional[str] = None,
+    faculté: Optional[str] = None,
+    niveau: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    is_active: bool = True,
+    fuzzy: bool = False
+) -> Iterator[Any]:
+    """
+    Colonnes des sujets filtrés et triés comme get_sujets, lues par lots de batch_size
+    (curseur côté serveur sous PostgreSQL): un seul lot en mémoire à la fois.
+    """
+    query, keys = _sujets_query(db, search, domaine, faculté, niveau, difficulté, is_active, fuzzy)
+    query = pagination.order_by_keys(query.with_entities(*columns), keys)
+    yield from query.execution_options(yield_per=batch_size, stream_results=True)
+
+def count_sujets(
+    db: Session,
+    search: Optional[str] = None,
+    domaine: Optional[str] = None,
+    faculté: Optional[str] = None,
+    niveau: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    is_active: bool = True
+) -> Tuple[int, bool]:
+    """Nombre de sujets correspondant aux filtres: (total, exact) — estimé sur un grand catalog"""
+    query, _ = _sujets_query(db, search, domaine, faculté, niveau, difficulté, is_active)
+    return pagination.estimate_count(db, query)
+
+def get_sujets_by_ids(db: Session, sujet_ids: List[int]) -> List[Sujet]:
+    """Charge des sujets par id en conservant l'ordre demandé"""
+    if not sujet_ids:
+        return []
+    sujets = {s.id: s for s in db.query(Sujet).filter(Sujet.id.in_(sujet_ids)).all()}
+    return [sujets[sujet_id] for sujet_id in sujet_ids if sujet_id in sujets]
+
+def get_recommendation_candidates(
+    db: Session,
+    sujet_ids: Optional[List[int]] = None,
+    niveau: Optional[str] = None,
+    faculté: Optional[str] = None,
+    domaine: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    min_matches: int = 0,
+    limit: Optional[int] = None
+):
+    """
+    Colonnes utiles au scoring des recommandations, sans charger les sujets complets.
+    - sujet_ids: restreindre à ces sujets (candidats de l'index des mots-clés)
+    - min_matches: nombre minimum de critères respectés, calculé en SQL
+    """
+    import sqlalchemy as sa
+
+    criteria = []
+    if niveau:
+        criteria.append(func.lower(Sujet.niveau) == niveau.lower())
+    if faculté:
+        criteria.append(func.lower(Sujet.faculté).contains(faculté.lower(), autoescape=True))
+    if domaine:
+        criteria.append(func.lower(Sujet.domaine).contains(domaine.lower(), autoescape=True))
+    if difficulté:
+        criteria.append(func.lower(Sujet.difficulté) == difficulté.lower())
+
+    if min_matches > len(criteria):
+        return []
+
+    query = db.query(
+        Sujet.id, Sujet.niveau, Sujet.faculté, Sujet.domaine, Sujet.difficulté
+    ).filter(Sujet.is_active == True)
+
+    if sujet_ids is not None:
+        query = query.filter(Sujet.id.in_(sujet_ids))
+
+    if min_matches > 0:
+        match_count = sum(sa.case((condition, 1), else_=0) for condition in criteria)
+        query = query.filter(match_count >= min_matches).order_by(
+            match_count.desc(), Sujet.vue_count.desc(), Sujet.id
+        )
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return query.all()
 
 def create_sujet(db: Session, sujet: schemas.SujetCreate, user_id: Optional[int] = None) -> Sujet:
     # Convertir en dict
@@ -176,6 +324,31 @@ def update_preference(db: Session, user_id: int, preference_data: Dict[str, Any]
     db.refresh(preference)
     return preference
 
+def get_cohort_preferences(
+    db: Session,
+    faculty: Optional[str] = None,
+    level: Optional[str] = None
+) -> List[UserPreference]:
+    """Préférences des utilisateurs actifs d'une faculté / d'un niveau (recommandations par lot)"""
+    query = db.query(UserPreference).join(User, User.id == UserPreference.user_id).filter(
+        User.is_active == True
+    )
+    if faculty:
+        query = query.filter(func.lower(UserPreference.faculty).contains(faculty.lower(), autoescape=True))
+    if level:
+        query = query.filter(func.lower(UserPreference.level) == level.lower())
+    return query.order_by(UserPreference.user_id).all()
+
+def get_user_recommendations(db: Session, user_id: int, profile_hash: str, limit: int = 10) -> List[UserRecommendation]:
+    """Recommandations précalculées d'un utilisateur pour un profil donné (index user_id, rank)"""
+    return db.query(UserRecommendation).join(
+        Sujet, Sujet.id == UserRecommendation.sujet_id
+    ).options(contains_eager(UserRecommendation.sujet)).filter(
+        UserRecommendation.user_id == user_id,
+        UserRecommendation.profile_hash == profile_hash,
+        Sujet.is_active == True
+    ).order_by(UserRecommendation.rank).limit(limit).all()
+
 
 # ========== FEEDBACK FUNCTIONS ==========
 def create_feedback(db: Session, feedback: schemas.FeedbackCreate, user_id: int) -> Feedback:
@@ -186,11 +359,29 @@ def create_feedback(db: Session, feedback: schemas.FeedbackCreate, user_id: int)
     return db_feedback
 
 def get_user_feedbacks(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Feedback]:
-    return db.query(Feedback).filter(Feedback.user_id == user_id).offset(skip).limit(limit).all()
+    query = db.query(Feedback).filter(Feedback.user_id == user_id)
+    return pagination.order_by_keys(query, [Feedback.id]).offset(skip).limit(limit).all()
+
+def get_user_feedbacks_page(
+    db: Session, user_id: int, cursor: Optional[str] = None, limit: int = 100
+) -> Tuple[List[Feedback], Optional[str]]:
+    """Feedbacks d'un utilisateur par id croissant (comme get_user_feedbacks), par curseur"""
+    query = db.query(Feedback).filter(Feedback.user_id == user_id)
+    return pagination.paginate(query, [Feedback.id], limit, cursor=cursor)
 
 def get_sujet_feedbacks(db: Session, sujet_id: int, skip: int = 0, limit: int = 100) -> List[Feedback]:
     return db.query(Feedback).filter(Feedback.sujet_id == sujet_id).offset(skip).limit(limit).all()
 
+def get_feedback_interactions(db: Session) -> List[Any]:
+    """Tous les feedbacks, colonnes utiles au filtrage collaboratif uniquement"""
+    return db.query(
+        Feedback.id, Feedback.user_id, Feedback.sujet_id,
+        Feedback.rating, Feedback.pertinence, Feedback.intéressé, Feedback.sélectionné
+    ).order_by(Feedback.id).all()
+
+def get_user_feedback_sujet_ids(db: Session, user_id: int) -> List[int]:
+    return [row.sujet_id for row in db.query(Feedback.sujet_id).filter(Feedback.user_id == user_id).distinct()]
+
 
 # ========== SEARCH FUNCTIONS ==========
 def search_sujets_by_keywords(db: Session, keywords: List[str], limit: int = 10) -> List[Sujet]:
@@ -198,21 +389,81 @@ def search_sujets_by_keywords(db: Session, keywords: List[str], limit: int = 10)
         return []
     
     query = db.query(Sujet).filter(Sujet.is_active == True)
-    
-    import sqlalchemy as sa
-    conditions = []
-    for keyword in keywords:
-        keyword_pattern = f"%{keyword.lower()}%"
-        conditions.append(sa.func.lower(Sujet.keywords).like(keyword_pattern))
-        conditions.append(sa.func.lower(Sujet.titre).like(keyword_pattern))
-        conditions.append(sa.func.lower(Sujet.description).like(keyword_pattern))
-    
-    if conditions:
-        query = query.filter(sa.or_(*conditions))
+    query, score = fulltext.get_backend(db).search_any(db, query, keywords)
+    if score is not None:
+        query = query.order_by(score.desc())
     
     return query.order_by(Sujet.vue_count.desc()).limit(limit).all()
 
 
+FACET_FIELDS = ("domaine", "faculté", "niveau", "difficulté")
+
+def get_sujet_facets(
+    db: Session,
+    search: Optional[str] = None,
+    domaine: Optional[str] = None,
+    faculté: Optional[str] = None,
+    niveau: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    fuzzy: bool = False
+) -> Dict[str, Any]:
+    """
+    Nombre de sujets par valeur de chaque facette (domaine, faculté, niveau, difficulté)
+    et total, pour une recherche et des filtres, en une seule requête:
+    GROUPING SETS sous PostgreSQL, UNION ALL de GROUP BY ailleurs.
+    Facettes disjonctives: les comptes d'une facette appliquent tous les filtres sauf
+    le sien (choisir un domaine laisse voir les autres domaines et leurs comptes).
+    """
+    selected = dict(domaine=domaine, faculté=faculté, niveau=niveau, difficulté=difficulté)
+    conditions = {field: getattr(Sujet, field) == value for field, value in selected.items() if value}
+    # Recherche seule: les filtres sont appliqués facette par facette dans les comptes
+    query, _ = _sujets_query(db, search, is_active=True, fuzzy=fuzzy)
+
+    def count_except(excluded: Optional[str] = None):
+        clauses = [condition for field, condition in conditions.items() if field != excluded]
+        if not clauses:
+            return func.count(Sujet.id)
+        return func.count(case((and_(*clauses), Sujet.id)))
+
+    columns = [getattr(Sujet, field) for field in FACET_FIELDS]
+    facets: Dict[str, List[Dict[str, Any]]] = {field: [] for field in FACET_FIELDS}
+    total = 0
+
+    if db.get_bind().dialect.name == "postgresql":
+        rows = query.with_entities(
+            *columns,
+            *[func.grouping(column) for column in columns],
+            *[count_except(field) for field in FACET_FIELDS],
+            count_except()
+        ).group_by(func.grouping_sets(*columns, tuple_())).all()
+        size = len(FACET_FIELDS)
+        for row in rows:
+            values, groupings, counts = row[:size], row[size:2 * size], row[2 * size:3 * size]
+            grouped = [i for i, flag in enumerate(groupings) if flag == 0]
+            if not grouped:
+                total = row[-1]
+            elif values[grouped[0]] is not None and counts[grouped[0]]:
+                facets[FACET_FIELDS[grouped[0]]].append({"value": values[grouped[0]], "count": counts[grouped[0]]})
+    else:
+        parts = [
+            query.with_entities(
+                literal(field).label("facet"), column.label("value"), count_except(field).label("count")
+            ).group_by(column)
+            for field, column in zip(FACET_FIELDS, columns)
+        ]
+        total_part = query.with_entities(
+            literal("").label("facet"), literal(None).label("value"), count_except().label("count")
+        )
+        for facet, value, count in parts[0].union_all(*parts[1:], total_part).all():
+            if not facet:
+                total = count
+            elif value is not None and count:
+                facets[facet].append({"value": value, "count": count})
+
+    for values in facets.values():
+        values.sort(key=lambda v: (-v["count"], v["value"]))
+    return {"total": total, "facets": facets}
+
 # ========== USER PROFILE FUNCTIONS ==========
 def get_user_profile(db: Session, user_id: int) -> Optional[UserProfile]:
     return db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
@@ -53,7 +53,19 @@ def require_role(required_role: UserRole):
         return current_user
     return role_checker
 
+def require_any_role(*roles: UserRole):
+    """Dépendance pour vérifier que l'utilisateur a l'un des rôles donnés"""
+    def role_checker(current_user = Depends(get_current_active_user)):
+        if current_user.role not in roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Role {' ou '.join(role.value for role in roles)} required"
+            )
+        return current_user
+    return role_checker
+
 # Raccourcis pour les rôles spécifiques
 require_admin = require_role(UserRole.ADMIN)
 require_teacher = require_role(UserRole.TEACHER)
-require_student = require_role(UserRole.STUDENT)
\ No newline at end of file
+require_student = require_role(UserRole.STUDENT)
+require_staff = require_any_role(UserRole.ADMIN, UserRole.TEACHER)
\ No newline at end of file
@@ -0,0 +1,89 @@
+# app/export.py
+"""
+Export du catalog en flux (NDJSON ou CSV).
+
+Les lignes arrivent d'un curseur côté serveur (crud.iter_sujets, yield_per) et sont
+sérialisées par paquets de EXPORT_BATCH_SIZE: la mémoire utilisée ne dépend pas de
+la taille du catalog, et le client reçoit les premières lignes immédiatement.
+Pas d'objets ORM ni de modèles Pydantic: seulement des tuples de colonnes.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Iterable, Iterator, List
+
+from app.models import Sujet
+
+# Lignes lues par aller-retour avec la base et écrites par paquet
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+# Mêmes champs que schemas.Sujet
+EXPORT_FIELDS = (
+    "id", "titre", "keywords", "domaine", "faculté", "niveau", "problématique",
+    "méthodologie", "technologies", "description", "difficulté", "durée_estimée",
+    "ressources", "vue_count", "like_count", "is_active", "is_generated",
+    "user_id", "created_at", "updated_at",
+)
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def export_columns() -> List[Any]:
+    return [getattr(Sujet, field) for field in EXPORT_FIELDS]
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def iter_ndjson(rows: Iterable[tuple], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Un objet JSON par ligne"""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(
+            {field: _value(value) for field, value in zip(EXPORT_FIELDS, row)},
+            ensure_ascii=False
+        ))
+        if len(chunk) >= batch_size:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def iter_csv(rows: Iterable[tuple], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """CSV avec en-tête (séparateur ';', comme Sujet_EtudiantsB.csv); BOM pour Excel"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(EXPORT_FIELDS)
+    yield "﻿" + buffer.getvalue()
+
+    buffer.seek(0)
+    buffer.truncate()
+    count = 0
+    for row in rows:
+        writer.writerow([_value(value) for value in row])
+        count += 1
+        if count >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count:
+        yield buffer.getvalue()
+
+
+def serialize(rows: Iterable[tuple], format: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    if format == "csv":
+        return iter_csv(rows, batch_size)
+    return iter_ndjson(rows, batch_size)
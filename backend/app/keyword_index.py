@@ -0,0 +1,275 @@
+# app/keyword_index.py
+"""
+Index inversé des mots-clés des sujets.
+
+Remplace la comparaison SequenceMatcher (intérêt × mot-clé) faite à chaque
+requête par un index construit une seule fois à partir de `sujets.keywords`:
+- mots-clés normalisés (minuscules, sans accents) → ids des sujets
+- tokens → mots-clés qui les contiennent
+- n-grammes de caractères → mots-clés, pour le matching approximatif
+- n-grammes de caractères → sujets dont le titre les contient: le titre compte
+  comme un mot-clé de plus, à poids réduit (TITLE_WEIGHT)
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+NGRAM_SIZE = 3
+# En dessous de ce seuil, un mot-clé n'est pas considéré comme correspondant
+MIN_SIMILARITY = 0.3
+# Une correspondance avec le titre vaut moins qu'avec un mot-clé choisi par l'auteur
+TITLE_WEIGHT = 0.5
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_KEYWORD_SEPARATORS = re.compile(r"[,;]")
+
+
+# ======================
+# NORMALISATION
+# ======================
+
+def fold_accents(text: str) -> str:
+    """Supprime les accents: 'béton armé' -> 'beton arme'"""
+    if text.isascii():
+        return text
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def normalize_keyword(text: Optional[str]) -> str:
+    """Minuscules, sans accents, ponctuation remplacée par un espace"""
+    if not text:
+        return ""
+    return _NON_ALNUM.sub(" ", fold_accents(text).lower()).strip()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    normalized = normalize_keyword(text)
+    return normalized.split() if normalized else []
+
+
+def split_keywords(keywords: Optional[str]) -> List[str]:
+    """Découpe la colonne `keywords` (séparée par virgules) en mots-clés normalisés, sans doublons"""
+    if not keywords:
+        return []
+    seen = []
+    for raw in _KEYWORD_SEPARATORS.split(keywords):
+        term = normalize_keyword(raw)
+        if term and term not in seen:
+            seen.append(term)
+    return seen
+
+
+def char_ngrams(term: str, n: int = NGRAM_SIZE) -> FrozenSet[str]:
+    padded = f" {term} "
+    if len(padded) <= n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def ngram_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Coefficient de Dice entre deux ensembles de n-grammes (0.0 - 1.0)"""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def title_similarity(grams: FrozenSet[str], title_grams: FrozenSet[str]) -> float:
+    """Similarité pondérée (0.0 - TITLE_WEIGHT) d'un intérêt avec un titre, 0 sous MIN_SIMILARITY"""
+    similarity = ngram_similarity(grams, title_grams)
+    return similarity * TITLE_WEIGHT if similarity >= MIN_SIMILARITY else 0.0
+
+
+# ======================
+# INDEX
+# ======================
+
+class KeywordIndex:
+    """Index en mémoire des mots-clés du catalogue de sujets"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sujet_terms: Dict[int, Tuple[str, ...]] = {}
+        self._term_sujets: Dict[str, Set[int]] = defaultdict(set)
+        self._token_terms: Dict[str, Set[str]] = defaultdict(set)
+        self._term_ngrams: Dict[str, FrozenSet[str]] = {}
+        self._ngram_terms: Dict[str, Set[str]] = defaultdict(set)
+        self._sujet_title: Dict[int, FrozenSet[str]] = {}
+        self._ngram_titles: Dict[str, Set[int]] = defaultdict(set)
+        self.is_built = False
+
+    def __len__(self) -> int:
+        return len(self._sujet_terms.keys() | self._sujet_title.keys())
+
+    def build(self, rows: Iterable[Tuple[int, Optional[str], Optional[str]]]) -> None:
+        """Reconstruit l'index à partir de (sujet_id, keywords, titre)"""
+        with self._lock:
+            self._sujet_terms.clear()
+            self._term_sujets.clear()
+            self._token_terms.clear()
+            self._term_ngrams.clear()
+            self._ngram_terms.clear()
+            self._sujet_title.clear()
+            self._ngram_titles.clear()
+            for sujet_id, keywords, titre in rows:
+                self._add(sujet_id, keywords, titre)
+            self.is_built = True
+
+    def add(self, sujet_id: int, keywords: Optional[str], titre: Optional[str] = None) -> None:
+        with self._lock:
+            self._remove(sujet_id)
+            self._add(sujet_id, keywords, titre)
+
+    def remove(self, sujet_id: int) -> None:
+        with self._lock:
+            self._remove(sujet_id)
+
+    # Abonnement aux changements du catalog (catalog_events)
+    def upsert_sujet(self, row: Dict) -> None:
+        if self.is_built:
+            self.add(row["id"], row.get("keywords"), row.get("titre"))
+
+    def remove_sujet(self, sujet_id: int) -> None:
+        if self.is_built:
+            self.remove(sujet_id)
+
+    def _add(self, sujet_id: int, keywords: Optional[str], titre: Optional[str] = None) -> None:
+        title = normalize_keyword(titre)
+        if title:
+            grams = char_ngrams(title)
+            self._sujet_title[sujet_id] = grams
+            for gram in grams:
+                self._ngram_titles[gram].add(sujet_id)
+        terms = tuple(split_keywords(keywords))
+        if not terms:
+            return
+        self._sujet_terms[sujet_id] = terms
+        for term in terms:
+            if term not in self._term_ngrams:
+                grams = char_ngrams(term)
+                self._term_ngrams[term] = grams
+                for gram in grams:
+                    self._ngram_terms[gram].add(term)
+                for token in term.split():
+                    self._token_terms[token].add(term)
+            self._term_sujets[term].add(sujet_id)
+
+    def _remove(self, sujet_id: int) -> None:
+        for gram in self._sujet_title.pop(sujet_id, ()):
+            self._ngram_titles[gram].discard(sujet_id)
+            if not self._ngram_titles[gram]:
+                del self._ngram_titles[gram]
+        terms = self._sujet_terms.pop(sujet_id, ())
+        for term in terms:
+            sujets = self._term_sujets.get(term)
+            if sujets is None:
+                continue
+            sujets.discard(sujet_id)
+            if sujets:
+                continue
+            # Plus aucun sujet n'utilise ce mot-clé: on nettoie le vocabulaire
+            del self._term_sujets[term]
+            for gram in self._term_ngrams.pop(term, ()):
+                self._ngram_terms[gram].discard(term)
+                if not self._ngram_terms[gram]:
+                    del self._ngram_terms[gram]
+            for token in term.split():
+                self._token_terms[token].discard(term)
+                if not self._token_terms[token]:
+                    del self._token_terms[token]
+
+    def match_terms(self, interest: str, min_similarity: float = MIN_SIMILARITY) -> Dict[str, float]:
+        """Mots-clés du vocabulaire proches d'un intérêt, avec leur similarité"""
+        term = normalize_keyword(interest)
+        if not term:
+            return {}
+
+        with self._lock:
+            if term in self._term_sujets:
+                matches = {term: 1.0}
+            else:
+                matches = {}
+
+            grams = char_ngrams(term)
+            shared: Counter = Counter()
+            for gram in grams:
+                shared.update(self._ngram_terms.get(gram, ()))
+
+            for candidate, common in shared.items():
+                if candidate in matches:
+                    continue
+                similarity = 2 * common / (len(grams) + len(self._term_ngrams[candidate]))
+                if similarity >= min_similarity:
+                    matches[candidate] = similarity
+        return matches
+
+    def score(self, interests: List[str]) -> Dict[int, float]:
+        """
+        Score de correspondance (0-100) par sujet: moyenne, sur les intérêts,
+        de la meilleure similarité avec un mot-clé du sujet ou avec son titre (pondérée).
+        Seuls les sujets ayant au moins un mot-clé ou un titre proche sont retournés.
+        """
+        if not interests:
+            return {}
+
+        totals: Dict[int, float] = defaultdict(float)
+        with self._lock:
+            for interest in interests:
+                best: Dict[int, float] = {}
+                for term, similarity in self.match_terms(interest).items():
+                    for sujet_id in self._term_sujets.get(term, ()):
+                        if similarity > best.get(sujet_id, 0.0):
+                            best[sujet_id] = similarity
+                self._best_titles(interest, best)
+                for sujet_id, similarity in best.items():
+                    totals[sujet_id] += similarity
+
+        count = len(interests)
+        return {sujet_id: total / count * 100 for sujet_id, total in totals.items()}
+
+    def _best_titles(self, interest: str, best: Dict[int, float]) -> None:
+        """Relève dans `best` les sujets dont le titre est plus proche de l'intérêt que leurs mots-clés"""
+        term = normalize_keyword(interest)
+        if not term:
+            return
+        grams = char_ngrams(term)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._ngram_titles.get(gram, ()))
+        for sujet_id, common in shared.items():
+            similarity = 2 * common / (len(grams) + len(self._sujet_title[sujet_id]))
+            if similarity < MIN_SIMILARITY:
+                continue
+            if similarity * TITLE_WEIGHT > best.get(sujet_id, 0.0):
+                best[sujet_id] = similarity * TITLE_WEIGHT
+
+
+def keyword_match(sujet_keywords: Optional[str], user_keywords: List[str], titre: Optional[str] = None) -> float:
+    """
+    Matching direct (sans index) entre la colonne keywords (et le titre) d'un sujet et
+    des intérêts, même score que KeywordIndex.score (similarités sous MIN_SIMILARITY ignorées)
+    """
+    if not user_keywords:
+        return 0.0
+
+    sujet_grams = [char_ngrams(term) for term in split_keywords(sujet_keywords)]
+    title = normalize_keyword(titre)
+    title_grams = char_ngrams(title) if title else None
+    total = 0.0
+    for user_keyword in user_keywords:
+        term = normalize_keyword(user_keyword)
+        if not term or not (sujet_grams or title_grams):
+            continue
+        grams = char_ngrams(term)
+        best = max((ngram_similarity(grams, other) for other in sujet_grams), default=0.0)
+        if best < MIN_SIMILARITY:
+            best = 0.0
+        if title_grams:
+            best = max(best, title_similarity(grams, title_grams))
+        total += best
+    return total / len(user_keywords) * 100
+
+
+# Instance globale de l'index
+keyword_index = KeywordIndex()
@@ -0,0 +1,263 @@
+# app/llm_gateway.py
+"""
+Passerelle des appels LLM (Gemini) faits par les routes.
+
+En période d'examens, les rafales de /ai/chat, /ai/generate-three et /ai/analyze
+partaient toutes en même temps vers Gemini: erreurs 429 en amont puis délais
+d'attente en cascade. Chaque type d'opération a maintenant:
+- une limite d'appels simultanés (LLM_CONCURRENCY_<OP>)
+- une file d'attente bornée (LLM_QUEUE_<OP>): file pleine -> LLMOverloaded tout de
+  suite, transformée en 503 + Retry-After par main.py
+- une échéance par requête (LLM_DEADLINE_<OP>, secondes) qui couvre l'attente et
+  l'appel: dépassée dans la file -> LLMOverloaded; dépassée pendant l'appel ->
+  asyncio.TimeoutError, traitée comme une erreur LLM (réponse de secours)
+
+Équité: chaque utilisateur a au plus LLM_QUEUE_PER_USER appels en attente par type
+d'opération, et les places libérées sont attribuées à tour de rôle entre les
+utilisateurs en attente (pas dans l'ordre d'arrivée global): un utilisateur qui
+envoie beaucoup de requêtes n'attend que derrière lui-même. Les appels anonymes
+partagent une même file.
+
+Appels identiques (single-flight): un sujet populaire ouvert par beaucoup
+d'utilisateurs en même temps, ou les mêmes paramètres de génération envoyés par toute
+une classe, donnent exactement le même prompt. Avec une clé (empreinte du prompt
+rendu, voir llm_service.prompt_key), les appels concurrents de même clé partagent un
+seul appel amont et sa réponse brute, chacun la transformant ensuite de son côté.
+L'appel partagé ne prend qu'une place et ne dépend pas de l'appelant qui l'a lancé:
+s'il abandonne (client déconnecté), les autres reçoivent quand même la réponse.
+
+Seules les variantes async de llm_service passent par ici; les versions sync
+(scripts) ne sont pas limitées.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+ANONYMOUS = "anonymous"
+
+# Appel par défaut quand aucun n'a encore été mesuré (estimation de Retry-After)
+DEFAULT_CALL_SECONDS = float(os.getenv("LLM_DEFAULT_CALL_SECONDS", "5"))
+LLM_QUEUE_PER_USER = int(os.getenv("LLM_QUEUE_PER_USER", "2"))
+
+# Opération -> (appels simultanés, taille de la file, échéance en secondes)
+OPERATION_DEFAULTS = {
+    "chat": (4, 32, 30.0),
+    "generate": (2, 16, 60.0),
+    "analyze": (2, 16, 45.0),
+    "recommend": (2, 16, 45.0),
+}
+
+
+class LLMOverloaded(Exception):
+    """Appel LLM refusé (file pleine ou échéance dépassée dans la file)"""
+
+    def __init__(self, operation: str, reason: str, retry_after: int):
+        super().__init__(f"LLM surchargé ({operation}: {reason}), réessayer dans {retry_after}s")
+        self.operation = operation
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Lane:
+    """Limite de concurrence et file d'attente équitable d'un type d'opération"""
+
+    def __init__(self, operation: str, limit: int, queue_size: int, deadline: float):
+        self.operation = operation
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.deadline = deadline
+        self.active = 0
+        self.queued = 0
+        # Utilisateur -> appels en attente; l'ordre des clés est le tour de rôle
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._avg_seconds: Optional[float] = None
+        # Clé du prompt -> appel amont en cours (single-flight)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.flights = 0
+        self.coalesced = 0
+        self.admitted = 0
+        self.waited = 0
+        self.shed = 0
+        self.expired = 0
+        self.completed = 0
+        self.failed = 0
+
+    def retry_after(self) -> int:
+        """Secondes avant qu'une place se libère probablement"""
+        per_call = self._avg_seconds or DEFAULT_CALL_SECONDS
+        rounds = (self.queued + self.limit) / self.limit
+        return max(1, math.ceil(per_call * rounds))
+
+    def _reject(self, reason: str) -> LLMOverloaded:
+        if reason == "deadline":
+            self.expired += 1
+        else:
+            self.shed += 1
+        return LLMOverloaded(self.operation, reason, self.retry_after())
+
+    async def acquire(self, user_key: str, deadline_at: float) -> None:
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if self.queued >= self.queue_size:
+            raise self._reject("queue_full")
+        queue = self._waiting.get(user_key)
+        if queue is not None and len(queue) >= LLM_QUEUE_PER_USER:
+            raise self._reject("user_queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._waiting[user_key] = deque()
+        queue.append(future)
+        self.queued += 1
+        self.waited += 1
+
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, deadline_at - time.monotonic()))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Place transmise juste avant l'échéance: on la rend
+                self.release()
+            else:
+                self._discard(user_key, future)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject("deadline")
+            raise
+        self.admitted += 1
+
+    def _discard(self, user_key: str, future: asyncio.Future) -> None:
+        queue = self._waiting.get(user_key)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self.queued -= 1
+        if not queue:
+            del self._waiting[user_key]
+
+    def release(self) -> None:
+        """Libère une place: transmise au prochain utilisateur du tour de rôle"""
+        while self._waiting:
+            user_key, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._waiting.move_to_end(user_key)
+            else:
+                del self._waiting[user_key]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def record(self, seconds: float, ok: bool) -> None:
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        # Moyenne glissante de la durée des appels
+        self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "deadline": self.deadline,
+            "active": self.active,
+            "queued": self.queued,
+            "waiting_users": len(self._waiting),
+            "admitted": self.admitted,
+            "waited": self.waited,
+            "shed": self.shed,
+            "expired": self.expired,
+            "completed": self.completed,
+            "failed": self.failed,
+            # Appels amont avec clé / appels rattachés à un appel identique déjà en cours
+            "single_flight": {
+                "flights": self.flights,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            },
+            "avg_call_seconds": round(self._avg_seconds, 3) if self._avg_seconds is not None else None,
+        }
+
+
+def _lane_from_env(operation: str) -> _Lane:
+    limit, queue_size, deadline = OPERATION_DEFAULTS[operation]
+    name = operation.upper()
+    return _Lane(
+        operation,
+        int(os.getenv(f"LLM_CONCURRENCY_{name}", str(limit))),
+        int(os.getenv(f"LLM_QUEUE_{name}", str(queue_size))),
+        float(os.getenv(f"LLM_DEADLINE_{name}", str(deadline))),
+    )
+
+
+_lanes: Dict[str, _Lane] = {operation: _lane_from_env(operation) for operation in OPERATION_DEFAULTS}
+
+
+@asynccontextmanager
+async def slot(operation: str, user_key: Optional[str] = None):
+    """
+    Réserve une place pour un appel LLM; donne les secondes restantes avant
+    l'échéance. LLMOverloaded si la file est pleine ou l'échéance dépassée.
+    """
+    lane = _lanes[operation]
+    deadline_at = time.monotonic() + lane.deadline
+    await lane.acquire(user_key or ANONYMOUS, deadline_at)
+    started = time.monotonic()
+    ok = False
+    try:
+        yield max(0.0, deadline_at - started)
+        ok = True
+    finally:
+        lane.record(time.monotonic() - started, ok)
+        lane.release()
+
+
+async def _limited_call(operation: str, factory: Callable[[], Awaitable[Any]], user_key: Optional[str]) -> Any:
+    async with slot(operation, user_key) as remaining:
+        return await asyncio.wait_for(factory(), timeout=remaining)
+
+
+def _end_flight(lane: _Lane, key: str, task: asyncio.Task) -> None:
+    if lane._inflight.get(key) is task:
+        del lane._inflight[key]
+    # Erreur lue ici: pas d'avertissement si tous les appelants ont abandonné
+    if not task.cancelled():
+        task.exception()
+
+
+async def call(
+    operation: str,
+    factory: Callable[[], Awaitable[Any]],
+    user_key: Optional[str] = None,
+    key: Optional[str] = None
+) -> Any:
+    """
+    Exécute factory() dans une place de `operation`, borné par l'échéance. Avec `key`,
+    rejoint l'appel en cours de même clé s'il y en a un (single-flight).
+    """
+    if key is None:
+        return await _limited_call(operation, factory, user_key)
+
+    lane = _lanes[operation]
+    task = lane._inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_limited_call(operation, factory, user_key))
+        lane._inflight[key] = task
+        lane.flights += 1
+        task.add_done_callback(lambda done: _end_flight(lane, key, done))
+    else:
+        lane.coalesced += 1
+    # shield: l'annulation d'un appelant n'annule pas l'appel partagé
+    return await asyncio.shield(task)
+
+
+def gateway_stats() -> Dict[str, Dict[str, Any]]:
+    return {operation: lane.stats() for operation, lane in _lanes.items()}
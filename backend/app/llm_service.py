@@ -1,14 +1,21 @@
 # backend/app/llm_service.py
 
+import asyncio
+import hashlib
 import os
 import json
 import re
 import csv
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, AsyncIterator, Optional
 
 from dotenv import load_dotenv
 from datetime import datetime
 
+from app import llm_gateway
+from app.keyword_index import split_keywords
+from app.llm_gateway import LLMOverloaded
+
 load_dotenv()
 
 # ======================
@@ -17,6 +24,9 @@ load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemma-3-1b-it")
+# À incrémenter à chaque changement du prompt d'analyse: les analyses enregistrées
+# (Sujet.ai_analysis) d'une autre version sont recalculées
+ANALYSIS_PROMPT_VERSION = "1"
 
 # Cache global des sujets du CSV
 SUJETS_CSV_CACHE: List[Dict[str, Any]] = []
@@ -223,6 +233,7 @@ def build_sujets_vectorstore(persist_directory: Optional[str] = None):
                         "titre": s.get("titre", ""),
                         "domaine": s.get("domaine", ""),
                         "niveau": s.get("niveau", ""),
+                        "faculté": s.get("faculté", ""),
                         "statut": s.get("statut", ""),
                     },
                 )
@@ -269,11 +280,45 @@ def build_sujets_vectorstore(persist_directory: Optional[str] = None):
         SUJETS_VECTORSTORE = None
         return None
 
-def search_sujets_context(query: str, k: int = 5) -> List[Document]:
+def search_sujets_context(
+    query: str,
+    k: int = 5,
+    db=None,
+    texts: Optional[List[str]] = None,
+    **filters
+) -> List[Document]:
     """
     Recherche les documents les plus proches d'une requête.
     Utilisé pour fournir du contexte à l'IA (exemples réels, critères, etc.)
+
+    Recherche hybride (plein texte + vecteurs, voir app.retrieval) avec préfiltres
+    optionnels (domaine, niveau, faculté, is_active). Si les préfiltres laissent moins
+    de k documents, le contexte est complété sans eux.
     """
+    from app import retrieval
+    from app.database import SessionLocal
+
+    texts = texts or [query]
+    own_session = db is None
+    try:
+        if own_session:
+            db = SessionLocal()
+        docs = retrieval.hybrid_documents(db, texts, k=k, **filters)
+        relaxed = {key: value for key, value in filters.items() if key not in retrieval.FILTER_FIELDS}
+        if len(docs) < k and relaxed != filters:
+            seen = {retrieval.document_key(d) for d in docs}
+            for d in retrieval.hybrid_documents(db, texts, k=k, **relaxed):
+                if len(docs) >= k:
+                    break
+                if retrieval.document_key(d) not in seen:
+                    docs.append(d)
+        return docs
+    except Exception as e:
+        print(f"⚠️ Recherche hybride indisponible, recherche vectorielle seule: {e}")
+    finally:
+        if own_session and db is not None:
+            db.close()
+
     vs = build_sujets_vectorstore()
     if not vs:
         return []
@@ -287,6 +332,18 @@ def search_sujets_context(query: str, k: int = 5) -> List[Document]:
 # ANALYSE DE SUJET
 # ======================
 
+def prompt_key(rendered_prompt: str) -> str:
+    """Empreinte du prompt rendu et du modèle: clé single-flight de llm_gateway"""
+    return hashlib.sha256(f"{GEMINI_MODEL}\n{rendered_prompt}".encode("utf-8")).hexdigest()
+
+def _template_key(template: str, inputs: Dict[str, Any]) -> str:
+    # Même rendu que ChatPromptTemplate.from_template (format f-string)
+    return prompt_key(template.format(**inputs))
+
+def get_analysis_version() -> str:
+    """Version des analyses produites: prompt et modèle (ou analyse de secours sans LLM)"""
+    return f"{ANALYSIS_PROMPT_VERSION}/{GEMINI_MODEL if llm else 'fallback'}"
+
 def get_fallback_analysis(sujet_data: Dict[str, Any]) -> Dict[str, Any]:
     """Analyse de secours sans IA"""
     return {
@@ -313,30 +370,8 @@ def get_fallback_analysis(sujet_data: Dict[str, Any]) -> Dict[str, Any]:
         ],
     }
 
-def analyser_sujet(sujet_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Analyse un sujet avec LangChain, en tenant compte des critères du doyen et de la base CSV."""
-    if not llm:
-        return get_fallback_analysis(sujet_data)
-
-    criteria = get_acceptance_criteria()
-
-    # Recherche de contexte pertinent (sujets similaires + critères du doyen)
-    query = (
-        f"{sujet_data.get('titre','')} "
-        f"{sujet_data.get('domaine','')} "
-        f"{sujet_data.get('niveau','')} "
-        f"{sujet_data.get('keywords','')}"
-    )
-    retrieved_docs = search_sujets_context(query, k=5)
-
-    init_note = (
-        "NOTE: La base réelle de sujets étudiants n'est pas encore entièrement initialisée, "
-        "l'analyse repose donc surtout sur les critères du doyen et quelques exemples partiels.\n"
-        if not SUJETS_CSV_INITIALIZED
-        else ""
-    )
-
-    prompt_template = """
+# Prompt d'analyse des sujets (toute modification: incrémenter ANALYSIS_PROMPT_VERSION)
+ANALYSIS_PROMPT = """
     Tu es un expert en évaluation de sujets de mémoire universitaire (MemoBot).
     Tu dois évaluer un sujet comme le ferait un doyen d'université.
 
@@ -385,52 +420,106 @@ def analyser_sujet(sujet_data: Dict[str, Any]) -> Dict[str, Any]:
     }}
     """
 
-    try:
-        # Concaténation du contenu des documents récupérés
-        contexte_retrieved = ""
-        for d in retrieved_docs:
-            contexte_retrieved += f"\n---\n{d.page_content}\n"
+def _analysis_context(sujet_data: Dict[str, Any]) -> List[Document]:
+    """Recherche de contexte pertinent (sujets similaires + critères du doyen)"""
+    query = (
+        f"{sujet_data.get('titre','')} "
+        f"{sujet_data.get('domaine','')} "
+        f"{sujet_data.get('niveau','')} "
+        f"{sujet_data.get('keywords','')}"
+    )
+    # Titre et mots-clés comme requêtes lexicales séparées (OU), sujets du même domaine d'abord
+    return search_sujets_context(
+        query,
+        k=5,
+        texts=[sujet_data.get("titre", "")] + split_keywords(sujet_data.get("keywords", "")),
+        domaine=sujet_data.get("domaine") or None,
+    )
 
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | llm | StrOutputParser()
+def _analysis_chain(sujet_data: Dict[str, Any], retrieved_docs: List[Document]):
+    """Chaîne LangChain et entrées du prompt d'analyse"""
+    criteria = get_acceptance_criteria()
 
-        raw = chain.invoke(
-            {
-                "titre": sujet_data.get("titre", ""),
-                "domaine": sujet_data.get("domaine", ""),
-                "niveau": sujet_data.get("niveau", ""),
-                "faculté": sujet_data.get("faculté", ""),
-                "problematique": sujet_data.get("problématique", sujet_data.get("problematique", "")),
-                "description": sujet_data.get("description", ""),
-                "keywords": sujet_data.get("keywords", ""),
-                "criteres_acceptation": "\n- " + "\n- ".join(criteria["critères_acceptation"]),
-                "criteres_rejet": "\n- " + "\n- ".join(criteria["critères_rejet"]),
-                "message_doyen": criteria.get("message_doyen", ""),
-                "contexte_retrieved": contexte_retrieved or "Pas de contexte disponible.",
-                "init_note": init_note,
-            }
-        )
+    init_note = (
+        "NOTE: La base réelle de sujets étudiants n'est pas encore entièrement initialisée, "
+        "l'analyse repose donc surtout sur les critères du doyen et quelques exemples partiels.\n"
+        if not SUJETS_CSV_INITIALIZED
+        else ""
+    )
 
-        # Nettoyage de la sortie (enlever ```json, ``` etc.)
-        cleaned = raw.strip()
-        cleaned = cleaned.replace("```json", "").replace("```", "").strip()
+    # Concaténation du contenu des documents récupérés
+    contexte_retrieved = ""
+    for d in retrieved_docs:
+        contexte_retrieved += f"\n---\n{d.page_content}\n"
+
+    prompt = ChatPromptTemplate.from_template(ANALYSIS_PROMPT)
+    chain = prompt | llm | StrOutputParser()
+
+    return chain, {
+        "titre": sujet_data.get("titre", ""),
+        "domaine": sujet_data.get("domaine", ""),
+        "niveau": sujet_data.get("niveau", ""),
+        "faculté": sujet_data.get("faculté", ""),
+        "problematique": sujet_data.get("problématique", sujet_data.get("problematique", "")),
+        "description": sujet_data.get("description", ""),
+        "keywords": sujet_data.get("keywords", ""),
+        "criteres_acceptation": "\n- " + "\n- ".join(criteria["critères_acceptation"]),
+        "criteres_rejet": "\n- " + "\n- ".join(criteria["critères_rejet"]),
+        "message_doyen": criteria.get("message_doyen", ""),
+        "contexte_retrieved": contexte_retrieved or "Pas de contexte disponible.",
+        "init_note": init_note,
+    }
 
-        try:
-            parsed = json.loads(cleaned)
-        except json.JSONDecodeError as e:
-            print(f"⚠️ Erreur JSON brute dans analyser_sujet: {e}")
-            print(cleaned)
-            return get_fallback_analysis(sujet_data)
+def _parse_analysis(raw: str, sujet_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Réponse JSON du modèle -> analyse (analyse de secours si invalide)"""
+    # Nettoyage de la sortie (enlever ```json, ``` etc.)
+    cleaned = raw.strip()
+    cleaned = cleaned.replace("```json", "").replace("```", "").strip()
 
-        if not isinstance(parsed, dict):
+    try:
+        parsed = json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Erreur JSON brute dans analyser_sujet: {e}")
+        print(cleaned)
+        return get_fallback_analysis(sujet_data)
+
+    if not isinstance(parsed, dict):
+        return get_fallback_analysis(sujet_data)
+
+    for key in ["pertinence", "points_forts", "points_faibles", "suggestions", "recommandations"]:
+        if key not in parsed:
             return get_fallback_analysis(sujet_data)
 
-        for key in ["pertinence", "points_forts", "points_faibles", "suggestions", "recommandations"]:
-            if key not in parsed:
-                return get_fallback_analysis(sujet_data)
+    return parsed
+
+def analyser_sujet(sujet_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyse un sujet avec LangChain, en tenant compte des critères du doyen et de la base CSV."""
+    if not llm:
+        return get_fallback_analysis(sujet_data)
+
+    retrieved_docs = _analysis_context(sujet_data)
+    try:
+        chain, inputs = _analysis_chain(sujet_data, retrieved_docs)
+        return _parse_analysis(chain.invoke(inputs), sujet_data)
+    except Exception as e:
+        print(f"⚠️ Erreur dans analyser_sujet: {e}")
+        return get_fallback_analysis(sujet_data)
 
-        return parsed
+async def analyser_sujet_async(sujet_data: Dict[str, Any], user_key: Optional[str] = None) -> Dict[str, Any]:
+    """analyser_sujet sans bloquer la boucle d'événements (ainvoke)"""
+    if not llm:
+        return get_fallback_analysis(sujet_data)
 
+    # Recherche de contexte (base + Chroma) bloquante: dans un thread
+    retrieved_docs = await asyncio.to_thread(_analysis_context, sujet_data)
+    try:
+        chain, inputs = _analysis_chain(sujet_data, retrieved_docs)
+        raw = await llm_gateway.call(
+            "analyze", lambda: chain.ainvoke(inputs), user_key, key=_template_key(ANALYSIS_PROMPT, inputs)
+        )
+        return _parse_analysis(raw, sujet_data)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"⚠️ Erreur dans analyser_sujet: {e}")
         return get_fallback_analysis(sujet_data)
@@ -486,24 +575,7 @@ def fallback_recommendation(interests: List[str], sujets: List[Dict]) -> List[Di
     results.sort(key=lambda x: x["score"], reverse=True)
     return results
 
-def recommander_sujets_llm(
-    interests: List[str],
-    sujets: List[Dict],
-    critères: Dict[str, Any],
-) -> List[Dict[str, Any]]:
-    """Recommande des sujets avec LangChain"""
-    if not llm or not sujets:
-        return fallback_recommendation(interests, sujets)
-
-    sujets_text = ""
-    for sujet in sujets[:10]:
-        sujets_text += f"\n• ID: {sujet.get('id', 'N/A')}"
-        sujets_text += f" | Titre: {sujet.get('titre', 'Sans titre')}"
-        sujets_text += f" | Mots-clés: {sujet.get('keywords', '')}"
-        sujets_text += f" | Niveau: {sujet.get('niveau', 'N/A')}"
-        sujets_text += f" | Domaine: {sujet.get('domaine', 'Général')}"
-
-    prompt_template = """
+RECOMMENDATION_PROMPT = """
     Tu es un assistant spécialisé dans la recommandation de sujets de mémoire.
 
     **PROFIL ÉTUDIANT:**
@@ -535,32 +607,74 @@ def recommander_sujets_llm(
     Retourne seulement les 3-5 sujets les plus pertinents, triés par score décroissant.
     """
 
+def _recommendation_chain(interests: List[str], sujets: List[Dict], critères: Dict[str, Any]):
+    """Chaîne LangChain et entrées du prompt de recommandation"""
+    sujets_text = ""
+    for sujet in sujets[:10]:
+        sujets_text += f"\n• ID: {sujet.get('id', 'N/A')}"
+        sujets_text += f" | Titre: {sujet.get('titre', 'Sans titre')}"
+        sujets_text += f" | Mots-clés: {sujet.get('keywords', '')}"
+        sujets_text += f" | Niveau: {sujet.get('niveau', 'N/A')}"
+        sujets_text += f" | Domaine: {sujet.get('domaine', 'Général')}"
+
+    prompt = ChatPromptTemplate.from_template(RECOMMENDATION_PROMPT)
+    chain = prompt | llm | StrOutputParser()
+
+    return chain, {
+        "interests": ", ".join(interests) if interests else "Non spécifié",
+        "niveau": critères.get("niveau", "Non spécifié"),
+        "faculté": critères.get("faculté", "Non spécifiée"),
+        "domaine": critères.get("domaine", "Non spécifié"),
+        "difficulté": critères.get("difficulté", "moyenne"),
+        "sujets_text": sujets_text,
+    }
+
+def _parse_recommendations(response: str, interests: List[str], sujets: List[Dict]) -> List[Dict[str, Any]]:
     try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | llm | StrOutputParser()
+        json_match = re.search(r"\[.*\]", response, re.DOTALL)
+        if json_match:
+            json_str = json_match.group()
+            result = json.loads(json_str)
+            return result
+    except (json.JSONDecodeError, AttributeError) as e:
+        print(f"⚠️ Erreur parsing JSON recommandation: {e}")
 
-        response = chain.invoke(
-            {
-                "interests": ", ".join(interests) if interests else "Non spécifié",
-                "niveau": critères.get("niveau", "Non spécifié"),
-                "faculté": critères.get("faculté", "Non spécifiée"),
-                "domaine": critères.get("domaine", "Non spécifié"),
-                "difficulté": critères.get("difficulté", "moyenne"),
-                "sujets_text": sujets_text,
-            }
-        )
+    return fallback_recommendation(interests, sujets)
 
-        try:
-            json_match = re.search(r"\[.*\]", response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                result = json.loads(json_str)
-                return result
-        except (json.JSONDecodeError, AttributeError) as e:
-            print(f"⚠️ Erreur parsing JSON recommandation: {e}")
+def recommander_sujets_llm(
+    interests: List[str],
+    sujets: List[Dict],
+    critères: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Recommande des sujets avec LangChain"""
+    if not llm or not sujets:
+        return fallback_recommendation(interests, sujets)
 
+    try:
+        chain, inputs = _recommendation_chain(interests, sujets, critères)
+        return _parse_recommendations(chain.invoke(inputs), interests, sujets)
+    except Exception as e:
+        print(f"⚠️ Erreur recommandation LangChain: {e}")
+        return fallback_recommendation(interests, sujets)
+
+async def recommander_sujets_llm_async(
+    interests: List[str],
+    sujets: List[Dict],
+    critères: Dict[str, Any],
+    user_key: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """recommander_sujets_llm sans bloquer la boucle d'événements (ainvoke)"""
+    if not llm or not sujets:
         return fallback_recommendation(interests, sujets)
 
+    try:
+        chain, inputs = _recommendation_chain(interests, sujets, critères)
+        raw = await llm_gateway.call(
+            "recommend", lambda: chain.ainvoke(inputs), user_key, key=_template_key(RECOMMENDATION_PROMPT, inputs)
+        )
+        return _parse_recommendations(raw, interests, sujets)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"⚠️ Erreur recommandation LangChain: {e}")
         return fallback_recommendation(interests, sujets)
@@ -568,11 +682,7 @@ def recommander_sujets_llm(
 # ======================
 # RÉPONSE À UNE QUESTION
 # ======================
-def répondre_question(question: str, contexte: str = None) -> str:
-    """Répond DIRECTEMENT aux questions - version SIMPLIFIÉE et DIRECTE"""
-    if not llm:
-        return f"D'accord, je comprends ta question : '{question}'. Pourrais-tu me dire plus précisément ce que tu recherches ?"
-    
+def _question_prompt(question: str, contexte: str = None) -> str:
     # PROMPT ULTRA SIMPLE - PAS DE FORMALITÉS
     prompt = f"""
     Tu es MemoBot, assistant conversationnel pour aider les étudiants à trouver des sujets de mémoire.
@@ -590,52 +700,87 @@ def répondre_question(question: str, contexte: str = None) -> str:
     
     TA RÉPONSE (directe, naturelle, utile) :
     """
-    
+    return prompt
+
+# Longueur minimale d'une réponse (en dessous: réponse alternative)
+ANSWER_MIN_LENGTH = 10
+
+# Salutations automatiques retirées du début des réponses
+UNWANTED_STARTS = [
+    "Bonjour ! Je suis MemoBot",
+    "Je suis MemoBot",
+    "En tant que MemoBot",
+    "Bonjour,",
+    "Salut,",
+    "Hello,",
+]
+
+def strip_salutations(answer: str) -> str:
+    """NETTOYAGE : Enlever les salutations automatiques"""
+    for unwanted in UNWANTED_STARTS:
+        if answer.startswith(unwanted):
+            # Garder seulement après la salutation
+            answer = answer[len(unwanted):].strip()
+            # Supprimer la ponctuation qui suit
+            if answer.startswith(','):
+                answer = answer[1:].strip()
+            if answer.startswith('!'):
+                answer = answer[1:].strip()
+    return answer
+
+def _finish_answer(response, question: str) -> str:
+    """Texte de la réponse du modèle, nettoyé (réponse alternative si trop courte)"""
+    # Extraire le texte
+    if hasattr(response, 'content'):
+        answer = response.content.strip()
+    else:
+        answer = str(response).strip()
+
+    answer = strip_salutations(answer)
+
+    # Si la réponse est vide ou trop courte, réponse alternative
+    if not answer or len(answer) < ANSWER_MIN_LENGTH:
+        return question_short_answer(question)
+
+    return answer
+
+def question_short_answer(question: str) -> str:
+    return f"D'accord, je comprends que tu cherches : '{question}'. Qu'est-ce qui t'intéresse particulièrement dans ce domaine ?"
+
+def question_unavailable_answer(question: str) -> str:
+    return f"D'accord, je comprends ta question : '{question}'. Pourrais-tu me dire plus précisément ce que tu recherches ?"
+
+def question_error_answer(question: str) -> str:
+    return f"Je vois que tu parles de '{question[:50]}...'. C'est intéressant ! Dis-m'en plus sur ce que tu recherches exactement."
+
+def répondre_question(question: str, contexte: str = None) -> str:
+    """Répond DIRECTEMENT aux questions - version SIMPLIFIÉE et DIRECTE"""
+    if not llm:
+        return question_unavailable_answer(question)
+
     try:
         # Appel DIRECT sans LangChain complexe
-        response = llm.invoke(prompt)
-        
-        # Extraire le texte
-        if hasattr(response, 'content'):
-            answer = response.content.strip()
-        else:
-            answer = str(response).strip()
-        
-        # NETTOYAGE : Enlever les salutations automatiques
-        unwanted_starts = [
-            "Bonjour ! Je suis MemoBot",
-            "Je suis MemoBot",
-            "En tant que MemoBot",
-            "Bonjour,",
-            "Salut,",
-            "Hello,",
-        ]
-        
-        for unwanted in unwanted_starts:
-            if answer.startswith(unwanted):
-                # Garder seulement après la salutation
-                answer = answer[len(unwanted):].strip()
-                # Supprimer la ponctuation qui suit
-                if answer.startswith(','):
-                    answer = answer[1:].strip()
-                if answer.startswith('!'):
-                    answer = answer[1:].strip()
-        
-        # Si la réponse est vide ou trop courte, réponse alternative
-        if not answer or len(answer) < 10:
-            return f"D'accord, je comprends que tu cherches : '{question}'. Qu'est-ce qui t'intéresse particulièrement dans ce domaine ?"
-        
-        return answer
-        
+        return _finish_answer(llm.invoke(_question_prompt(question, contexte)), question)
     except Exception as e:
         print(f"⚠️ Erreur dans répondre_question: {e}")
-        return f"Je vois que tu parles de '{question[:50]}...'. C'est intéressant ! Dis-m'en plus sur ce que tu recherches exactement."
-# Remplacer la fonction répondre_question_cohérente par :
-def répondre_question_cohérente(question: str, contexte: str = None, user_preferences: Dict = None) -> str:
-    """Version améliorée qui utilise les préférences utilisateur"""
+        return question_error_answer(question)
+
+async def répondre_question_async(question: str, contexte: str = None, user_key: Optional[str] = None) -> str:
+    """répondre_question sans bloquer la boucle d'événements (ainvoke)"""
     if not llm:
-        return f"Je comprends : '{question}'. Pourrais-tu préciser par rapport à notre discussion ?"
-    
+        return question_unavailable_answer(question)
+
+    try:
+        prompt = _question_prompt(question, contexte)
+        response = await llm_gateway.call("chat", lambda: llm.ainvoke(prompt), user_key, key=prompt_key(prompt))
+        return _finish_answer(response, question)
+    except LLMOverloaded:
+        raise
+    except Exception as e:
+        print(f"⚠️ Erreur dans répondre_question: {e}")
+        return question_error_answer(question)
+
+def _coherent_prompt(question: str, contexte: str = None, user_preferences: Dict = None) -> str:
     # Construire le contexte utilisateur
     user_context = ""
     if user_preferences:
@@ -676,20 +821,162 @@ def répondre_question_cohérente(question: str, contexte: str = None, user_pref
     
     **TA RÉPONSE (en français, naturel) :**
     """
-    
+    return prompt
+
+COHERENT_UNAVAILABLE_ANSWER = "Je comprends : '{question}'. Pourrais-tu préciser par rapport à notre discussion ?"
+COHERENT_EMPTY_ANSWER = "Je vois que vous cherchez des idées. Pourriez-vous me dire quel domaine vous intéresse ?"
+COHERENT_ERROR_ANSWER = "Je comprends votre question. Pourriez-vous préciser votre domaine d'étude et vos centres d'intérêt ?"
+
+def _finish_coherent_answer(response) -> str:
+    answer = response.content if hasattr(response, 'content') else str(response)
+
+    # Nettoyage basique
+    answer = answer.strip()
+
+    return answer if answer else COHERENT_EMPTY_ANSWER
+
+# Remplacer la fonction répondre_question_cohérente par :
+def répondre_question_cohérente(question: str, contexte: str = None, user_preferences: Dict = None) -> str:
+    """Version améliorée qui utilise les préférences utilisateur"""
+    if not llm:
+        return COHERENT_UNAVAILABLE_ANSWER.format(question=question)
+
     try:
-        response = llm.invoke(prompt)
-        answer = response.content if hasattr(response, 'content') else str(response)
-        
-        # Nettoyage basique
-        answer = answer.strip()
-        
-        return answer if answer else "Je vois que vous cherchez des idées. Pourriez-vous me dire quel domaine vous intéresse ?"
-        
+        return _finish_coherent_answer(llm.invoke(_coherent_prompt(question, contexte, user_preferences)))
     except Exception as e:
         print(f"⚠️ Erreur dans répondre_question_cohérente: {e}")
-        return "Je comprends votre question. Pourriez-vous préciser votre domaine d'étude et vos centres d'intérêt ?"
+        return COHERENT_ERROR_ANSWER
+
+async def répondre_question_cohérente_async(
+    question: str,
+    contexte: str = None,
+    user_preferences: Dict = None,
+    user_key: Optional[str] = None
+) -> str:
+    """répondre_question_cohérente sans bloquer la boucle d'événements (ainvoke)"""
+    if not llm:
+        return COHERENT_UNAVAILABLE_ANSWER.format(question=question)
+
+    try:
+        prompt = _coherent_prompt(question, contexte, user_preferences)
+        response = await llm_gateway.call("chat", lambda: llm.ainvoke(prompt), user_key, key=prompt_key(prompt))
+        return _finish_coherent_answer(response)
+    except LLMOverloaded:
+        raise
+    except Exception as e:
+        print(f"⚠️ Erreur dans répondre_question_cohérente: {e}")
+        return COHERENT_ERROR_ANSWER
+
+
+# ======================
+# RÉPONSES EN FLUX (SSE)
+# ======================
+
+class SalutationFilter:
+    """
+    strip_salutations appliqué au fil des morceaux d'une réponse en flux: le début
+    est retenu tant qu'il peut encore devenir une salutation (ou est trop court),
+    puis tout passe directement.
+    """
+
+    def __init__(self, min_length: int = ANSWER_MIN_LENGTH):
+        self.min_length = min_length
+        self.buffer = ""
+        self.started = False
+
+    def feed(self, text: str) -> str:
+        if self.started:
+            return text
+        self.buffer += text
+        cleaned = strip_salutations(self.buffer.lstrip())
+        if len(cleaned) < self.min_length or any(unwanted.startswith(cleaned) for unwanted in UNWANTED_STARTS):
+            return ""
+        self.started = True
+        # strip_salutations retire aussi les espaces de fin: ils séparent du morceau suivant
+        return cleaned + self.buffer[len(self.buffer.rstrip()):]
+
+    def finish(self, short_answer: str) -> str:
+        """Fin du flux: texte encore retenu, ou réponse alternative s'il est trop court"""
+        if self.started:
+            return ""
+        cleaned = strip_salutations(self.buffer.strip())
+        return cleaned if len(cleaned) >= self.min_length else short_answer
+
+def _chunk_text(chunk) -> str:
+    return chunk.content if hasattr(chunk, 'content') else str(chunk)
+
+async def _stream_answer(
+    prompt: str,
+    user_key: Optional[str],
+    short_answer: str,
+    error_answer: str,
+    min_length: int = ANSWER_MIN_LENGTH
+) -> AsyncIterator[str]:
+    """
+    Morceaux de la réponse (llm.astream), nettoyés au fil de l'eau. Occupe une place
+    "chat" de llm_gateway pendant tout le flux (LLMOverloaded avant le premier morceau
+    si la file est pleine); l'échéance s'applique à l'ensemble du flux.
+    """
+    async with llm_gateway.slot("chat", user_key) as remaining:
+        deadline_at = time.monotonic() + remaining
+        cleaner = SalutationFilter(min_length)
+        sent = False
+        try:
+            chunks = llm.astream(prompt).__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        chunks.__anext__(), timeout=max(0.0, deadline_at - time.monotonic())
+                    )
+                except StopAsyncIteration:
+                    break
+                text = cleaner.feed(_chunk_text(chunk))
+                if text:
+                    sent = True
+                    yield text
+        except Exception as e:
+            print(f"⚠️ Erreur dans le flux de réponse: {e}")
+            # Déjà commencée: la réponse s'arrête là
+            if not sent:
+                yield error_answer
+            return
+
+        rest = cleaner.finish(short_answer)
+        if rest:
+            yield rest
+
+async def répondre_question_stream(
+    question: str,
+    contexte: str = None,
+    user_key: Optional[str] = None
+) -> AsyncIterator[str]:
+    """répondre_question en flux (morceaux de texte au fur et à mesure)"""
+    if not llm:
+        yield question_unavailable_answer(question)
+        return
+
+    async for text in _stream_answer(
+        _question_prompt(question, contexte), user_key,
+        question_short_answer(question), question_error_answer(question)
+    ):
+        yield text
+
+async def répondre_question_cohérente_stream(
+    question: str,
+    contexte: str = None,
+    user_preferences: Dict = None,
+    user_key: Optional[str] = None
+) -> AsyncIterator[str]:
+    """répondre_question_cohérente en flux, salutations retirées comme dans répondre_question"""
+    if not llm:
+        yield COHERENT_UNAVAILABLE_ANSWER.format(question=question)
+        return
 
+    async for text in _stream_answer(
+        _coherent_prompt(question, contexte, user_preferences), user_key,
+        COHERENT_EMPTY_ANSWER, COHERENT_ERROR_ANSWER, min_length=1
+    ):
+        yield text
 
 # ======================
 # GÉNÉRATION DE SUJETS
@@ -728,12 +1015,7 @@ def generate_default_subjects(params: Dict[str, Any], count: int) -> List[Dict[s
 
     return subjects
 
-def générer_sujets_llm(params: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
-    """Génère des sujets avec LangChain"""
-    if not llm:
-        return generate_default_subjects(params, count)
-
-    prompt_template = """
+GENERATION_PROMPT = """
     Tu es un générateur de sujets de mémoire universitaires.
 
     **SPÉCIFICATIONS:**
@@ -768,39 +1050,64 @@ def générer_sujets_llm(params: Dict[str, Any], count: int) -> List[Dict[str, A
     Génère exactement {count} sujets originaux, pertinents et réalisables.
     """
 
+def _generation_chain(params: Dict[str, Any], count: int):
+    """Chaîne LangChain et entrées du prompt de génération"""
+    prompt = ChatPromptTemplate.from_template(GENERATION_PROMPT)
+    chain = prompt | llm | StrOutputParser()
+
+    return chain, {
+        "interests": params.get("interests", "Recherche académique"),
+        "domaine": params.get("domaine", "Général"),
+        "niveau": params.get("niveau", "L3"),
+        "faculté": params.get("faculté", "Sciences"),
+        "count": count,
+    }
+
+def _parse_generated(response: str, params: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
     try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | llm | StrOutputParser()
+        json_match = re.search(r"\[.*\]", response, re.DOTALL)
+        if json_match:
+            json_str = json_match.group()
+            sujets = json.loads(json_str)
 
-        response = chain.invoke(
-            {
-                "interests": params.get("interests", "Recherche académique"),
-                "domaine": params.get("domaine", "Général"),
-                "niveau": params.get("niveau", "L3"),
-                "faculté": params.get("faculté", "Sciences"),
-                "count": count,
-            }
-        )
+            for sujet in sujets:
+                sujet["domaine"] = params.get("domaine", "Général")
+                sujet["niveau"] = params.get("niveau", "L3")
+                sujet["faculté"] = params.get("faculté", "Sciences")
+                sujet["original"] = True
+                sujet["generated_at"] = datetime.utcnow().isoformat()
 
-        try:
-            json_match = re.search(r"\[.*\]", response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                sujets = json.loads(json_str)
-
-                for sujet in sujets:
-                    sujet["domaine"] = params.get("domaine", "Général")
-                    sujet["niveau"] = params.get("niveau", "L3")
-                    sujet["faculté"] = params.get("faculté", "Sciences")
-                    sujet["original"] = True
-                    sujet["generated_at"] = datetime.utcnow().isoformat()
-
-                return sujets[:count]
-        except (json.JSONDecodeError, AttributeError) as e:
-            print(f"⚠️ Erreur parsing JSON génération: {e}")
+            return sujets[:count]
+    except (json.JSONDecodeError, AttributeError) as e:
+        print(f"⚠️ Erreur parsing JSON génération: {e}")
+
+    return generate_default_subjects(params, count)
 
+def générer_sujets_llm(params: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
+    """Génère des sujets avec LangChain"""
+    if not llm:
+        return generate_default_subjects(params, count)
+
+    try:
+        chain, inputs = _generation_chain(params, count)
+        return _parse_generated(chain.invoke(inputs), params, count)
+    except Exception as e:
+        print(f"⚠️ Erreur génération LangChain: {e}")
+        return generate_default_subjects(params, count)
+
+async def générer_sujets_llm_async(params: Dict[str, Any], count: int, user_key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """générer_sujets_llm sans bloquer la boucle d'événements (ainvoke)"""
+    if not llm:
         return generate_default_subjects(params, count)
 
+    try:
+        chain, inputs = _generation_chain(params, count)
+        raw = await llm_gateway.call(
+            "generate", lambda: chain.ainvoke(inputs), user_key, key=_template_key(GENERATION_PROMPT, inputs)
+        )
+        return _parse_generated(raw, params, count)
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"⚠️ Erreur génération LangChain: {e}")
         return generate_default_subjects(params, count)
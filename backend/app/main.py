@@ -1,9 +1,12 @@
 # app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal
 from app.routes import auth, sujets, users, ai, settings, stats,admin
 from app.llm_service import build_sujets_vectorstore  # initialisation Chroma
+from app.llm_gateway import LLMOverloaded
+from app.retrieval import index_catalog_vectors
 from dotenv import load_dotenv
 load_dotenv()
 import os
@@ -30,6 +33,12 @@ async def startup_init_vectorstore():
     try:
         print("🔎 Initialisation du vecteur store des sujets...")
         build_sujets_vectorstore(persist_directory=VECTORDIR)
+        # Sujets du catalog: embeddings calculés en arrière-plan, pas à la première recherche
+        db = SessionLocal()
+        try:
+            index_catalog_vectors(db)
+        finally:
+            db.close()
     except Exception as e:
         # On ne bloque pas le démarrage si ça échoue, on log juste.
         print(f"⚠️ Impossible d'initialiser le vecteur store au startup: {e}")
@@ -49,10 +58,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimated", "Retry-After"],
     max_age=3600
 )
 
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloaded):
+    """File d'attente LLM pleine ou échéance dépassée (voir app/llm_gateway.py)"""
+    return JSONResponse(
+        status_code=503,
+        content={
+            "detail": "Le service IA est très sollicité, veuillez réessayer dans quelques instants.",
+            "operation": exc.operation,
+            "reason": exc.reason,
+        },
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 
 # Inclure les routes avec le préfixe /api/v1
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
@@ -113,8 +135,14 @@ async def get_system_info():
 async def system_status():
     """Check system status"""
     from datetime import datetime
+    from app.catalog_events import get_catalog_version
+    from app.cache import cache_stats
+    from app.llm_gateway import gateway_stats
     return {
         "status": "online",
+        "catalog_version": get_catalog_version(),
+        "caches": cache_stats(),
+        "llm_gateway": gateway_stats(),
         "timestamp": datetime.utcnow().isoformat(),
         "uptime": "0 days"  # Vous pourriez calculer l'uptime réel ici
     }
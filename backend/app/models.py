@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -78,12 +78,25 @@ class Sujet(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
 
+    # Sous PostgreSQL: colonne générée `search_vector` (tsvector + index GIN),
+    # volontairement non mappée, voir app/search.py
+
     # Relations
     feedbacks = relationship("Feedback", back_populates="sujet")
     history_entries = relationship("UserHistory", back_populates="sujet")
     user = relationship("User")
 
 
+class SujetChange(Base):
+    """Outbox des écritures sur les sujets, rejouée par les autres workers"""
+    __tablename__ = "sujet_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sujet_id = Column(Integer, nullable=False, index=True)
+    operation = Column(String(20), nullable=False)  # "upsert" ou "delete"
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class Feedback(Base):
     __tablename__ = "feedbacks"
 
@@ -195,3 +208,26 @@ class UserSettings(Base):
 
     # Relation
     user = relationship("User", back_populates="settings")
+
+
+class UserRecommendation(Base):
+    """Top-K précalculé par utilisateur (job precompute_recommendations)"""
+    __tablename__ = "user_recommendations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    sujet_id = Column(Integer, ForeignKey("sujets.id", ondelete="CASCADE"), nullable=False)
+    rank = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    raisons = Column(JSON, nullable=True)
+    # Empreinte des préférences utilisées et position de l'outbox sujet_changes au calcul
+    profile_hash = Column(String(64), nullable=False)
+    catalog_position = Column(Integer, nullable=False, default=0)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_user_recommendations_user_rank", "user_id", "rank"),
+    )
+
+    # Relation
+    sujet = relationship("Sujet")
@@ -0,0 +1,162 @@
+# app/pagination.py
+"""
+Pagination par curseur (keyset) pour les listes du catalog et de l'admin.
+
+OFFSET n relit puis jette n lignes: plus on va loin, plus la page est lente.
+Ici la page suivante repart de la dernière ligne vue:
+    WHERE clé < dernière clé OR (clé = dernière clé AND id < dernier id)
+et son coût ne dépend plus de la profondeur.
+
+Clés de tri:
+- listes: l'id seul (suit la date de création, et indexé), croissant: l'ordre
+  d'avant la pagination par curseur, que les clients en skip/limit attendent
+- recherches classées: (pertinence, id), décroissantes
+
+Le curseur est opaque pour les clients (JSON en base64 url-safe). Il contient les
+valeurs de tri de la dernière ligne et, si besoin, l'état de la recherche qui a
+produit la page (ex: recherche approchée).
+
+Les listes gardent skip/limit pour compatibilité: les deux modes trient pareil.
+"""
+import base64
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+# En dessous de ce nombre estimé de lignes, le total exact est calculé (COUNT peu coûteux)
+EXACT_COUNT_THRESHOLD = int(os.getenv("PAGINATION_EXACT_COUNT_THRESHOLD", "1000"))
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_ESTIMATED_HEADER = "X-Total-Count-Estimated"
+
+
+# ======================
+# CURSEURS
+# ======================
+
+def encode_cursor(values: Sequence[Any], state: Optional[Dict[str, Any]] = None) -> str:
+    payload = {"k": list(values)}
+    if state:
+        payload["s"] = state
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_payload(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or not isinstance(payload.get("k"), list):
+            raise ValueError
+        return payload
+    except (ValueError, TypeError):
+        raise ValueError("Curseur de pagination invalide")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Valeurs de tri d'un curseur (ValueError si le curseur est invalide)"""
+    payload = _decode_payload(cursor)
+    values = payload["k"]
+    if len(values) != size or not all(isinstance(v, (int, float)) for v in values):
+        raise ValueError("Curseur de pagination invalide")
+    return values
+
+
+def cursor_state(cursor: Optional[str]) -> Dict[str, Any]:
+    """État de recherche enregistré dans un curseur ({} sans curseur)"""
+    if not cursor:
+        return {}
+    state = _decode_payload(cursor).get("s") or {}
+    return state if isinstance(state, dict) else {}
+
+
+# ======================
+# REQUÊTES
+# ======================
+
+def is_descending(keys: Sequence[Any]) -> bool:
+    """Recherche classée (pertinence, id): décroissant; liste (id seul): croissant"""
+    return len(keys) > 1
+
+
+def seek_condition(keys: Sequence[Any], values: Sequence[Any]):
+    """Lignes strictement après `values` dans l'ordre de tri de `keys`"""
+    descending = is_descending(keys)
+    clauses = []
+    for i, key in enumerate(keys):
+        equal_before = [keys[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_before, key < values[i] if descending else key > values[i]))
+    # Borne sur la première clé: utilisable par un index
+    bound = keys[0] <= values[0] if descending else keys[0] >= values[0]
+    return and_(bound, or_(*clauses))
+
+
+def order_by_keys(query, keys: Sequence[Any]):
+    """Tri sur `keys` (partagé par les modes offset et curseur), voir is_descending"""
+    if is_descending(keys):
+        return query.order_by(*[key.desc() for key in keys])
+    return query.order_by(*[key.asc() for key in keys])
+
+
+def paginate(
+    query,
+    keys: Sequence[Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    state: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Une page de `query` (non triée) triée par `keys` (voir is_descending). La dernière
+    clé doit être unique (id) et les clés non nulles.
+    Retourne (éléments, curseur de la page suivante ou None).
+    """
+    if cursor:
+        query = query.filter(seek_condition(keys, decode_cursor(cursor, len(keys))))
+    labelled = [key.label(f"page_key_{i}") for i, key in enumerate(keys)]
+    rows = order_by_keys(query.add_columns(*labelled), keys).limit(limit + 1).all()
+
+    items = [row[0] for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(list(rows[limit - 1][1:]), state)
+    return items, next_cursor
+
+
+def estimate_count(db: Session, query) -> Tuple[int, bool]:
+    """
+    Nombre de lignes de `query`: (total, exact).
+    Sous PostgreSQL, estimation du planificateur (EXPLAIN, statistiques de la table)
+    sans parcourir les lignes; COUNT exact si l'estimation est petite ou ailleurs.
+    """
+    query = query.order_by(None)
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql":
+        try:
+            compiled = query.statement.compile(dialect=bind.dialect)
+            # Savepoint: une erreur d'EXPLAIN n'annule pas la transaction en cours
+            with db.begin_nested():
+                plan = db.connection().exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+                ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]["Plan"]["Plan Rows"])
+            if estimate >= EXACT_COUNT_THRESHOLD:
+                return estimate, False
+        except Exception as e:
+            print(f"⚠️ Estimation du nombre de lignes impossible: {e}")
+    return query.count(), True
+
+
+def set_page_headers(response, next_cursor: Optional[str], total: Optional[Tuple[int, bool]] = None) -> None:
+    """En-têtes de pagination d'une liste: curseur suivant et total (estimé ou exact)"""
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if total is not None:
+        count, exact = total
+        response.headers[TOTAL_COUNT_HEADER] = str(count)
+        response.headers[TOTAL_ESTIMATED_HEADER] = "false" if exact else "true"
@@ -0,0 +1,256 @@
+# app/precompute.py
+"""
+Recommandations personnalisées précalculées (table `user_recommendations`).
+
+Le job (precompute_recommendations.py, lancé la nuit) calcule le top-K de chaque
+utilisateur actif à partir de ses préférences (interests / faculty / level).
+Seuls sont recalculés les utilisateurs:
+- dont les préférences ont changé (empreinte `profile_hash` différente)
+- qui ont donné de nouveaux feedbacks (bonus du filtrage collaboratif)
+- dont un sujet recommandé a changé, ou pour qui un sujet modifié depuis le
+  dernier calcul (outbox `sujet_changes`) entrerait dans le top-K
+
+/ai/recommend sert ces lignes en une requête indexée quand la demande correspond
+au profil stocké.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import crud, models
+from app.catalog_matrix import NUMPY_AVAILABLE, CatalogMatrix
+from app.keyword_index import keyword_match, normalize_keyword
+from app.recommendation import CRITERIA_WEIGHT, MIN_SCORE, recommendation_engine
+
+# Nombre de recommandations stockées par utilisateur
+PRECOMPUTE_TOP_K = int(os.getenv("PRECOMPUTE_TOP_K", "10"))
+# Utilisateurs écrits par transaction
+PRECOMPUTE_COMMIT_EVERY = 200
+
+
+# ======================
+# PROFILS
+# ======================
+
+def split_interests(interests: Optional[str]) -> List[str]:
+    """Colonne UserPreference.interests (séparée par virgules) -> liste"""
+    return [i.strip() for i in (interests or "").split(",") if i.strip()]
+
+
+def profile_hash(interests: List[str], niveau: Optional[str], faculté: Optional[str]) -> str:
+    """Empreinte d'un profil: ordre et accents des intérêts sans importance (comme le scoring)"""
+    terms = sorted({normalize_keyword(i) for i in interests} - {""})
+    payload = json.dumps([terms, (niveau or "").strip().lower(), (faculté or "").strip().lower()])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def preference_profile(preference: models.UserPreference) -> Dict[str, Any]:
+    return {
+        "user_id": preference.user_id,
+        "interests": split_interests(preference.interests),
+        "niveau": preference.level,
+        "faculté": preference.faculty,
+        "domaine": None,
+        "difficulté": None
+    }
+
+
+# ======================
+# LECTURE (API)
+# ======================
+
+def get_precomputed_recommendations(
+    db: Session,
+    user_id: int,
+    interests: List[str],
+    niveau: Optional[str] = None,
+    faculté: Optional[str] = None,
+    limit: int = 10
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Recommandations stockées si la demande correspond au profil précalculé.
+    None quand il faut calculer en direct (profil différent, pas assez de lignes).
+    """
+    rows = crud.get_user_recommendations(
+        db, user_id, profile_hash(interests, niveau, faculté), limit=limit
+    )
+    if len(rows) < limit:
+        return None
+    return [
+        {
+            "sujet": row.sujet,
+            "score": row.score,
+            "raisons": row.raisons or [],
+            "critères_respectés": row.raisons or []
+        }
+        for row in rows
+    ]
+
+
+# ======================
+# JOB DE PRÉCALCUL
+# ======================
+
+def _affected_by_catalog(
+    db: Session,
+    profiles: Dict[int, Dict[str, Any]],
+    stored: Dict[int, Any],
+    top_k: int
+) -> Set[int]:
+    """Utilisateurs dont le top-K peut changer à cause des sujets modifiés depuis leur calcul"""
+    if not profiles:
+        return set()
+
+    since = min(stored[user_id].catalog_position for user_id in profiles)
+    changes = db.query(models.SujetChange.id, models.SujetChange.sujet_id).filter(
+        models.SujetChange.id > since
+    ).all()
+    if not changes:
+        return set()
+
+    changed_ids = {change.sujet_id for change in changes}
+    last_change = {}
+    for change in changes:
+        last_change[change.sujet_id] = max(change.id, last_change.get(change.sujet_id, 0))
+
+    affected = set()
+
+    # 1. Un sujet recommandé a été modifié ou supprimé
+    for row in db.query(models.UserRecommendation.user_id, models.UserRecommendation.sujet_id).filter(
+        models.UserRecommendation.user_id.in_(list(profiles)),
+        models.UserRecommendation.sujet_id.in_(changed_ids)
+    ):
+        if last_change[row.sujet_id] > stored[row.user_id].catalog_position:
+            affected.add(row.user_id)
+
+    # 2. Un sujet (nouveau ou modifié) dépasse le moins bon score stocké
+    changed = db.query(
+        models.Sujet.id, models.Sujet.keywords, models.Sujet.titre, models.Sujet.niveau,
+        models.Sujet.faculté, models.Sujet.domaine, models.Sujet.difficulté
+    ).filter(models.Sujet.id.in_(changed_ids), models.Sujet.is_active == True).all()
+    if not changed:
+        return affected
+
+    matrix = None
+    if NUMPY_AVAILABLE:
+        matrix = CatalogMatrix()
+        matrix.build([tuple(row) for row in changed])
+
+    for user_id, profile in profiles.items():
+        if user_id in affected:
+            continue
+        state = stored[user_id]
+        threshold = state.min_score if state.count >= top_k else MIN_SCORE
+        recent = [row for row in changed if last_change[row.id] > state.catalog_position]
+        if not recent:
+            continue
+
+        if matrix is not None:
+            scores, _, ids = matrix.score(
+                profile["interests"], CRITERIA_WEIGHT,
+                niveau=profile["niveau"], faculté=profile["faculté"]
+            )
+            recent_ids = {row.id for row in recent}
+            if any(score > threshold for score, sujet_id in zip(scores, ids) if int(sujet_id) in recent_ids):
+                affected.add(user_id)
+            continue
+
+        for row in recent:
+            keyword_score = keyword_match(row.keywords, profile["interests"], row.titre) if profile["interests"] else None
+            score, _ = recommendation_engine.score_sujet(
+                row, keyword_score, niveau=profile["niveau"], faculté=profile["faculté"]
+            )
+            if score > threshold:
+                affected.add(user_id)
+                break
+
+    return affected
+
+
+def refresh_user_recommendations(db: Session, full: bool = False, top_k: int = PRECOMPUTE_TOP_K) -> Dict[str, int]:
+    """
+    Met à jour `user_recommendations` pour les utilisateurs dont le résultat a pu changer.
+    full=True recalcule tout le monde.
+    """
+    # Position de l'outbox avant le calcul: les changements suivants seront vus au prochain passage
+    position = db.query(func.max(models.SujetChange.id)).scalar() or 0
+
+    profiles = {}
+    for preference in crud.get_cohort_preferences(db):
+        profile = preference_profile(preference)
+        if profile["interests"] or profile["niveau"] or profile["faculté"]:
+            profile["profile_hash"] = profile_hash(profile["interests"], profile["niveau"], profile["faculté"])
+            profiles[preference.user_id] = profile
+
+    stored = {
+        row.user_id: row
+        for row in db.query(
+            models.UserRecommendation.user_id,
+            func.min(models.UserRecommendation.profile_hash).label("profile_hash"),
+            func.min(models.UserRecommendation.catalog_position).label("catalog_position"),
+            func.count(models.UserRecommendation.id).label("count"),
+            func.min(models.UserRecommendation.score).label("min_score")
+        ).group_by(models.UserRecommendation.user_id)
+    }
+
+    # Utilisateurs sans préférences exploitables ou désactivés
+    obsolete = [user_id for user_id in stored if user_id not in profiles]
+    if obsolete:
+        db.query(models.UserRecommendation).filter(
+            models.UserRecommendation.user_id.in_(obsolete)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+    if full:
+        to_refresh = set(profiles)
+    else:
+        # Sans ligne stockée (nouveau profil ou aucun résultat au dernier passage) ou préférences modifiées
+        to_refresh = {
+            user_id for user_id, profile in profiles.items()
+            if user_id not in stored or stored[user_id].profile_hash != profile["profile_hash"]
+        }
+        # Nouveaux feedbacks: le bonus collaboratif de l'utilisateur a changé
+        to_refresh |= {
+            row.user_id for row in db.query(models.Feedback.user_id).join(
+                models.UserRecommendation, models.UserRecommendation.user_id == models.Feedback.user_id
+            ).filter(models.Feedback.created_at > models.UserRecommendation.computed_at).distinct()
+            if row.user_id in profiles
+        }
+        unchanged = {user_id: profile for user_id, profile in profiles.items() if user_id not in to_refresh}
+        to_refresh |= _affected_by_catalog(db, unchanged, stored, top_k)
+
+    user_ids = sorted(to_refresh)
+    batch = [profiles[user_id] for user_id in user_ids]
+    written = 0
+    for index, recommendations in recommendation_engine.iter_batch_recommendations(db, batch, limit=top_k):
+        profile = batch[index]
+        db.query(models.UserRecommendation).filter(
+            models.UserRecommendation.user_id == profile["user_id"]
+        ).delete(synchronize_session=False)
+        db.add_all([
+            models.UserRecommendation(
+                user_id=profile["user_id"],
+                sujet_id=rec["sujet"].id,
+                rank=rank,
+                score=rec["score"],
+                raisons=rec["raisons"],
+                profile_hash=profile["profile_hash"],
+                catalog_position=position
+            )
+            for rank, rec in enumerate(recommendations)
+        ])
+        written += 1
+        if written % PRECOMPUTE_COMMIT_EVERY == 0:
+            db.commit()
+    db.commit()
+
+    return {
+        "users": len(profiles),
+        "refreshed": written,
+        "skipped": len(profiles) - written,
+        "removed": len(obsolete)
+    }
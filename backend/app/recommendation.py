@@ -1,34 +1,348 @@
-# app/recommendation.py 
-from typing import List, Dict, Any, Optional
+# app/recommendation.py
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from difflib import SequenceMatcher  # Utilise le module standard Python
-from app import crud, models, schemas
+from app import catalog_events, crud, models, retrieval, schemas
+from app.keyword_index import keyword_index, keyword_match, normalize_keyword
+from app.catalog_matrix import NUMPY_AVAILABLE, catalog_matrix
+from app.collaborative import collaborative_model
+from app.database import SessionLocal
+from app.cache import TTLCache
+from app.vocabulary import vocabulary
+
+# Nombre maximum de candidats issus de l'index des mots-clés
+CANDIDATE_POOL_SIZE = int(os.getenv("RECOMMENDATION_CANDIDATE_POOL", "500"))
+# Seuil minimum de score pour qu'un sujet soit recommandé
+MIN_SCORE = 20
+# Chaque critère (niveau, faculté, domaine, difficulté) vaut 15 points:
+# sans mot-clé correspondant, il faut au moins 2 critères pour dépasser MIN_SCORE
+CRITERIA_WEIGHT = 15
+MIN_CRITERIA_MATCHES = MIN_SCORE // CRITERIA_WEIGHT + 1
+# Filtrage collaboratif: points ajoutés pour une similarité de 1 avec l'historique
+COLLABORATIVE_WEIGHT = float(os.getenv("RECOMMENDATION_COLLABORATIVE_WEIGHT", "20"))
+COLLABORATIVE_REASON = "Apprécié par des étudiants aux choix similaires"
+# Recherche hybride (plein texte + vecteurs) sur les intérêts: points ajoutés au
+# premier résultat, dégressifs avec le rang
+RETRIEVAL_WEIGHT = float(os.getenv("RECOMMENDATION_RETRIEVAL_WEIGHT", "10"))
+RETRIEVAL_REASON = "Proche de vos intérêts (recherche)"
+# Intervalle minimum entre deux vérifications de nouveaux feedbacks (secondes)
+COLLABORATIVE_REFRESH_INTERVAL = float(os.getenv("COLLABORATIVE_REFRESH_INTERVAL", "60"))
+# Recommandations par lot: nombre de processus de scoring et profils par tâche
+BATCH_WORKERS = int(os.getenv("RECOMMENDATION_BATCH_WORKERS", str(os.cpu_count() or 1)))
+BATCH_CHUNK_SIZE = int(os.getenv("RECOMMENDATION_BATCH_CHUNK_SIZE", "64"))
+
+PROFILE_FIELDS = ("interests", "niveau", "faculté", "domaine", "difficulté")
+
+# Une seule mise à jour du modèle collaboratif en arrière-plan à la fois
+_collaborative_lock = threading.Lock()
+_collaborative_running = False
+
+# Cache des résultats: (sujet_id, score, raisons) par requête normalisée
+recommendation_cache = TTLCache(
+    "recommendations",
+    maxsize=int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RECOMMENDATION_CACHE_TTL", "300"))
+)
+
+
+def recommendation_cache_key(
+    interests: List[str],
+    niveau: Optional[str] = None,
+    faculté: Optional[str] = None,
+    domaine: Optional[str] = None,
+    difficulté: Optional[str] = None,
+    limit: int = 10
+) -> Tuple:
+    """
+    Clé de cache: intérêts normalisés et triés (le score est une moyenne, l'ordre ne compte pas),
+    critères en minuscules, limite et version du catalog.
+    """
+    return (
+        tuple(sorted(normalize_keyword(interest) for interest in interests)),
+        tuple((value or "").lower() for value in (niveau, faculté, domaine, difficulté)),
+        limit,
+        catalog_events.get_catalog_version(),
+    )
+
+# ======================
+# SCORING PAR LOT (PROCESSUS)
+# ======================
+
+# Instantané du catalog reçu par chaque processus du pool à son démarrage
+_batch_matrix = None
+
+
+def _init_batch_worker(matrix) -> None:
+    global _batch_matrix
+    _batch_matrix = matrix
+
+
+def _score_profiles_chunk(chunk: List[Tuple], limit: int, matrix=None) -> List[Tuple[int, List[Tuple[int, float, float]]]]:
+    """
+    Score un paquet de profils contre l'instantané du catalog.
+    chunk: [(index, interests, niveau, faculté, domaine, difficulté, bonus recherche, bonus collaboratif)]
+    Retourne [(index, [(sujet_id, score, score mots-clés)])] pour le top-k de chaque profil.
+    """
+    matrix = matrix if matrix is not None else _batch_matrix
+    results = []
+    for index, interests, niveau, faculté, domaine, difficulté, related, bonus in chunk:
+        scores, keyword_scores, ids = matrix.score(
+            interests, CRITERIA_WEIGHT,
+            niveau=niveau, faculté=faculté, domaine=domaine, difficulté=difficulté
+        )
+        # Même ordre que recommend_sujets_vectorized: recherche puis collaboratif
+        scores = matrix.add_bonus(scores, ids, related)
+        scores = matrix.add_bonus(scores, ids, bonus)
+        positions = matrix.top_k(scores, limit, MIN_SCORE)
+        results.append((index, [
+            (int(ids[p]), round(float(scores[p]), 2), float(keyword_scores[p])) for p in positions
+        ]))
+    return results
+
 
 class RecommendationEngine:
     def __init__(self):
-        pass
-        
-    def calculate_keyword_match(self, sujet_keywords: str, user_keywords: List[str]) -> float:
-        """Calcule le matching entre les mots-clés du sujet et ceux de l'utilisateur"""
-        if not user_keywords:
-            return 0.0
-        
-        sujet_keywords_list = [k.strip().lower() for k in sujet_keywords.split(',')]
-        
-        # Calculer la similarité avec SequenceMatcher (standard Python)
-        max_similarities = []
-        for user_keyword in user_keywords:
-            user_keyword_lower = user_keyword.lower()
-            best_similarity = 0.0
-            for sujet_keyword in sujet_keywords_list:
-                similarity = SequenceMatcher(None, user_keyword_lower, sujet_keyword).ratio()
-                if similarity > best_similarity:
-                    best_similarity = similarity
-            max_similarities.append(best_similarity)
-        
-        # Retourner la moyenne des meilleures similarités
-        return sum(max_similarities) / len(max_similarities) * 100 if max_similarities else 0.0
-    
+        # Les index sont tenus à jour par les écritures sur les sujets (catalog_events)
+        catalog_events.register_listener(keyword_index)
+        catalog_events.register_listener(vocabulary)
+        if catalog_matrix is not None:
+            catalog_events.register_listener(catalog_matrix)
+
+    def calculate_keyword_match(self, sujet_keywords: str, user_keywords: List[str], titre: Optional[str] = None) -> float:
+        """Calcule le matching entre les mots-clés (et le titre) du sujet et ceux de l'utilisateur"""
+        return keyword_match(sujet_keywords, user_keywords, titre)
+
+    def ensure_keyword_index(self, db: Session):
+        """
+        Construit l'index des mots-clés au premier appel; ensuite il est mis à jour
+        par les écritures locales et l'outbox des autres workers.
+        """
+        catalog_events.sync_from_outbox(db)
+        if not keyword_index.is_built:
+            catalog_events.build_from_db(db, keyword_index, [
+                models.Sujet.id, models.Sujet.keywords, models.Sujet.titre
+            ])
+            print(f"✅ Index des mots-clés construit: {len(keyword_index)} sujets")
+        return keyword_index
+
+    def ensure_catalog_matrix(self, db: Session):
+        """Même principe que ensure_keyword_index pour la représentation vectorisée"""
+        catalog_events.sync_from_outbox(db)
+        if not catalog_matrix.is_built:
+            catalog_events.build_from_db(db, catalog_matrix, [
+                models.Sujet.id,
+                models.Sujet.keywords,
+                models.Sujet.titre,
+                models.Sujet.niveau,
+                models.Sujet.faculté,
+                models.Sujet.domaine,
+                models.Sujet.difficulté
+            ])
+            print(f"✅ Matrice du catalog construite: {len(catalog_matrix)} sujets")
+        return catalog_matrix
+
+    def ensure_vocabulary(self, db: Session):
+        """Vocabulaire des mots-clés (correction des fautes de frappe), même cycle de vie que l'index"""
+        catalog_events.sync_from_outbox(db)
+        if not vocabulary.is_built:
+            catalog_events.build_from_db(db, vocabulary, [models.Sujet.id, models.Sujet.keywords])
+            print(f"✅ Vocabulaire des mots-clés construit: {len(vocabulary)} termes")
+        return vocabulary
+
+    def correct_interests(self, db: Session, interests: List[str]) -> List[str]:
+        """Remplace chaque intérêt mal orthographié par le mot-clé du catalog le plus proche"""
+        if not interests:
+            return interests
+        vocab = self.ensure_vocabulary(db)
+        return [vocab.correct(interest) or interest for interest in interests]
+
+    def ensure_collaborative_model(self, db: Session):
+        """
+        Modèle item-item des feedbacks, tel que publié sur disque. Jamais recalculé
+        pendant la requête: s'il y a de nouveaux feedbacks, la mise à jour part dans
+        un thread et les requêtes suivantes chargent la nouvelle version.
+        """
+        if collaborative_model is None:
+            return None
+
+        now = time.monotonic()
+        if collaborative_model.is_built and now - collaborative_model.last_check < COLLABORATIVE_REFRESH_INTERVAL:
+            return collaborative_model
+        collaborative_model.last_check = now
+
+        # Version publiée par le job nocturne ou un autre worker
+        if not collaborative_model.is_built or collaborative_model.latest_version() > collaborative_model.last_feedback_id:
+            collaborative_model.load()
+
+        if self._collaborative_outdated(db):
+            self.schedule_collaborative_update()
+        return collaborative_model
+
+    def _collaborative_outdated(self, db: Session) -> bool:
+        last_id, count = db.query(func.max(models.Feedback.id), func.count(models.Feedback.id)).one()
+        return (
+            not collaborative_model.is_built
+            or (last_id or 0) != collaborative_model.last_feedback_id
+            or count != collaborative_model.n_feedbacks
+        )
+
+    def update_collaborative_model(self, db: Session) -> int:
+        """
+        Met à jour le modèle collaboratif (incrémentalement si possible) et publie la
+        nouvelle version. Hors requête: job nocturne ou thread de fond.
+        Retourne le nombre de sujets recalculés.
+        """
+        if collaborative_model is None or not self._collaborative_outdated(db):
+            return 0
+        updated = collaborative_model.refresh(crud.get_feedback_interactions(db))
+        collaborative_model.save()
+        print(f"✅ Modèle collaboratif mis à jour: {updated} sujets recalculés ({len(collaborative_model)} sujets)")
+        return updated
+
+    def _update_collaborative_in_background(self) -> None:
+        global _collaborative_running
+        db = SessionLocal()
+        try:
+            self.update_collaborative_model(db)
+        except Exception as e:
+            print(f"⚠️ Erreur mise à jour du modèle collaboratif: {e}")
+        finally:
+            db.close()
+            with _collaborative_lock:
+                _collaborative_running = False
+
+    def schedule_collaborative_update(self) -> bool:
+        """Lance la mise à jour du modèle collaboratif dans un thread (une seule à la fois)"""
+        global _collaborative_running
+        with _collaborative_lock:
+            if _collaborative_running:
+                return False
+            _collaborative_running = True
+        threading.Thread(
+            target=self._update_collaborative_in_background, name="collaborative-update", daemon=True
+        ).start()
+        return True
+
+    def collaborative_bonus(self, db: Session, user_id: Optional[int]) -> Dict[int, float]:
+        """Points ajoutés aux sujets proches de ceux que l'utilisateur a appréciés"""
+        if user_id is None or collaborative_model is None or COLLABORATIVE_WEIGHT <= 0:
+            return {}
+        history = crud.get_user_feedback_sujet_ids(db, user_id)
+        if not history:
+            return {}
+        model = self.ensure_collaborative_model(db)
+        return {
+            sujet_id: similarity * COLLABORATIVE_WEIGHT
+            for sujet_id, similarity in model.scores_for_history(history).items()
+        }
+
+    def retrieval_bonus(self, db: Session, interests: List[str], vector: bool = True) -> Dict[int, float]:
+        """
+        Points des sujets trouvés par la recherche hybride sur les intérêts.
+        vector=False: recherche lexicale seule (pas d'appel d'embedding), pour les lots.
+        """
+        if not interests or RETRIEVAL_WEIGHT <= 0:
+            return {}
+        sujet_ids = retrieval.hybrid_sujet_ids(db, interests, limit=CANDIDATE_POOL_SIZE, vector=vector)
+        return {
+            sujet_id: RETRIEVAL_WEIGHT * (1 - rank / len(sujet_ids))
+            for rank, sujet_id in enumerate(sujet_ids)
+        }
+
+    def score_sujet(
+        self,
+        sujet,
+        keyword_score: Optional[float],
+        niveau: Optional[str] = None,
+        faculté: Optional[str] = None,
+        domaine: Optional[str] = None,
+        difficulté: Optional[str] = None
+    ) -> Tuple[float, List[str]]:
+        """
+        Score (0-100) et raisons pour un sujet.
+        `keyword_score` vaut None quand l'utilisateur n'a pas donné d'intérêts.
+        """
+        score = 0.0
+        reasons = []
+
+        # 1. Matching des mots-clés (40%)
+        if keyword_score is not None:
+            score += keyword_score * 0.4
+            if keyword_score > 50:
+                reasons.append("Mots-clés correspondants")
+
+        # 2. Matching du niveau (15%)
+        if niveau and sujet.niveau and sujet.niveau.lower() == niveau.lower():
+            score += CRITERIA_WEIGHT
+            reasons.append(f"Niveau: {sujet.niveau}")
+
+        # 3. Matching de la faculté (15%)
+        if faculté and sujet.faculté and faculté.lower() in sujet.faculté.lower():
+            score += CRITERIA_WEIGHT
+            reasons.append(f"Faculté: {sujet.faculté}")
+
+        # 4. Matching du domaine (15%)
+        if domaine and sujet.domaine and domaine.lower() in sujet.domaine.lower():
+            score += CRITERIA_WEIGHT
+            reasons.append(f"Domaine: {sujet.domaine}")
+
+        # 5. Matching de la difficulté (15%)
+        if difficulté and sujet.difficulté and sujet.difficulté.lower() == difficulté.lower():
+            score += CRITERIA_WEIGHT
+            reasons.append(f"Difficulté: {sujet.difficulté}")
+
+        return score, reasons
+
+    def generate_candidates(
+        self,
+        db: Session,
+        keyword_scores: Dict[int, float],
+        related_ids: Optional[List[int]] = None,
+        niveau: Optional[str] = None,
+        faculté: Optional[str] = None,
+        domaine: Optional[str] = None,
+        difficulté: Optional[str] = None,
+        limit: int = 10
+    ) -> List[Any]:
+        """
+        Candidats sur tout le catalog:
+        - les meilleurs sujets selon l'index des mots-clés
+        - les sujets de la recherche hybride (plein texte + vecteurs) sur les intérêts
+          (`related_ids`), sans préfiltre: niveau, faculté, domaine et difficulté restent
+          des critères de score
+        - les sujets qui respectent assez de critères pour dépasser le seuil sans mot-clé
+        Les critères sont évalués en SQL, seules les colonnes utiles sont chargées.
+        """
+        top_keyword_ids = heapq.nlargest(CANDIDATE_POOL_SIZE, keyword_scores, key=keyword_scores.get)
+        if related_ids:
+            known = set(top_keyword_ids)
+            top_keyword_ids += [sujet_id for sujet_id in related_ids if sujet_id not in known]
+        candidates = {}
+
+        if top_keyword_ids:
+            for row in crud.get_recommendation_candidates(db, sujet_ids=top_keyword_ids):
+                candidates[row.id] = row
+
+        # Sans mot-clé, tous ces sujets ont le même score par nombre de critères:
+        # il suffit des `limit` premiers
+        for row in crud.get_recommendation_candidates(
+            db,
+            niveau=niveau,
+            faculté=faculté,
+            domaine=domaine,
+            difficulté=difficulté,
+            min_matches=MIN_CRITERIA_MATCHES,
+            limit=limit
+        ):
+            candidates.setdefault(row.id, row)
+
+        return list(candidates.values())
+
     def recommend_sujets(
         self,
         db: Session,
@@ -37,63 +351,285 @@ class RecommendationEngine:
         faculté: Optional[str] = None,
         domaine: Optional[str] = None,
         difficulté: Optional[str] = None,
-        limit: int = 10
+        limit: int = 10,
+        user_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recommandation principale des sujets.
+        Avec `user_id`, les sujets proches de ses feedbacks sont favorisés (filtrage collaboratif).
+        Les intérêts mal orthographiés sont d'abord corrigés d'après le vocabulaire du catalog.
+        Les résultats (ids, scores, raisons) sont mis en cache par critères normalisés
+        et version du catalog; seuls les sujets sont rechargés par clé primaire.
+        """
+        catalog_events.sync_from_outbox(db)
+        interests = self.correct_interests(db, interests)
+        bonus = self.collaborative_bonus(db, user_id)
+
+        key = recommendation_cache_key(interests, niveau, faculté, domaine, difficulté, limit)
+        if bonus:
+            # Résultat personnel: dépend aussi de l'historique de l'utilisateur
+            key += (user_id, collaborative_model.last_feedback_id)
+
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            sujets = {s.id: s for s in crud.get_sujets_by_ids(db, [sujet_id for sujet_id, _, _ in cached])}
+            return [
+                {
+                    "sujet": sujets[sujet_id],
+                    "score": score,
+                    "raisons": list(reasons),
+                    "critères_respectés": list(reasons)
+                }
+                for sujet_id, score, reasons in cached
+                if sujet_id in sujets
+            ]
+
+        # Recherche hybride sur les intérêts: utilisée par les deux chemins de scoring
+        related = self.retrieval_bonus(db, interests)
+        if NUMPY_AVAILABLE:
+            recommendations = self.recommend_sujets_vectorized(
+                db, interests,
+                niveau=niveau, faculté=faculté, domaine=domaine, difficulté=difficulté,
+                limit=limit, bonus=bonus, related=related
+            )
+        else:
+            recommendations = self.recommend_sujets_indexed(
+                db, interests,
+                niveau=niveau, faculté=faculté, domaine=domaine, difficulté=difficulté,
+                limit=limit, bonus=bonus, related=related
+            )
+
+        recommendation_cache.set(key, [
+            (rec["sujet"].id, rec["score"], tuple(rec["raisons"])) for rec in recommendations
+        ])
+        return recommendations
+
+    def recommend_sujets_indexed(
+        self,
+        db: Session,
+        interests: List[str],
+        niveau: Optional[str] = None,
+        faculté: Optional[str] = None,
+        domaine: Optional[str] = None,
+        difficulté: Optional[str] = None,
+        limit: int = 10,
+        user_id: Optional[int] = None,
+        bonus: Optional[Dict[int, float]] = None,
+        related: Optional[Dict[int, float]] = None
     ) -> List[Dict[str, Any]]:
-        """Recommandation principale des sujets"""
-        
-        # Récupérer les sujets
-        sujets = crud.get_sujets(db, limit=100)
-        
-        if not sujets:
+        """Sans NumPy: candidats de l'index des mots-clés et du SQL, scorés un par un"""
+        keyword_scores = self.ensure_keyword_index(db).score(interests) if interests else {}
+        if bonus is None:
+            bonus = self.collaborative_bonus(db, user_id)
+        if related is None:
+            related = self.retrieval_bonus(db, interests)
+
+        candidates = self.generate_candidates(
+            db, keyword_scores, list(related),
+            niveau=niveau, faculté=faculté, domaine=domaine, difficulté=difficulté,
+            limit=limit
+        )
+        if bonus:
+            known = {candidate.id for candidate in candidates}
+            top_bonus_ids = [
+                sujet_id for sujet_id in heapq.nlargest(CANDIDATE_POOL_SIZE, bonus, key=bonus.get)
+                if sujet_id not in known
+            ]
+            if top_bonus_ids:
+                candidates.extend(crud.get_recommendation_candidates(db, sujet_ids=top_bonus_ids))
+
+        if not candidates:
             return []
-        
-        recommendations = []
-        
-        for sujet in sujets:
-            score = 0.0
-            reasons = []
-            
-            # 1. Matching des mots-clés (40%)
-            if interests:
-                keyword_score = self.calculate_keyword_match(sujet.keywords, interests)
-                score += keyword_score * 0.4
-                if keyword_score > 50:
-                    reasons.append("Mots-clés correspondants")
-            
-            # 2. Matching du niveau (15%)
-            if niveau and sujet.niveau and sujet.niveau.lower() == niveau.lower():
-                score += 15
-                reasons.append(f"Niveau: {sujet.niveau}")
-            
-            # 3. Matching de la faculté (15%)
-            if faculté and sujet.faculté and faculté.lower() in sujet.faculté.lower():
-                score += 15
-                reasons.append(f"Faculté: {sujet.faculté}")
-            
-            # 4. Matching du domaine (15%)
-            if domaine and sujet.domaine and domaine.lower() in sujet.domaine.lower():
-                score += 15
-                reasons.append(f"Domaine: {sujet.domaine}")
-            
-            # 5. Matching de la difficulté (15%)
-            if difficulté and sujet.difficulté and sujet.difficulté.lower() == difficulté.lower():
-                score += 15
-                reasons.append(f"Difficulté: {sujet.difficulté}")
-            
+
+        scored = []
+        for candidate in candidates:
+            keyword_score = keyword_scores.get(candidate.id, 0.0) if interests else None
+            score, reasons = self.score_sujet(
+                candidate, keyword_score,
+                niveau=niveau, faculté=faculté, domaine=domaine, difficulté=difficulté
+            )
+            if candidate.id in related:
+                score = min(score + related[candidate.id], 100.0)
+                reasons.append(RETRIEVAL_REASON)
+            if candidate.id in bonus:
+                score = min(score + bonus[candidate.id], 100.0)
+                reasons.append(COLLABORATIVE_REASON)
             # Ajouter la recommandation si le score est > 20
-            if score > 20:
-                recommendations.append({
-                    "sujet": sujet,
-                    "score": round(score, 2),
-                    "raisons": reasons,
-                    "critères_respectés": reasons
-                })
-        
-        # Trier par score décroissant
-        recommendations.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Limiter le nombre de résultats
-        return recommendations[:limit]
+            if score > MIN_SCORE:
+                scored.append((round(score, 2), candidate.id, reasons))
+
+        # Top-k avec un tas borné plutôt qu'un tri complet
+        top = heapq.nlargest(limit, scored, key=lambda x: x[0])
+
+        sujets = {s.id: s for s in crud.get_sujets_by_ids(db, [sujet_id for _, sujet_id, _ in top])}
+
+        return [
+            {
+                "sujet": sujets[sujet_id],
+                "score": score,
+                "raisons": reasons,
+                "critères_respectés": reasons
+            }
+            for score, sujet_id, reasons in top
+            if sujet_id in sujets
+        ]
+
+    def recommend_sujets_vectorized(
+        self,
+        db: Session,
+        interests: List[str],
+        niveau: Optional[str] = None,
+        faculté: Optional[str] = None,
+        domaine: Optional[str] = None,
+        difficulté: Optional[str] = None,
+        limit: int = 10,
+        user_id: Optional[int] = None,
+        bonus: Optional[Dict[int, float]] = None,
+        related: Optional[Dict[int, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Même résultat que recommend_sujets_indexed, calculé pour tout le catalog avec NumPy.
+        Les raisons ne sont produites que pour le top-k final.
+        """
+        matrix = self.ensure_catalog_matrix(db)
+        if not len(matrix):
+            return []
+
+        scores, keyword_scores, ids = matrix.score(
+            interests, CRITERIA_WEIGHT,
+            niveau=niveau, faculté=faculté, domaine=domaine, difficulté=difficulté
+        )
+        if bonus is None:
+            bonus = self.collaborative_bonus(db, user_id)
+        if related is None:
+            related = self.retrieval_bonus(db, interests)
+        scores = matrix.add_bonus(scores, ids, related)
+        scores = matrix.add_bonus(scores, ids, bonus)
+        positions = matrix.top_k(scores, limit, MIN_SCORE)
+
+        sujets = {s.id: s for s in crud.get_sujets_by_ids(db, [int(ids[p]) for p in positions])}
+
+        recommendations = []
+        for position in positions:
+            sujet = sujets.get(int(ids[position]))
+            if sujet is None:
+                continue
+            _, reasons = self.score_sujet(
+                sujet, float(keyword_scores[position]) if interests else None,
+                niveau=niveau, faculté=faculté, domaine=domaine, difficulté=difficulté
+            )
+            if sujet.id in related:
+                reasons.append(RETRIEVAL_REASON)
+            if sujet.id in bonus:
+                reasons.append(COLLABORATIVE_REASON)
+            recommendations.append({
+                "sujet": sujet,
+                "score": round(float(scores[position]), 2),
+                "raisons": reasons,
+                "critères_respectés": reasons
+            })
+        return recommendations
+
+    def _score_chunks(self, matrix, chunks: List[List[Tuple]], limit: int):
+        """Résultats des paquets au fil de l'eau: pool de processus s'il y a plusieurs paquets"""
+        workers = min(BATCH_WORKERS, len(chunks))
+        pool = None
+        if workers > 1:
+            try:
+                pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_batch_worker,
+                    initargs=(matrix,)
+                )
+            except (OSError, NotImplementedError) as e:
+                print(f"⚠️ Pool de processus indisponible, scoring par lot en local: {e}")
+
+        if pool is None:
+            for chunk in chunks:
+                yield _score_profiles_chunk(chunk, limit, matrix)
+            return
+
+        with pool:
+            futures = [pool.submit(_score_profiles_chunk, chunk, limit) for chunk in chunks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def iter_batch_recommendations(
+        self,
+        db: Session,
+        profiles: List[Dict[str, Any]],
+        limit: int = 3
+    ):
+        """
+        Recommandations pour plusieurs profils (interests, niveau, faculté, domaine, difficulté).
+        Tous les profils sont scorés contre le même instantané du catalog; les résultats
+        sont produits paquet par paquet sous forme (index du profil, recommandations),
+        pas forcément dans l'ordre des profils.
+        """
+        if not profiles:
+            return
+
+        if not NUMPY_AVAILABLE:
+            for index, profile in enumerate(profiles):
+                yield index, self.recommend_sujets(
+                    db, profile.get("interests") or [],
+                    niveau=profile.get("niveau"),
+                    faculté=profile.get("faculté"),
+                    domaine=profile.get("domaine"),
+                    difficulté=profile.get("difficulté"),
+                    limit=limit,
+                    user_id=profile.get("user_id")
+                )
+            return
+
+        matrix = self.ensure_catalog_matrix(db)
+        if not len(matrix):
+            for index in range(len(profiles)):
+                yield index, []
+            return
+
+        bonuses = [self.collaborative_bonus(db, profile.get("user_id")) for profile in profiles]
+        interests = [self.correct_interests(db, profile.get("interests") or []) for profile in profiles]
+        # Recherche lexicale seule: un appel d'embedding par profil coûterait plus que le lot
+        related = [self.retrieval_bonus(db, terms, vector=False) for terms in interests]
+        rows = [
+            (index, interests[index])
+            + tuple(profile.get(field) for field in PROFILE_FIELDS[1:])
+            + (related[index], bonuses[index])
+            for index, profile in enumerate(profiles)
+        ]
+        chunks = [rows[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(rows), BATCH_CHUNK_SIZE)]
+
+        for chunk_results in self._score_chunks(matrix.snapshot(), chunks, limit):
+            # Un seul aller-retour en base par paquet
+            sujet_ids = list({sujet_id for _, top in chunk_results for sujet_id, _, _ in top})
+            sujets = {s.id: s for s in crud.get_sujets_by_ids(db, sujet_ids)}
+
+            for index, top in chunk_results:
+                profile = profiles[index]
+                recommendations = []
+                for sujet_id, score, keyword_score in top:
+                    sujet = sujets.get(sujet_id)
+                    if sujet is None:
+                        continue
+                    _, reasons = self.score_sujet(
+                        sujet, keyword_score if profile.get("interests") else None,
+                        niveau=profile.get("niveau"),
+                        faculté=profile.get("faculté"),
+                        domaine=profile.get("domaine"),
+                        difficulté=profile.get("difficulté")
+                    )
+                    if sujet_id in related[index]:
+                        reasons.append(RETRIEVAL_REASON)
+                    if sujet_id in bonuses[index]:
+                        reasons.append(COLLABORATIVE_REASON)
+                    recommendations.append({
+                        "sujet": sujet,
+                        "score": score,
+                        "raisons": reasons,
+                        "critères_respectés": reasons
+                    })
+                yield index, recommendations
 
 # Instance globale du moteur de recommandation
-recommendation_engine = RecommendationEngine()
\ No newline at end of file
+recommendation_engine = RecommendationEngine()
@@ -0,0 +1,403 @@
+# app/retrieval.py
+"""
+Recherche hybride (lexicale + vectorielle) des sujets, fusionnée par rangs réciproques.
+
+- lexicale: moteur plein texte courant (search.get_backend: PostgreSQL, FTS5 ou BM25),
+  bon sur les termes exacts, sigles et noms propres des titres
+- vectorielle: similarité d'embeddings dans le vecteur store Chroma de llm_service,
+  bonne sur les reformulations et synonymes
+- les deux recherches tournent en parallèle; leurs classements sont fusionnés par
+  Reciprocal Rank Fusion: score(d) = somme des 1 / (RRF_K + rang de d), sans avoir à
+  comparer des scores d'échelles différentes
+- filtres de métadonnées (domaine, niveau, faculté, statut actif) appliqués avant le
+  classement des deux côtés: WHERE SQL et filtre `where` de Chroma. Le statut ne
+  concerne que les sujets du catalog: les exemples du CSV et les critères du doyen
+  n'ont pas de statut et restent toujours retenus.
+
+Les sujets du catalog sont ajoutés au vecteur store (à côté des sujets du CSV) et tenus
+à jour par catalog_events. Les embeddings sont calculés par lots dans un thread
+(schedule_flush), au démarrage puis après les écritures, jamais pendant une requête:
+les recherches utilisent ce qui est déjà indexé.
+
+Utilisé par le contexte RAG d'analyser_sujet et par les candidats de la recommandation.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import catalog_events, llm_service
+from app import search as fulltext
+from app.models import Sujet
+
+# Constante de lissage de la fusion (60 dans l'article d'origine)
+RRF_K = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+# Profondeur de chaque classement avant fusion
+RETRIEVAL_DEPTH = int(os.getenv("RETRIEVAL_DEPTH", "50"))
+# Nombre maximum de sujets du catalog envoyés aux embeddings par recherche
+VECTOR_SYNC_BATCH = int(os.getenv("RETRIEVAL_VECTOR_SYNC_BATCH", "256"))
+VECTOR_INDEX_CATALOG = os.getenv("RETRIEVAL_VECTOR_INDEX_CATALOG", "true").lower() == "true"
+
+# Colonnes de métadonnées utilisables comme préfiltres
+FILTER_FIELDS = ("domaine", "niveau", "faculté")
+
+CATALOG_SOURCE = "catalog"
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="retrieval")
+_flush_lock = threading.Lock()
+_flush_running = False
+
+
+def sujet_key(sujet_id: int) -> str:
+    return f"sujet:{sujet_id}"
+
+
+def sujet_document_text(row: Dict[str, Any]) -> str:
+    """Texte d'un sujet, même format que les sujets du CSV dans le vecteur store"""
+    return (
+        f"Titre: {row.get('titre') or ''}\n"
+        f"Domaine: {row.get('domaine') or ''}\n"
+        f"Niveau: {row.get('niveau') or ''}\n"
+        f"Faculté: {row.get('faculté') or ''}\n"
+        f"Problématique: {row.get('problématique') or ''}\n"
+        f"Description: {row.get('description') or ''}\n"
+        f"Mots-clés: {row.get('keywords') or ''}\n"
+    )
+
+
+# ======================
+# FUSION
+# ======================
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Fusion de classements (clés, meilleures d'abord): [(clé, score)], meilleurs d'abord.
+    Une clé présente dans plusieurs classements cumule ses contributions.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    # Ex æquo: ordre de première apparition (classement lexical d'abord)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+# ======================
+# SUJETS DU CATALOG DANS LE VECTEUR STORE
+# ======================
+
+class CatalogVectorIndex:
+    """
+    Suit les sujets du catalog à (ré)indexer dans Chroma. Les écritures ne font que
+    noter les sujets modifiés; flush() calcule les embeddings par lots.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # sujet_id -> ligne à indexer, ou None pour retirer le sujet
+        self._pending: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._store = None
+        self.is_built = False
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def build(self, rows) -> None:
+        """Tous les sujets actifs sont à indexer (ceux déjà à jour dans Chroma sont ignorés au flush)"""
+        with self._lock:
+            self._pending = {}
+            for row in rows:
+                row = dict(row._mapping) if hasattr(row, "_mapping") else dict(row)
+                self._pending[row["id"]] = row
+            self._store = None
+            self.is_built = True
+
+    # Abonnement aux changements du catalog (catalog_events)
+    def upsert_sujet(self, row: Dict) -> None:
+        if self.is_built:
+            with self._lock:
+                self._pending[row["id"]] = dict(row)
+
+    def remove_sujet(self, sujet_id: int) -> None:
+        if self.is_built:
+            with self._lock:
+                self._pending[sujet_id] = None
+
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _indexed_hashes(self, store) -> Dict[str, str]:
+        """Empreintes des sujets du catalog déjà présents dans Chroma (store persisté)"""
+        try:
+            existing = store.get(where={"source": CATALOG_SOURCE}, include=["metadatas"])
+        except Exception as e:
+            print(f"⚠️ Lecture des sujets indexés impossible: {e}")
+            return {}
+        return {
+            doc_id: (metadata or {}).get("hash", "")
+            for doc_id, metadata in zip(existing.get("ids", []), existing.get("metadatas", []))
+        }
+
+    def flush(self, store) -> int:
+        """Indexe au plus VECTOR_SYNC_BATCH sujets en attente; retourne le nombre restant"""
+        if store is None or llm_service.Document is None:
+            return len(self._pending)
+        with self._lock:
+            if store is not self._store:
+                # Nouveau store: on ne recalcule pas les sujets inchangés
+                indexed = self._indexed_hashes(store)
+                for sujet_id, row in list(self._pending.items()):
+                    if row is not None and indexed.get(sujet_key(sujet_id)) == self._content_hash(sujet_document_text(row)):
+                        del self._pending[sujet_id]
+                self._store = store
+            batch = dict(list(self._pending.items())[:VECTOR_SYNC_BATCH])
+
+        if batch:
+            ids = [sujet_key(sujet_id) for sujet_id in batch]
+            docs, doc_ids = [], []
+            for sujet_id, row in batch.items():
+                if row is None:
+                    continue
+                text = sujet_document_text(row)
+                docs.append(llm_service.Document(
+                    page_content=text,
+                    metadata={
+                        "source": CATALOG_SOURCE,
+                        "sujet_id": sujet_id,
+                        "titre": row.get("titre") or "",
+                        "domaine": row.get("domaine") or "",
+                        "niveau": row.get("niveau") or "",
+                        "faculté": row.get("faculté") or "",
+                        "is_active": True,
+                        "hash": self._content_hash(text),
+                    },
+                ))
+                doc_ids.append(sujet_key(sujet_id))
+            try:
+                store.delete(ids=ids)
+                if docs:
+                    store.add_documents(docs, ids=doc_ids)
+            except Exception as e:
+                print(f"⚠️ Indexation vectorielle des sujets impossible: {e}")
+                return len(self._pending)
+            with self._lock:
+                for sujet_id, row in batch.items():
+                    # Un sujet modifié pendant l'indexation reste en attente
+                    if self._pending.get(sujet_id, row) is row:
+                        self._pending.pop(sujet_id, None)
+        return len(self._pending)
+
+
+# Instance globale du suivi des sujets vectorisés
+catalog_vectors = CatalogVectorIndex()
+catalog_events.register_listener(catalog_vectors)
+
+
+def _flush_pending(store) -> None:
+    global _flush_running
+    try:
+        while True:
+            before = len(catalog_vectors)
+            remaining = catalog_vectors.flush(store)
+            # Fini, ou aucun progrès (erreur d'embedding): la prochaine écriture relancera
+            if not remaining or remaining >= before:
+                break
+        if remaining:
+            print(f"ℹ️ {remaining} sujets du catalog encore à vectoriser")
+    except Exception as e:
+        print(f"⚠️ Indexation vectorielle des sujets interrompue: {e}")
+    finally:
+        with _flush_lock:
+            _flush_running = False
+
+
+def schedule_flush(store) -> bool:
+    """Lance le calcul des embeddings en attente dans un thread (un seul à la fois)"""
+    global _flush_running
+    if store is None or not len(catalog_vectors):
+        return False
+    with _flush_lock:
+        if _flush_running:
+            return False
+        _flush_running = True
+    _executor.submit(_flush_pending, store)
+    return True
+
+
+def ensure_vector_store(db: Optional[Session] = None):
+    """
+    Vecteur store de llm_service. Avec une session, les sujets du catalog modifiés sont
+    notés et leur indexation planifiée en arrière-plan (sans attendre).
+    """
+    if llm_service.llm is None:
+        return None
+    store = llm_service.build_sujets_vectorstore()
+    if store is None or db is None or not VECTOR_INDEX_CATALOG:
+        return store
+    catalog_events.sync_from_outbox(db)
+    if not catalog_vectors.is_built:
+        catalog_events.build_from_db(db, catalog_vectors, [
+            Sujet.id, Sujet.titre, Sujet.keywords, Sujet.domaine, Sujet.niveau,
+            Sujet.faculté, Sujet.problématique, Sujet.description
+        ])
+    schedule_flush(store)
+    return store
+
+
+def index_catalog_vectors(db: Session) -> None:
+    """Démarrage: suivi des sujets du catalog et indexation lancée en arrière-plan"""
+    ensure_vector_store(db)
+
+
+# ======================
+# CLASSEMENTS
+# ======================
+
+def lexical_ranking(
+    db: Session,
+    texts: List[str],
+    filters: Dict[str, Any],
+    is_active: Optional[bool] = True,
+    limit: int = RETRIEVAL_DEPTH
+) -> List[int]:
+    """Ids des sujets les plus pertinents pour l'un des textes (moteurs classés uniquement)"""
+    backend = fulltext.get_backend(db)
+    texts = [text for text in texts if text and text.strip()]
+    if not texts or not backend.ranked:
+        return []
+    query = db.query(Sujet.id)
+    if is_active is not None:
+        query = query.filter(Sujet.is_active == is_active)
+    for field, value in filters.items():
+        query = query.filter(getattr(Sujet, field) == value)
+    query, score = backend.search_any(db, query, texts)
+    return [row.id for row in query.order_by(score.desc(), Sujet.id.desc()).limit(limit)]
+
+
+def vector_where(filters: Dict[str, Any], is_active: Optional[bool] = True) -> Optional[Dict[str, Any]]:
+    """
+    Filtre de métadonnées Chroma équivalent aux préfiltres SQL. Le statut ne s'applique
+    qu'aux sujets du catalog (les autres documents n'ont pas de clé is_active).
+    """
+    conditions = [{field: value} for field, value in filters.items()]
+    if is_active is not None:
+        conditions.append({"$or": [
+            {"source": {"$ne": CATALOG_SOURCE}},
+            {"is_active": is_active},
+        ]})
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def document_key(document) -> str:
+    """Clé de fusion d'un document Chroma: sujet du catalog, ligne du CSV ou autre source"""
+    metadata = document.metadata or {}
+    if metadata.get("sujet_id") is not None:
+        return sujet_key(int(metadata["sujet_id"]))
+    if metadata.get("source") == "csv_sujet":
+        return f"csv:{metadata.get('index')}"
+    return f"{metadata.get('source', 'doc')}:{hash(document.page_content)}"
+
+
+def vector_ranking(
+    store,
+    text: str,
+    filters: Dict[str, Any],
+    is_active: Optional[bool] = True,
+    limit: int = RETRIEVAL_DEPTH
+) -> List[Any]:
+    """Documents les plus proches de `text` dans le vecteur store, meilleurs d'abord"""
+    if store is None or not text.strip():
+        return []
+    try:
+        return store.similarity_search(text, k=limit, filter=vector_where(filters, is_active))
+    except Exception as e:
+        print(f"⚠️ Erreur lors de la recherche vectorielle: {e}")
+        return []
+
+
+# ======================
+# RECHERCHE HYBRIDE
+# ======================
+
+def hybrid_search(
+    db: Session,
+    texts: List[str],
+    limit: int = 10,
+    domaine: Optional[str] = None,
+    niveau: Optional[str] = None,
+    faculté: Optional[str] = None,
+    is_active: Optional[bool] = True,
+    vector: bool = True
+) -> List[Tuple[str, float, Optional[Any]]]:
+    """
+    Recherche hybride: [(clé, score RRF, document Chroma ou None)], meilleurs d'abord.
+    Clés: "sujet:<id>" pour les sujets du catalog, "csv:<n>" pour les sujets du CSV.
+    is_active: statut des sujets (None pour ne pas filtrer).
+    """
+    filters = {
+        field: value for field, value in zip(FILTER_FIELDS, (domaine, niveau, faculté)) if value
+    }
+    store = ensure_vector_store(db) if vector else None
+
+    # La recherche vectorielle (appel d'embedding) ne touche pas à la session:
+    # elle part dans un thread pendant la requête SQL
+    future = None
+    if store is not None:
+        future = _executor.submit(vector_ranking, store, " ".join(t for t in texts if t), filters, is_active)
+    lexical = [sujet_key(sujet_id) for sujet_id in lexical_ranking(db, texts, filters, is_active)]
+    documents = {}
+    if future is not None:
+        for document in future.result():
+            documents.setdefault(document_key(document), document)
+
+    fused = reciprocal_rank_fusion([lexical, list(documents)])
+    return [(key, score, documents.get(key)) for key, score in fused[:limit]]
+
+
+def hybrid_sujet_ids(db: Session, texts: List[str], limit: int = 50, **filters) -> List[int]:
+    """Ids des sujets du catalog de la recherche hybride, par score de fusion"""
+    return [
+        int(key.split(":", 1)[1])
+        for key, _, _ in hybrid_search(db, texts, limit=limit, **filters)
+        if key.startswith("sujet:")
+    ]
+
+
+def hybrid_documents(db: Session, texts: List[str], k: int = 5, **filters) -> List[Any]:
+    """
+    Documents de contexte (RAG) de la recherche hybride. Les sujets trouvés seulement
+    par la recherche lexicale sont rechargés depuis la base.
+    """
+    if llm_service.Document is None:
+        return []
+    results = hybrid_search(db, texts, limit=k, **filters)
+    missing = [int(key.split(":", 1)[1]) for key, _, document in results if document is None]
+    rows = {}
+    if missing:
+        for row in db.query(
+            Sujet.id, Sujet.titre, Sujet.keywords, Sujet.domaine, Sujet.niveau,
+            Sujet.faculté, Sujet.problématique, Sujet.description
+        ).filter(Sujet.id.in_(missing)):
+            rows[row.id] = dict(row._mapping)
+
+    documents = []
+    for key, score, document in results:
+        if document is None:
+            row = rows.get(int(key.split(":", 1)[1]))
+            if row is None:
+                continue
+            document = llm_service.Document(
+                page_content=sujet_document_text(row),
+                metadata={"source": CATALOG_SOURCE, "sujet_id": row["id"], "titre": row.get("titre") or ""},
+            )
+        document.metadata["rrf_score"] = score
+        documents.append(document)
+    return documents
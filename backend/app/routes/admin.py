@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 
 from ..database import get_db
 from ..models import User, Sujet
+from .. import pagination
 from  app.dependencies import get_current_user
 
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
@@ -28,11 +29,14 @@ async def get_admin_users(
     search: Optional[str] = None,
     role: Optional[str] = None,
     is_active: Optional[bool] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
-    Récupère tous les utilisateurs avec filtres (admin seulement)
+    Récupère tous les utilisateurs avec filtres (admin seulement).
+    Pagination par curseur (`next_cursor`); skip reste accepté pour compatibilité.
+    Le total est estimé par PostgreSQL sur une grande table (`total_is_estimate`).
     """
     query = db.query(User)
     
@@ -50,17 +54,26 @@ async def get_admin_users(
     if is_active is not None:
         query = query.filter(User.is_active == is_active)
     
-    # Compter le total avant pagination
-    total = query.count()
+    # Total sans COUNT(*) complet à chaque page
+    total, exact = pagination.estimate_count(db, query)
     
     # Pagination
-    users = query.offset(skip).limit(limit).all()
+    next_cursor = None
+    if skip and not cursor:
+        users = pagination.order_by_keys(query, [User.id]).offset(skip).limit(limit).all()
+    else:
+        try:
+            users, next_cursor = pagination.paginate(query, [User.id], limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "users": users,
         "total": total,
+        "total_is_estimate": not exact,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
     }
 
 @admin_router.post("/users/{user_id}/activate")
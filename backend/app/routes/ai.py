@@ -1,12 +1,23 @@
 # app/routes/ai.py 
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from datetime import datetime
-from app.dependencies import get_current_user, get_db,get_current_active_user
+import asyncio
+import json
+from app.dependencies import get_current_user, get_db,get_current_active_user, require_staff
+from app.database import SessionLocal
 from app import schemas, crud
 from app.recommendation import recommendation_engine
-from app.llm_service import répondre_question_cohérente
+from app.precompute import get_precomputed_recommendations
+from app.llm_service import (
+    répondre_question_cohérente,
+    répondre_question_cohérente_async,
+    répondre_question_cohérente_stream,
+    répondre_question_stream
+)
+from app.llm_gateway import LLMOverloaded
 from app.models import User,ConversationMessage
 router = APIRouter(tags=["ai"])
 
@@ -18,7 +29,11 @@ try:
         analyser_sujet,
         générer_sujets_llm,
         get_tips,
-        recommander_sujets_llm
+        recommander_sujets_llm,
+        répondre_question_async,
+        analyser_sujet_async,
+        générer_sujets_llm_async,
+        recommander_sujets_llm_async
     )
     LLM_AVAILABLE = True
 except ImportError as e:
@@ -161,6 +176,19 @@ Je pourrai alors vous proposer des sujets pertinents et vous guider dans votre r
             ]
         }
 
+    # Variantes async utilisées par les routes
+    async def répondre_question_async(question: str, contexte: str = None, user_key: str = None) -> str:
+        return répondre_question(question, contexte)
+
+    async def analyser_sujet_async(sujet_data: dict, user_key: str = None) -> dict:
+        return analyser_sujet(sujet_data)
+
+    async def générer_sujets_llm_async(params: dict, count: int, user_key: str = None) -> List[Dict]:
+        return générer_sujets_llm(params, count)
+
+    async def recommander_sujets_llm_async(interests: List[str], sujets: List[Dict], critères: Dict[str, Any], user_key: str = None) -> List[Dict[str, Any]]:
+        return recommander_sujets_llm(interests, sujets, critères)
+
 
         
 @router.post("/generate-three", response_model=schemas.AIGeneratedSubjects)
@@ -195,7 +223,7 @@ async def generate_three_subjects(
             )
         
         # Générer 3 sujets avec IA
-        generated_subjects = générer_sujets_llm(params, 3)
+        generated_subjects = await générer_sujets_llm_async(params, 3, user_key=str(current_user.id))
         
         # Créer un identifiant de session pour cette génération
         import uuid
@@ -229,6 +257,9 @@ async def generate_three_subjects(
             "message": f"3 sujets générés basés sur vos intérêts: {', '.join(params['interests'][:3])}"
         }
         
+    except LLMOverloaded:
+        # 503 + Retry-After (main.py)
+        raise
     except Exception as e:
         print(f"Erreur dans generate_three_subjects: {e}")
         raise HTTPException(
@@ -303,6 +334,60 @@ async def save_chosen_subject(
             detail=f"Erreur lors de la sauvegarde: {str(e)}"
         )
 
+def _chat_context(db: Session, user_id: int):
+    """(historique récent, contexte de conversation, préférences) pour /chat"""
+    # Récupérer les préférences utilisateur
+    preference = crud.get_or_create_preference(db, user_id)
+    user_preferences = {}
+    if preference:
+        user_preferences = {
+            'level': preference.level,
+            'faculty': preference.faculty,
+            'interests': preference.interests
+        }
+    
+    # Récupérer l'historique complet
+    conversation_history = crud.get_conversation_history(db, user_id, limit=10)
+    
+    # Construire le contexte de conversation
+    history_context = "\n".join([
+        f"{'ÉTUDIANT' if h.role == 'user' else 'MEMOBOT'}: {h.content}"
+        for h in conversation_history[-5:]  # 5 derniers messages
+    ])
+    return conversation_history, history_context, user_preferences
+
+def _chat_suggestions(conversation_history: List[ConversationMessage]) -> Dict[str, Any]:
+    """Suggestions et actions de /chat (proposer la génération si assez d'infos)"""
+    # Analyser si on a assez d'infos pour proposer la génération
+    should_show_generate = False
+    if conversation_history:
+        # Compter les messages de l'utilisateur
+        user_messages = [h for h in conversation_history if h.role == 'user']
+        total_user_text = sum(len(msg.content) for msg in user_messages)
+        
+        # Mots-clés indiquant une description complète
+        keywords = ['projet', 'mémoire', 'sujet', 'veux', 'souhaite', 'intéresse', 'domaine']
+        user_text = " ".join([msg.content.lower() for msg in user_messages])
+        keyword_count = sum(1 for kw in keywords if kw in user_text)
+        
+        if total_user_text > 200 and keyword_count >= 3:
+            should_show_generate = True
+    
+    suggestions = []
+    if should_show_generate:
+        suggestions = [
+            "J'ai suffisamment d'informations sur votre projet",
+            "Je peux maintenant générer des sujets pertinents pour vous",
+            "Voulez-vous que je génère 3 sujets basés sur notre discussion ?"
+        ]
+    
+    return {
+        "suggestions": suggestions,
+        "actions": [
+            {"text": "🎯 Générer 3 sujets", "action": "generate_three"}
+        ] if should_show_generate else []
+    }
+
 @router.post("/chat", response_model=schemas.AIChatResponse)
 async def chat_with_ai(
     request: schemas.AIChatRequest,
@@ -311,30 +396,14 @@ async def chat_with_ai(
 ):
     """Chat intelligent avec contexte utilisateur"""
     try:
-        # Récupérer les préférences utilisateur
-        preference = crud.get_or_create_preference(db, current_user.id)
-        user_preferences = {}
-        if preference:
-            user_preferences = {
-                'level': preference.level,
-                'faculty': preference.faculty,
-                'interests': preference.interests
-            }
-        
-        # Récupérer l'historique complet
-        conversation_history = crud.get_conversation_history(db, current_user.id, limit=10)
-        
-        # Construire le contexte de conversation
-        history_context = "\n".join([
-            f"{'ÉTUDIANT' if h.role == 'user' else 'MEMOBOT'}: {h.content}"
-            for h in conversation_history[-5:]  # 5 derniers messages
-        ])
+        conversation_history, history_context, user_preferences = _chat_context(db, current_user.id)
         
         # Obtenir la réponse cohérente AVEC préférences
-        message = répondre_question_cohérente(
+        message = await répondre_question_cohérente_async(
             question=request.message,
             contexte=history_context,
-            user_preferences=user_preferences
+            user_preferences=user_preferences,
+            user_key=str(current_user.id)
         )
         
         # Sauvegarder la conversation
@@ -352,38 +421,14 @@ async def chat_with_ai(
             content=message
         )
         
-        # Analyser si on a assez d'infos pour proposer la génération
-        should_show_generate = False
-        if conversation_history:
-            # Compter les messages de l'utilisateur
-            user_messages = [h for h in conversation_history if h.role == 'user']
-            total_user_text = sum(len(msg.content) for msg in user_messages)
-            
-            # Mots-clés indiquant une description complète
-            keywords = ['projet', 'mémoire', 'sujet', 'veux', 'souhaite', 'intéresse', 'domaine']
-            user_text = " ".join([msg.content.lower() for msg in user_messages])
-            keyword_count = sum(1 for kw in keywords if kw in user_text)
-            
-            if total_user_text > 200 and keyword_count >= 3:
-                should_show_generate = True
-        
-        suggestions = []
-        if should_show_generate:
-            suggestions = [
-                "J'ai suffisamment d'informations sur votre projet",
-                "Je peux maintenant générer des sujets pertinents pour vous",
-                "Voulez-vous que je génère 3 sujets basés sur notre discussion ?"
-            ]
-        
         return {
             "message": message,
-            "suggestions": suggestions,
-            "actions": [
-                {"text": "🎯 Générer 3 sujets", "action": "generate_three"}
-            ] if should_show_generate else [],
+            **_chat_suggestions(conversation_history),
             "timestamp": datetime.utcnow().isoformat()
         }
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Erreur dans chat_with_ai: {e}")
         return {
@@ -393,37 +438,105 @@ async def chat_with_ai(
             "timestamp": datetime.utcnow().isoformat()
         }
 
-# la route pour communiquer avec notre AI
-@router.post("/ask", response_model=schemas.AIResponse)
-async def ask_question(
-    request: schemas.AIRequest,
+# ========== RÉPONSES EN FLUX (SSE) ==========
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _first_chunk(stream: AsyncIterator[str]) -> str:
+    """
+    Premier morceau lu avant d'envoyer la réponse: une file LLM pleine donne encore
+    un 503 + Retry-After (LLMOverloaded) au lieu d'un flux interrompu
+    """
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return ""
+
+async def _sse_answer(
+    stream: AsyncIterator[str],
+    first: str,
+    user_id: int,
+    question: str,
+    extra: Dict[str, Any]
+) -> AsyncIterator[str]:
+    """
+    Événements "token" ({"text"}) au fil de la réponse, puis "done" (message complet
+    + `extra`) une fois la conversation sauvegardée
+    """
+    parts = []
+    try:
+        if first:
+            parts.append(first)
+            yield _sse("token", {"text": first})
+        async for text in stream:
+            parts.append(text)
+            yield _sse("token", {"text": text})
+    finally:
+        await stream.aclose()
+
+    message = "".join(parts).strip()
+    # Session propre au flux: celle de la requête est fermée pendant l'envoi
+    db = SessionLocal()
+    try:
+        crud.save_conversation_message(db, user_id=user_id, role="user", content=question)
+        crud.save_conversation_message(db, user_id=user_id, role="assistant", content=message)
+    except Exception as e:
+        print(f"⚠️ Erreur sauvegarde conversation (flux): {e}")
+    finally:
+        db.close()
+
+    yield _sse("done", {"message": message, **extra, "timestamp": datetime.utcnow().isoformat()})
+
+@router.post("/chat/stream")
+async def chat_with_ai_stream(
+    request: schemas.AIChatRequest,
     current_user = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Route legacy pour compatibilité avec l'ancien frontend - AVEC CONTEXTE COMPLET"""
-    try:
-        # 1. RÉCUPÉRER TOUT L'HISTORIQUE RÉCENT
-        conversation_history = crud.get_conversation_history(db, current_user.id, limit=10)
-        
-        # 2. CONSTRUIRE UN CONTEXTE RICHE
-        history_context = "HISTORIQUE DE LA CONVERSATION (du plus ancien au plus récent):\n"
-        for msg in conversation_history[-5:]:  # 5 derniers messages seulement
-            role = "ÉTUDIANT" if msg.role == 'user' else "MEMOBOT"
-            history_context += f"{role}: {msg.content}\n"
-        
-        # 3. AJOUTER LES PRÉFÉRENCES
-        preference = crud.get_or_create_preference(db, current_user.id)
-        user_info = ""
-        if preference:
-            if preference.interests:
-                user_info += f"Intérêts connus: {preference.interests}. "
-            if preference.level:
-                user_info += f"Niveau académique: {preference.level}. "
-            if preference.faculty:
-                user_info += f"Faculté: {preference.faculty}. "
-        
-        # 4. CONSTRUIRE LE CONTEXTE COMPLET
-        full_context = f"""
+    """/chat en Server-Sent Events: les morceaux de la réponse arrivent au fur et à mesure"""
+    conversation_history, history_context, user_preferences = _chat_context(db, current_user.id)
+    stream = répondre_question_cohérente_stream(
+        question=request.message,
+        contexte=history_context,
+        user_preferences=user_preferences,
+        user_key=str(current_user.id)
+    )
+    first = await _first_chunk(stream)
+
+    return StreamingResponse(
+        _sse_answer(stream, first, current_user.id, request.message, _chat_suggestions(conversation_history)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+def _ask_context(db: Session, user_id: int) -> str:
+    """Contexte complet de /ask: préférences + historique récent"""
+    # 1. RÉCUPÉRER TOUT L'HISTORIQUE RÉCENT
+    conversation_history = crud.get_conversation_history(db, user_id, limit=10)
+    
+    # 2. CONSTRUIRE UN CONTEXTE RICHE
+    history_context = "HISTORIQUE DE LA CONVERSATION (du plus ancien au plus récent):\n"
+    for msg in conversation_history[-5:]:  # 5 derniers messages seulement
+        role = "ÉTUDIANT" if msg.role == 'user' else "MEMOBOT"
+        history_context += f"{role}: {msg.content}\n"
+    
+    # 3. AJOUTER LES PRÉFÉRENCES
+    preference = crud.get_or_create_preference(db, user_id)
+    user_info = ""
+    if preference:
+        if preference.interests:
+            user_info += f"Intérêts connus: {preference.interests}. "
+        if preference.level:
+            user_info += f"Niveau académique: {preference.level}. "
+        if preference.faculty:
+            user_info += f"Faculté: {preference.faculty}. "
+    
+    # 4. CONSTRUIRE LE CONTEXTE COMPLET
+    return f"""
         INFORMATIONS UTILISATEUR:
         {user_info if user_info else "Pas d'informations supplémentaires."}
         
@@ -432,9 +545,28 @@ async def ask_question(
         NOTE IMPORTANTE: Tu dois RESTER COHÉRENT avec l'historique ci-dessus.
         Si l'étudiant change de sujet abruptement, rappelle-lui gentiment le sujet en cours.
         """
+
+def _ask_suggestions(question: str) -> List[str]:
+    suggestions = []
+    if any(word in question.lower() for word in ['génie', 'civil', 'bâtiment', 'construction']):
+        suggestions.append("Voir des exemples de sujets en génie civil")
+        suggestions.append("Explorer les méthodologies pour projets de construction")
+    return suggestions[:2]  # Max 2 suggestions
+
+# la route pour communiquer avec notre AI
+@router.post("/ask", response_model=schemas.AIResponse)
+async def ask_question(
+    request: schemas.AIRequest,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Route legacy pour compatibilité avec l'ancien frontend - AVEC CONTEXTE COMPLET"""
+    try:
+        # 1-4. HISTORIQUE RÉCENT + PRÉFÉRENCES = CONTEXTE COMPLET
+        full_context = _ask_context(db, current_user.id)
         
         # 5. Obtenir la réponse AVEC CONTEXTE COMPLET
-        message = répondre_question(request.question, full_context)
+        message = await répondre_question_async(request.question, full_context, user_key=str(current_user.id))
         
         # 6. SAUVEGARDER LA CONVERSATION
         crud.save_conversation_message(
@@ -452,17 +584,14 @@ async def ask_question(
         )
         
         # 7. Suggestions intelligentes basées sur le contenu
-        suggestions = []
-        if any(word in request.question.lower() for word in ['génie', 'civil', 'bâtiment', 'construction']):
-            suggestions.append("Voir des exemples de sujets en génie civil")
-            suggestions.append("Explorer les méthodologies pour projets de construction")
-        
         return schemas.AIResponse(
             question=request.question,
             message=message,
-            suggestions=suggestions[:2]  # Max 2 suggestions
+            suggestions=_ask_suggestions(request.question)
         )
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Erreur dans ask_question: {e}")
         return schemas.AIResponse(
@@ -471,6 +600,27 @@ async def ask_question(
             suggestions=["Reprendre le sujet précédent", "Clarifier le lien entre les idées"]
         )
         
+@router.post("/ask/stream")
+async def ask_question_stream(
+    request: schemas.AIRequest,
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """/ask en Server-Sent Events: les morceaux de la réponse arrivent au fur et à mesure"""
+    stream = répondre_question_stream(
+        request.question, _ask_context(db, current_user.id), user_key=str(current_user.id)
+    )
+    first = await _first_chunk(stream)
+
+    return StreamingResponse(
+        _sse_answer(
+            stream, first, current_user.id, request.question,
+            {"question": request.question, "suggestions": _ask_suggestions(request.question)}
+        ),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @router.post("/recommend", response_model=List[schemas.RecommendedSujet])
 async def recommend_with_ai(
     request: schemas.RecommendationRequest,
@@ -482,15 +632,28 @@ async def recommend_with_ai(
         # Limiter à 3 recommandations maximum
         request.limit = min(request.limit, 3)
         
-        # Utiliser le moteur traditionnel (garder la logique existante)
-        recommendations = recommendation_engine.recommend_sujets(
+        # Profil identique aux préférences stockées: top-K précalculé (une requête indexée)
+        if request.domaine is None and request.difficulté is None:
+            precomputed = get_precomputed_recommendations(
+                db, current_user.id, request.interests,
+                niveau=request.niveau, faculté=request.faculté, limit=request.limit
+            )
+            if precomputed is not None:
+                return precomputed
+        
+        # Utiliser le moteur traditionnel (garder la logique existante).
+        # Dans un thread: la recherche hybride attend un appel d'embedding (Chroma)
+        # qui bloquerait la boucle d'événements
+        recommendations = await asyncio.to_thread(
+            recommendation_engine.recommend_sujets,
             db=db,
             interests=request.interests,
             niveau=request.niveau,
             faculté=request.faculté,
             domaine=request.domaine,
             difficulté=request.difficulté,
-            limit=request.limit
+            limit=request.limit,
+            user_id=current_user.id
         )
         
         # Convertir au format attendu
@@ -512,6 +675,77 @@ async def recommend_with_ai(
             detail=f"Erreur lors de la recommandation: {str(e)}"
         )
         
+def _stream_batch_recommendations(profiles: List[Dict[str, Any]], limit: int):
+    """Une ligne JSON par profil, envoyée dès que son paquet est scoré"""
+    # Session propre au flux: celle de la requête est fermée pendant l'envoi
+    db = SessionLocal()
+    try:
+        for index, recommendations in recommendation_engine.iter_batch_recommendations(db, profiles, limit=limit):
+            line = {
+                "index": index,
+                "user_id": profiles[index].get("user_id"),
+                "recommendations": [
+                    {
+                        "sujet": schemas.Sujet.model_validate(rec["sujet"]).model_dump(mode="json"),
+                        "score": rec["score"],
+                        "raisons": rec["raisons"],
+                        "critères_respectés": rec["critères_respectés"]
+                    }
+                    for rec in recommendations
+                ]
+            }
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    except Exception as e:
+        print(f"Erreur dans recommend_batch: {e}")
+        yield json.dumps({"error": f"Erreur lors de la recommandation: {str(e)}"}, ensure_ascii=False) + "\n"
+    finally:
+        db.close()
+
+@router.post("/recommend/batch")
+async def recommend_batch(
+    request: schemas.BatchRecommendationRequest,
+    current_user = Depends(require_staff),
+    db: Session = Depends(get_db)
+):
+    """
+    Recommandations pour toute une promotion (admin / enseignant).
+    Profils explicites et/ou préférences des étudiants sélectionnées par faculté / niveau.
+    Réponse NDJSON: {"index", "user_id", "recommendations"} par profil.
+    """
+    profiles = [
+        {
+            "user_id": profile.user_id,
+            "interests": profile.interests,
+            "niveau": profile.niveau,
+            "faculté": profile.faculté,
+            "domaine": profile.domaine,
+            "difficulté": profile.difficulté.value if profile.difficulté else None
+        }
+        for profile in request.profiles
+    ]
+
+    if request.faculté or request.niveau:
+        for preference in crud.get_cohort_preferences(db, faculty=request.faculté, level=request.niveau):
+            profiles.append({
+                "user_id": preference.user_id,
+                "interests": [i.strip() for i in (preference.interests or "").split(",") if i.strip()],
+                "niveau": preference.level,
+                "faculté": preference.faculty,
+                "domaine": None,
+                "difficulté": None
+            })
+
+    if not profiles:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Aucun profil: fournir des profils ou un sélecteur faculté/niveau"
+        )
+
+    return StreamingResponse(
+        _stream_batch_recommendations(profiles, request.limit),
+        media_type="application/x-ndjson"
+    )
+        
 @router.post("/analyze", response_model=schemas.AIAnalysisResponse)
 async def analyze_subject(
     request: schemas.AnalyzeSubjectRequest,
@@ -532,7 +766,7 @@ async def analyze_subject(
         }
         
         # Utiliser la fonction d'analyse existante
-        analysis = analyser_sujet(sujet_data)
+        analysis = await analyser_sujet_async(sujet_data, user_key=str(current_user.id))
         
         # Sauvegarder l'analyse dans l'historique
         history_data = schemas.UserHistoryCreate(
@@ -557,6 +791,8 @@ async def analyze_subject(
             "recommandations": analysis.get("recommandations", [])
         }
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Erreur dans analyze_subject: {e}")
         # Retourner une analyse par défaut en cas d'erreur
@@ -617,7 +853,7 @@ async def generate_subjects_from_conversation(
         }
         
         # Générer 3 sujets
-        generated_subjects = générer_sujets_llm(params, 3)
+        generated_subjects = await générer_sujets_llm_async(params, 3, user_key=str(current_user.id))
         
         # Créer un identifiant de session
         import uuid
@@ -663,6 +899,8 @@ async def generate_subjects_from_conversation(
             "message": f"3 sujets générés basés sur notre conversation ({len(conversation_history)} échanges)"
         }
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Erreur dans generate_from_conversation: {e}")
         raise HTTPException(
@@ -682,7 +920,7 @@ async def ask_question_public(
         context = "Utilisateur non connecté posant une question sur un sujet de mémoire."
         
         # Obtenir la réponse de l'IA
-        message = répondre_question(request.question, context)
+        message = await répondre_question_async(request.question, context)
         
         # Nettoyer la réponse
         if "**RÉPONSE:**" in message:
@@ -706,6 +944,8 @@ async def ask_question_public(
             suggestions=suggestions
         )
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Erreur dans ask_question_public: {e}")
         return schemas.AIResponse(
@@ -736,7 +976,7 @@ async def analyze_subject_public(
         }
         
         # Utiliser la fonction d'analyse existante
-        analysis = analyser_sujet(sujet_data)
+        analysis = await analyser_sujet_async(sujet_data)
         
         return {
             "pertinence": analysis.get("pertinence", 75),
@@ -746,6 +986,8 @@ async def analyze_subject_public(
             "recommandations": analysis.get("recommandations", [])
         }
         
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(f"Erreur dans analyze_subject_public: {e}")
         return {
@@ -1,22 +1,44 @@
 # app/routes/sujets.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import os
 from datetime import datetime
 from sqlalchemy import func
 
-from app.database import get_db
-from app import crud, schemas
+from app.database import SessionLocal, get_db
+from app import catalog_events, crud, export, schemas, search_cache, sujet_analysis
+from app import pagination
+from app import search as fulltext
+from app import suggest
 from app.dependencies import get_current_user, require_admin
 from app.llm_service import (
-    recommander_sujets_llm as recommander_sujets,
-    analyser_sujet,
-    générer_sujets_llm as générer_sujets
+    recommander_sujets_llm_async as recommander_sujets,
+    générer_sujets_llm_async as générer_sujets
 )
 from app.models import Sujet, Feedback, UserHistory
+from app.recommendation import recommendation_engine, recommendation_cache_key
+from app.cache import TTLCache
+from app.vocabulary import vocabulary
 
 router = APIRouter()
 
+# Recommandations LLM déjà calculées pour les mêmes critères et la même version du catalog
+llm_recommendation_cache = TTLCache(
+    "llm_recommendations",
+    maxsize=int(os.getenv("LLM_RECOMMENDATION_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("LLM_RECOMMENDATION_CACHE_TTL", "900"))
+)
+
+# Comptes de facettes par recherche et filtres, pour une version du catalog
+facet_cache = TTLCache(
+    "facets",
+    maxsize=int(os.getenv("FACET_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("FACET_CACHE_TTL", "600"))
+)
+
 # ========== CRUD SUJETS ==========
 
 @router.post("/", response_model=schemas.Sujet)
@@ -32,67 +54,39 @@ async def create_sujet(
 
 @router.get("/", response_model=List[schemas.Sujet])
 async def list_sujets(
+    response: Response,
     q: str = Query(None, description="Terme de recherche"),
     domaine: str = Query(None, description="Domaine"),
     faculté: str = Query(None, description="Faculté"),
     niveau: str = Query(None, description="Niveau"),
     difficulté: str = Query(None, description="Difficulté"),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor)"),
     limit: int = Query(20, ge=1, le=100),
+    include_total: bool = Query(False, description="Total (estimé sur un grand catalog) dans l'en-tête X-Total-Count"),
     db: Session = Depends(get_db)
 ):
     """
-    Lister tous les sujets avec filtres
-    """
-    sujets = crud.get_sujets(
-        db=db,
-        skip=skip,
-        limit=limit,
-        search=q,
-        domaine=domaine,
-        faculté=faculté,
-        niveau=niveau,
-        difficulté=difficulté
-    )
-    
-    return sujets
-
-@router.get("/{sujet_id}")
-async def get_sujet(
-    sujet_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
-):
-    """
-    Récupérer un sujet spécifique avec analyse IA
+    Lister tous les sujets avec filtres.
+    Pagination par curseur: renvoyer l'en-tête X-Next-Cursor dans `cursor`
+    (skip reste accepté pour compatibilité).
     """
-    sujet = crud.get_sujet(db, sujet_id)
-    if not sujet or not sujet.is_active:
-        raise HTTPException(status_code=404, detail="Sujet non trouvé")
-    
-    # Incrémenter le compteur de vues
-    crud.update_sujet_vue_count(db, sujet_id)
-    
-    # Analyser le sujet avec IA (optionnel)
+    filters = dict(search=q, domaine=domaine, faculté=faculté, niveau=niveau, difficulté=difficulté)
+    if skip and not cursor:
+        return search_cache.get_sujets(db, skip=skip, limit=limit, **filters)
+
     try:
-        analyse = analyser_sujet({
-            "titre": sujet.titre,
-            "domaine": sujet.domaine,
-            "niveau": sujet.niveau,
-            "faculté": sujet.faculté,
-            "problematique": sujet.problématique,
-            "description": sujet.description,
-            "keywords": sujet.keywords
-        })
-        return {"sujet": sujet, "analyse": analyse}
-    except Exception as e:
-        print(f"Erreur analyse IA: {e}")
-        return {"sujet": sujet}
+        sujets, next_cursor = search_cache.get_sujets_page(db, cursor=cursor, limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    total = crud.count_sujets(db, **filters) if include_total else None
+    pagination.set_page_headers(response, next_cursor, total)
+    return sujets
 
 # ========== SUJETS UTILISATEUR ==========
-# app/routes/sujets.py
-from pydantic import ValidationError  # à ajouter si pas présent
 
+# Les routes à chemin fixe sont déclarées avant GET /{sujet_id}, qui les masquerait sinon
 @router.get("/user-sujets", response_model=List[schemas.Sujet])
 async def get_user_sujets(
     db: Session = Depends(get_db),
@@ -186,29 +180,158 @@ async def get_user_favoris(
 
 @router.get("/search")
 async def search_sujets(
+    response: Response,
     q: str = Query(None, description="Terme de recherche"),
     domaine: str = Query(None, description="Domaine"),
     faculté: str = Query(None, description="Faculté"),
     niveau: str = Query(None, description="Niveau"),
+    fuzzy: bool = Query(False, description="Recherche approchée (mots partiels, fautes de frappe)"),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor)"),
     limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db)
 ):
     """
-    Rechercher des sujets
+    Rechercher des sujets.
+    Pagination par curseur (en-tête X-Next-Cursor); skip reste accepté pour compatibilité.
     """
-    sujets = crud.get_sujets(
-        db=db,
-        skip=skip,
-        limit=limit,
-        search=q,
-        domaine=domaine,
-        faculté=faculté,
-        niveau=niveau
-    )
+    try:
+        # Le curseur garde la recherche qui a produit la première page (approchée, corrigée)
+        state = pagination.cursor_state(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    q = state.get("q", q)
+    fuzzy = fuzzy or bool(state.get("fuzzy"))
+
+    def search_page(search, fuzzy_mode, page_state=None):
+        if skip and not cursor:
+            return search_cache.get_sujets(
+                db, skip=skip, limit=limit, search=search,
+                domaine=domaine, faculté=faculté, niveau=niveau, fuzzy=fuzzy_mode
+            ), None
+        return search_cache.get_sujets_page(
+            db, cursor=cursor, limit=limit, search=search,
+            domaine=domaine, faculté=faculté, niveau=niveau, fuzzy=fuzzy_mode, state=page_state
+        )
+
+    try:
+        sujets, next_cursor = search_page(q, fuzzy, {"fuzzy": True} if fuzzy else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    first_page = skip == 0 and not cursor
+    
+    # Aucun résultat plein texte (mot partiel, faute de frappe): recherche approchée
+    if q and not sujets and not fuzzy and first_page and fulltext.is_trigram_enabled(db):
+        sujets, next_cursor = search_page(q, True, {"fuzzy": True})
     
+    # Aucun résultat: on retente avec le mot-clé du catalog le plus proche (faute de frappe, accents)
+    if q and not sujets and first_page:
+        corrected = recommendation_engine.ensure_vocabulary(db).correct(q)
+        if corrected:
+            surface = vocabulary.surface(corrected)
+            print(f"🔤 Recherche corrigée: '{q}' -> '{surface}'")
+            sujets, next_cursor = search_page(surface, False, {"q": surface})
+    
+    pagination.set_page_headers(response, next_cursor)
     return sujets
 
+@router.get("/facets", response_model=schemas.FacetedSearchResponse)
+async def get_sujet_facets(
+    q: str = Query(None, description="Terme de recherche"),
+    domaine: str = Query(None, description="Domaine"),
+    faculté: str = Query(None, description="Faculté"),
+    niveau: str = Query(None, description="Niveau"),
+    difficulté: str = Query(None, description="Difficulté"),
+    fuzzy: bool = Query(False, description="Recherche approchée (mots partiels, fautes de frappe)"),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Recherche à facettes: sujets correspondants et, pour la barre de filtres, le nombre
+    de sujets par domaine, faculté, niveau et difficulté.
+    Les comptes sont mis en cache jusqu'au prochain changement du catalog.
+    """
+    filters = dict(search=q, domaine=domaine, faculté=faculté, niveau=niveau, difficulté=difficulté, fuzzy=fuzzy)
+    try:
+        sujets, next_cursor = search_cache.get_sujets_page(db, cursor=cursor, limit=limit, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Écritures des autres workers prises en compte avant de lire la version
+    catalog_events.sync_from_outbox(db)
+    key = (q, domaine, faculté, niveau, difficulté, fuzzy, catalog_events.get_catalog_version())
+    facets = facet_cache.get(key)
+    if facets is None:
+        facets = crud.get_sujet_facets(db, **filters)
+        facet_cache.set(key, facets)
+
+    return {
+        "sujets": sujets,
+        "total": facets["total"],
+        "facets": facets["facets"],
+        "next_cursor": next_cursor
+    }
+
+@router.get("/suggest", response_model=List[schemas.Suggestion])
+async def suggest_sujets(
+    prefix: str = Query(..., min_length=1, max_length=100, description="Début de la saisie"),
+    limit: int = Query(8, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    """
+    Autocomplétion: titres et mots-clés qui commencent par `prefix` (accents et
+    casse ignorés), les plus consultés d'abord. Répond depuis la mémoire, sans requête SQL
+    une fois l'index construit.
+    """
+    index = suggest.ensure_suggest_index(db)
+    recommendation_engine.ensure_vocabulary(db)
+    return [
+        {
+            "type": kind,
+            "label": label if kind == suggest.TITLE else vocabulary.surface(label),
+            "sujet_id": sujet_id
+        }
+        for kind, label, sujet_id, _ in index.suggest(prefix, limit)
+    ]
+
+@router.get("/export")
+async def export_sujets(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    q: str = Query(None, description="Terme de recherche"),
+    domaine: str = Query(None, description="Domaine"),
+    faculté: str = Query(None, description="Faculté"),
+    niveau: str = Query(None, description="Niveau"),
+    difficulté: str = Query(None, description="Difficulté"),
+    fuzzy: bool = Query(False, description="Recherche approchée (sous-chaînes, fautes de frappe)"),
+    current_user = Depends(get_current_user)
+):
+    """
+    Export du catalog complet (mêmes filtres et même ordre que GET /), envoyé en flux
+    NDJSON ou CSV à mesure de la lecture: mémoire constante quelle que soit la taille.
+    """
+    filters = dict(search=q, domaine=domaine, faculté=faculté, niveau=niveau, difficulté=difficulté, fuzzy=fuzzy)
+    media_type, extension = export.FORMATS[format]
+
+    def stream():
+        # Session propre au flux: celle de get_db est fermée avant la fin de l'envoi
+        db = SessionLocal()
+        try:
+            rows = crud.iter_sujets(db, export.export_columns(), batch_size=export.EXPORT_BATCH_SIZE, **filters)
+            yield from export.serialize(rows, format)
+        except Exception as e:
+            # Les en-têtes sont déjà partis: le flux est simplement interrompu
+            print(f"❌ Erreur pendant l'export du catalog: {e}")
+        finally:
+            db.close()
+
+    filename = f"sujets-{datetime.utcnow():%Y%m%d}.{extension}"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/explore/recent", response_model=List[schemas.Sujet])
 async def get_recent_sujets(
     limit: int = Query(20, ge=1, le=100),
@@ -276,10 +399,38 @@ async def recommend_sujets(
             "level": request.niveau
         })
         
-        # Récupérer les sujets correspondants
+        # Même demande récente sur le même catalog: pas de recherche ni d'appel LLM
+        catalog_events.sync_from_outbox(db)
+        cache_key = recommendation_cache_key(
+            request.interests, request.niveau, request.faculté,
+            request.domaine, request.difficulté, request.limit
+        )
+        cached = llm_recommendation_cache.get(cache_key)
+        if cached is not None:
+            sujets = {s.id: s for s in crud.get_sujets_by_ids(db, [rec["id"] for rec in cached])}
+            return [
+                {
+                    "sujet": sujets[rec["id"]],
+                    "score": rec["score"],
+                    "raisons": rec["raisons"],
+                    "critères_respectés": rec["critères_respectés"]
+                }
+                for rec in cached
+                if rec["id"] in sujets
+            ]
+        
+        # Récupérer les sujets correspondants (intérêts + leur correction d'après le vocabulaire)
+        search_keywords = list(request.interests)
+        vocab = recommendation_engine.ensure_vocabulary(db)
+        for interest in request.interests:
+            corrected = vocab.correct(interest)
+            if corrected:
+                surface = vocab.surface(corrected)
+                if surface.lower() not in (k.lower() for k in search_keywords):
+                    search_keywords.append(surface)
         sujets_db = crud.search_sujets_by_keywords(
             db, 
-            request.interests, 
+            search_keywords, 
             limit=50
         )
         
@@ -304,8 +455,9 @@ async def recommend_sujets(
             })
         
         # Obtenir les recommandations LLM
+        llm_succeeded = False
         try:
-            recommendations = recommander_sujets(
+            recommendations = await recommander_sujets(
                 interests=request.interests,
                 sujets=sujets_data,
                 critères={
@@ -313,10 +465,13 @@ async def recommend_sujets(
                     "faculté": request.faculté,
                     "domaine": request.domaine,
                     "difficulté": request.difficulté
-                }
+                },
+                # File d'attente LLM pleine: LLMOverloaded, recommandations par mots-clés ci-dessous
+                user_key=str(current_user.id)
             )
             
             print(f"✅ Nombre de recommandations LLM: {len(recommendations)}")
+            llm_succeeded = True
             
         except Exception as llm_error:
             print(f"⚠️ Erreur LLM, utilisation du fallback: {llm_error}")
@@ -347,6 +502,17 @@ async def recommend_sujets(
                 })
         
         print(f"✅ Nombre de résultats finaux: {len(result)}")
+        # Le fallback n'est pas mis en cache: le LLM peut revenir à la requête suivante
+        if llm_succeeded:
+            llm_recommendation_cache.set(cache_key, [
+                {
+                    "id": rec["sujet"].id,
+                    "score": rec["score"],
+                    "raisons": rec["raisons"],
+                    "critères_respectés": rec["critères_respectés"]
+                }
+                for rec in result
+            ])
         return result
         
     except HTTPException:
@@ -373,12 +539,12 @@ async def generate_sujets(
     """
     Générer de nouveaux sujets avec IA
     """
-    sujets = générer_sujets({
+    sujets = await générer_sujets({
         "interests": ", ".join(interests),
         "domaine": domaine,
         "niveau": niveau,
         "faculté": faculté
-    }, count)
+    }, count, user_key=str(current_user.id))
     
     return sujets
 
@@ -452,6 +618,39 @@ async def get_domains_stats(db: Session = Depends(get_db)):
 
 # ========== ACTIONS SUR SUJETS ==========
 
+@router.get("/{sujet_id}")
+async def get_sujet(
+    sujet_id: int,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Récupérer un sujet spécifique avec analyse IA
+    """
+    sujet = crud.get_sujet(db, sujet_id)
+    if not sujet or not sujet.is_active:
+        raise HTTPException(status_code=404, detail="Sujet non trouvé")
+    
+    # Incrémenter le compteur de vues
+    crud.update_sujet_vue_count(db, sujet_id)
+    
+    # Analyse IA enregistrée dans ai_analysis, (re)calculée seulement si le sujet,
+    # le prompt ou le modèle ont changé (voir app/sujet_analysis.py)
+    try:
+        analyse, analyse_status = await sujet_analysis.get_or_schedule_analysis_async(
+            db, sujet, background_tasks, user_key=str(current_user.id)
+        )
+    except Exception as e:
+        print(f"Erreur analyse IA: {e}")
+        db.rollback()
+        return {"sujet": schemas.Sujet.model_validate(sujet)}
+    # Sérialisé par le schéma: la colonne brute ai_analysis n'est pas renvoyée
+    sujet_out = schemas.Sujet.model_validate(sujet)
+    if analyse is None:
+        return {"sujet": sujet_out, "analyse_status": analyse_status}
+    return {"sujet": sujet_out, "analyse": analyse, "analyse_status": analyse_status}
+
 @router.put("/{sujet_id}", response_model=schemas.Sujet)
 async def update_sujet(
     sujet_id: int,
@@ -485,6 +684,27 @@ async def delete_sujet(
     
     return {"message": "Sujet supprimé avec succès"}
 
+@router.get("/{sujet_id}/similar", response_model=List[schemas.SimilarSujet])
+async def get_similar_sujets(
+    sujet_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Sujets appréciés par les mêmes étudiants (filtrage collaboratif item-item)
+    """
+    model = recommendation_engine.ensure_collaborative_model(db)
+    if model is None:
+        return []
+
+    neighbours = model.similar(sujet_id, limit=limit)
+    sujets = {s.id: s for s in crud.get_sujets_by_ids(db, [neighbour_id for neighbour_id, _ in neighbours])}
+    return [
+        {"sujet": sujets[neighbour_id], "similarity": round(min(similarity, 1.0), 4)}
+        for neighbour_id, similarity in neighbours
+        if neighbour_id in sujets and sujets[neighbour_id].is_active
+    ]
+
 @router.post("/{sujet_id}/like")
 async def like_sujet(
     sujet_id: int,
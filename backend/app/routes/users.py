@@ -1,10 +1,10 @@
 # app/routes/users.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 from app.database import get_db
-from app import crud, schemas
+from app import crud, pagination, schemas
 from app.dependencies import get_current_user, require_admin
 from app.models import User, UserHistory, Sujet, Feedback, ConversationMessage, UserProfile, UserSkill
 
@@ -119,6 +119,28 @@ async def get_user_activity(
             detail=f"Erreur serveur: {str(e)}"
         )
 
+@router.get("/me/feedbacks", response_model=List[schemas.Feedback])
+def read_my_feedbacks(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor)"),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Récupérer tous les feedbacks de l'utilisateur connecté, du plus ancien au plus récent.
+    Pagination par curseur (en-tête X-Next-Cursor); skip reste accepté pour compatibilité.
+    """
+    if skip and not cursor:
+        return crud.get_user_feedbacks(db, current_user.id, skip=skip, limit=limit)
+    try:
+        feedbacks, next_cursor = crud.get_user_feedbacks_page(db, current_user.id, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pagination.set_page_headers(response, next_cursor)
+    return feedbacks
+
 # ========== PRÉFÉRENCES UTILISATEUR ==========
 
 @router.get("/me/preferences")
@@ -296,16 +318,25 @@ def get_dashboard_stats(
 
 @router.get("/", response_model=List[schemas.User])
 def read_users(
+    response: Response,
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Curseur de la page suivante (en-tête X-Next-Cursor)"),
     limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user = Depends(require_admin)  # Seulement pour les admins
 ):
     """
-    Récupérer tous les utilisateurs.
+    Récupérer tous les utilisateurs, par ordre d'inscription (id croissant).
     Accessible uniquement aux administrateurs.
+    Pagination par curseur (en-tête X-Next-Cursor); skip reste accepté pour compatibilité.
     """
-    users = crud.get_users(db, skip=skip, limit=limit)
+    if skip and not cursor:
+        return crud.get_users(db, skip=skip, limit=limit)
+    try:
+        users, next_cursor = crud.get_users_page(db, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pagination.set_page_headers(response, next_cursor)
     return users
 
 @router.get("/{user_id}", response_model=schemas.User)
@@ -154,6 +154,27 @@ class RecommendedSujet(BaseModel):
     raisons: List[str] = Field(..., description="Raisons de la recommandation")
     critères_respectés: List[str] = Field(..., description="Critères d'acceptation respectés")
 
+
+class SimilarSujet(BaseModel):
+    sujet: Sujet
+    similarity: float = Field(..., ge=0, le=1, description="Similarité d'après les feedbacks")
+
+
+class BatchRecommendationProfile(BaseModel):
+    user_id: Optional[int] = None
+    interests: List[str] = Field(default_factory=list, description="Centres d'intérêt")
+    niveau: Optional[str] = None
+    faculté: Optional[str] = None
+    domaine: Optional[str] = None
+    difficulté: Optional[DifficultyLevel] = None
+
+
+class BatchRecommendationRequest(BaseModel):
+    profiles: List[BatchRecommendationProfile] = Field(default_factory=list, description="Profils explicites")
+    faculté: Optional[str] = Field(None, description="Sélection des préférences étudiantes par faculté")
+    niveau: Optional[str] = Field(None, description="Sélection des préférences étudiantes par niveau")
+    limit: int = Field(3, ge=1, le=50, description="Nombre de résultats par profil")
+
 # ========== FEEDBACK SCHEMAS ==========
 class FeedbackCreate(BaseModel):
     sujet_id: int = Field(..., description="ID du sujet")
@@ -388,6 +409,21 @@ class DomainStats(BaseModel):
     count: int
     avg_views: float
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class Suggestion(BaseModel):
+    type: str = Field(..., description="titre ou keyword")
+    label: str
+    sujet_id: Optional[int] = None
+
+class FacetedSearchResponse(BaseModel):
+    sujets: List[Sujet]
+    total: int
+    facets: Dict[str, List[FacetCount]]
+    next_cursor: Optional[str] = None
+
 # ========== DASHBOARD SCHEMAS ==========
 class DashboardStats(BaseModel):
     total_sujets: int
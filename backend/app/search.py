@@ -0,0 +1,320 @@
+# app/search.py
+"""
+Moteurs de recherche plein texte des sujets, choisis par configuration.
+
+SEARCH_BACKEND:
+- "postgres": colonne générée `sujets.search_vector` (migration 9d4f6c2a71e8):
+  titre poids A, keywords B, problématique + description C, configuration
+  `french_unaccent` (racinisation française, sans accents), index GIN, ts_rank_cd
+- "sqlite_fts": table virtuelle FTS5 `sujets_fts` (migration 6f1a2c8d4b97, tenue
+  à jour par triggers sur les colonnes indexées), accents ignorés, classement
+  bm25(); les termes de la requête sont racinisés puis cherchés par préfixe ("réseaux" -> reseau*)
+- "bm25": index BM25 en mémoire (app/bm25.py), quel que soit le moteur SQL
+- "like": LIKE sur titre/keywords/description, sans classement
+- "auto" (défaut): postgres sous PostgreSQL une fois migré, sqlite_fts sous
+  SQLite, bm25 sinon
+
+Chaque moteur filtre une requête SQLAlchemy sur Sujet et fournit l'expression de
+pertinence utilisée pour le tri et la pagination par curseur: les filtres, facettes
+et pages restent en SQL, quel que soit le moteur.
+
+Recherche approchée (PostgreSQL, migration 3b7e0d9c5f21): index GIN pg_trgm sur
+titre et keywords. Ils servent les sous-chaînes (ILIKE '%algo%') et les fautes de
+frappe (opérateur <% de word_similarity, seuil SEARCH_TRIGRAM_THRESHOLD).
+"""
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Float, cast, column, inspect, literal, literal_column, or_, table, text as sql_text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app import catalog_events
+from app.bm25 import analyze, bm25_index
+from app.models import Sujet
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+FTS_CONFIG = os.getenv("SEARCH_FTS_CONFIG", "french_unaccent")
+# Nombre maximal de résultats classés du moteur BM25 en mémoire par requête SQL
+# (filtrés ensuite en SQL). La pagination par curseur reprend le classement après la
+# dernière ligne vue (une page peut être incomplète en fin de fenêtre, le curseur
+# suivant est quand même fourni); le mode offset (skip) et l'export s'arrêtent à
+# cette limite.
+BM25_MAX_RESULTS = int(os.getenv("SEARCH_BM25_MAX_RESULTS", "1000"))
+# Seuil de word_similarity (0-1) de la recherche approchée: plus bas = plus tolérant
+TRIGRAM_THRESHOLD = float(os.getenv("SEARCH_TRIGRAM_THRESHOLD", "0.4"))
+TRIGRAM_INDEXES = {"ix_sujets_titre_trgm", "ix_sujets_keywords_trgm"}
+
+search_vector = literal_column("sujets.search_vector")
+
+# Fonctionnalités disponibles par moteur (vérifiées une fois)
+_features = {}
+
+
+def _feature_enabled(db: Session, feature: str, check, dialect: str = "postgresql") -> bool:
+    bind = db.get_bind()
+    if bind.dialect.name != dialect:
+        return False
+    key = (str(bind.url), feature)
+    if key not in _features:
+        try:
+            _features[key] = check(bind)
+        except Exception as e:
+            print(f"⚠️ Vérification de la recherche ({feature}) impossible: {e}")
+            _features[key] = False
+        if not _features[key]:
+            print(f"⚠️ Recherche {feature} indisponible")
+    return _features[key]
+
+
+def is_fulltext_enabled(db: Session) -> bool:
+    """Vrai sous PostgreSQL une fois la colonne search_vector créée par la migration"""
+    return _feature_enabled(
+        db, "plein texte PostgreSQL (lancer alembic upgrade head)",
+        lambda bind: "search_vector" in {c["name"] for c in inspect(bind).get_columns("sujets")}
+    )
+
+
+def is_trigram_enabled(db: Session) -> bool:
+    """Vrai sous PostgreSQL une fois les index pg_trgm créés par la migration"""
+    return _feature_enabled(
+        db, "approchée (lancer alembic upgrade head)",
+        lambda bind: TRIGRAM_INDEXES <= {i["name"] for i in inspect(bind).get_indexes("sujets")}
+    )
+
+
+# ======================
+# MOTEURS
+# ======================
+
+class SearchBackend:
+    """
+    Interface d'un moteur: search() / search_any() retournent
+    (requête sur Sujet filtrée, expression de pertinence ou None si non classé).
+    `after`: clés (pertinence, id) du curseur de la page demandée; les moteurs SQL
+    l'ignorent (le curseur est appliqué à la requête), BM25 s'en sert pour
+    reprendre son classement après la dernière ligne vue.
+    """
+    name = "like"
+    ranked = False
+
+    def search(self, db: Session, query, text: str, after: Optional[Sequence[float]] = None) -> Tuple[Any, Optional[Any]]:
+        return query.filter(
+            Sujet.titre.contains(text) |
+            Sujet.keywords.contains(text) |
+            Sujet.description.contains(text)
+        ), None
+
+    def window_end(self, db: Session, text: str, after: Optional[Sequence[float]] = None) -> Optional[Tuple[float, int]]:
+        """
+        Clés (pertinence, id) du dernier résultat de la fenêtre si search() a été tronqué
+        (il reste des résultats au-delà), sinon None. Les moteurs SQL ne tronquent pas.
+        """
+        return None
+
+    def search_any(self, db: Session, query, texts: List[str]) -> Tuple[Any, Optional[Any]]:
+        """Sujets qui correspondent à l'un des textes (OU entre les intérêts)"""
+        texts = [text.lower() for text in texts if text and text.strip()]
+        if not texts:
+            return query, None
+        conditions = []
+        for text in texts:
+            pattern = f"%{text}%"
+            conditions.extend([
+                func.lower(Sujet.keywords).like(pattern),
+                func.lower(Sujet.titre).like(pattern),
+                func.lower(Sujet.description).like(pattern),
+            ])
+        return query.filter(or_(*conditions)), None
+
+
+class PostgresBackend(SearchBackend):
+    name = "postgres"
+    ranked = True
+
+    @staticmethod
+    def text_query(text: str):
+        """tsquery d'une saisie utilisateur (guillemets, OR et - acceptés comme sur un moteur web)"""
+        return func.websearch_to_tsquery(FTS_CONFIG, text)
+
+    def _filter(self, query, tsquery):
+        # ts_rank_cd est un real (float4): en double precision, la valeur relue dans le
+        # curseur (double JSON) est exactement celle comparée par seek_condition
+        rank = cast(func.ts_rank_cd(search_vector, tsquery), Float(53))
+        return query.filter(search_vector.op("@@")(tsquery)), rank
+
+    def search(self, db: Session, query, text: str, after: Optional[Sequence[float]] = None):
+        return self._filter(query, self.text_query(text))
+
+    def search_any(self, db: Session, query, texts: List[str]):
+        queries = [self.text_query(text) for text in texts if text and text.strip()]
+        if not queries:
+            return query, None
+        combined = queries[0]
+        for tsquery in queries[1:]:
+            combined = combined.op("||")(tsquery)
+        return self._filter(query, combined)
+
+
+class SqliteFtsBackend(SearchBackend):
+    name = "sqlite_fts"
+    ranked = True
+    fts = table("sujets_fts", column("rowid"))
+    # Poids des colonnes pour bm25(): titre, keywords, problématique, description
+    WEIGHTS = (3.0, 2.0, 1.0, 1.0)
+    # Racines plus courtes: recherche exacte (un préfixe de 2 lettres couvre tout)
+    MIN_PREFIX_LENGTH = 3
+
+    def ensure_table(self, db: Session) -> bool:
+        """Vrai sous SQLite une fois la table FTS5 et ses triggers créés par la migration"""
+        return _feature_enabled(
+            db, "FTS5 SQLite (lancer alembic upgrade head)",
+            lambda bind: inspect(bind).has_table("sujets_fts"),
+            dialect="sqlite"
+        )
+
+    def match_expression(self, texts: List[str], match_all: bool) -> Optional[str]:
+        """Requête FTS5: termes racinisés, cherchés par préfixe, reliés par AND (ou OR)"""
+        groups = []
+        for text in texts:
+            terms = [
+                f'"{term}"*' if len(term) >= self.MIN_PREFIX_LENGTH else f'"{term}"'
+                for term in dict.fromkeys(analyze(text))
+            ]
+            if terms:
+                groups.append("(" + " AND ".join(terms) + ")")
+        if not groups:
+            return None
+        return (" AND " if match_all else " OR ").join(groups)
+
+    def _filter(self, query, expression: Optional[str]):
+        if expression is None:
+            return query.filter(literal(False)), None
+        fts_table = literal_column("sujets_fts")
+        query = query.join(self.fts, self.fts.c.rowid == Sujet.id).filter(fts_table.op("MATCH")(expression))
+        # bm25() est négatif (meilleur = plus petit): on l'inverse pour trier par pertinence décroissante
+        return query, -func.bm25(fts_table, *self.WEIGHTS)
+
+    def search(self, db: Session, query, text: str, after: Optional[Sequence[float]] = None):
+        return self._filter(query, self.match_expression([text], match_all=True))
+
+    def search_any(self, db: Session, query, texts: List[str]):
+        return self._filter(query, self.match_expression(texts, match_all=False))
+
+
+class BM25Backend(SearchBackend):
+    name = "bm25"
+    ranked = True
+
+    def __init__(self):
+        catalog_events.register_listener(bm25_index)
+
+    def ensure_index(self, db: Session):
+        """Index BM25 construit au premier appel, puis tenu à jour par catalog_events"""
+        catalog_events.sync_from_outbox(db)
+        if not bm25_index.is_built:
+            catalog_events.build_from_db(db, bm25_index, [
+                Sujet.id, Sujet.titre, Sujet.keywords, Sujet.problématique, Sujet.description
+            ])
+            print(f"✅ Index BM25 construit: {len(bm25_index)} sujets")
+        return bm25_index
+
+    def _filter(self, query, results: List[Tuple[int, float]]):
+        if not results:
+            # Expression gardée: un curseur classé reste valide après la dernière fenêtre
+            return query.filter(literal(False)), literal_column("0.0", type_=Float)
+        # CASE écrit directement (entiers et flottants produits ici): construire
+        # 1000 clauses avec case() coûte plus cher que la requête elle-même.
+        # Scores déjà arrondis par l'index: ils reviennent tels quels dans les curseurs.
+        whens = " ".join(f"WHEN {int(sujet_id)} THEN {float(score)!r}" for sujet_id, score in results)
+        score = literal_column(f"(CASE sujets.id {whens} ELSE 0.0 END)", type_=Float)
+        return query.filter(Sujet.id.in_([sujet_id for sujet_id, _ in results])), score
+
+    def _window(self, db: Session, text: str, after: Optional[Sequence[float]]) -> List[Tuple[int, float]]:
+        # Fenêtre de BM25_MAX_RESULTS résultats à partir du curseur, pas depuis le début
+        position = (float(after[0]), int(after[1])) if after else None
+        return self.ensure_index(db).search(text, limit=BM25_MAX_RESULTS, after=position)
+
+    def search(self, db: Session, query, text: str, after: Optional[Sequence[float]] = None):
+        return self._filter(query, self._window(db, text, after))
+
+    def window_end(self, db: Session, text: str, after: Optional[Sequence[float]] = None) -> Optional[Tuple[float, int]]:
+        results = self._window(db, text, after)
+        if len(results) < BM25_MAX_RESULTS:
+            return None
+        sujet_id, score = results[-1]
+        return score, sujet_id
+
+    def search_any(self, db: Session, query, texts: List[str]):
+        text = " ".join(t for t in texts if t)
+        return self._filter(query, self.ensure_index(db).search(text, limit=BM25_MAX_RESULTS, match_all=False))
+
+
+BACKENDS = {
+    "like": SearchBackend(),
+    "postgres": PostgresBackend(),
+    "sqlite_fts": SqliteFtsBackend(),
+    "bm25": BM25Backend(),
+}
+
+
+def get_backend(db: Session) -> SearchBackend:
+    """Moteur configuré par SEARCH_BACKEND s'il est disponible pour cette base, sinon choix automatique"""
+    name = SEARCH_BACKEND
+    if name == "postgres" and not is_fulltext_enabled(db):
+        name = "auto"
+    elif name == "sqlite_fts" and not BACKENDS["sqlite_fts"].ensure_table(db):
+        name = "auto"
+    elif name not in BACKENDS:
+        name = "auto"
+
+    if name != "auto":
+        return BACKENDS[name]
+    if is_fulltext_enabled(db):
+        return BACKENDS["postgres"]
+    if BACKENDS["sqlite_fts"].ensure_table(db):
+        return BACKENDS["sqlite_fts"]
+    return BACKENDS["bm25"]
+
+
+# ======================
+# RECHERCHE APPROCHÉE (pg_trgm)
+# ======================
+
+def escape_like(text: str) -> str:
+    """Échappe les jokers de LIKE (% et _) d'une saisie utilisateur"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def trigram_search(db: Session, query, text: str, threshold: Optional[float] = None):
+    """
+    (requête sur Sujet filtrée, expression de similarité): sous-chaîne ou mot proche
+    de `text` dans le titre ou les mots-clés.
+    Le seuil est fixé pour la transaction en cours (set_config local).
+    """
+    if threshold is None:
+        threshold = TRIGRAM_THRESHOLD
+    db.execute(
+        sql_text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+        {"threshold": str(threshold)}
+    )
+    pattern = f"%{escape_like(text)}%"
+    needle = literal(text)
+    # real (float4) comme ts_rank_cd: en double precision pour les curseurs
+    similarity = cast(func.greatest(
+        func.word_similarity(needle, Sujet.titre),
+        func.word_similarity(needle, func.coalesce(Sujet.keywords, ""))
+    ), Float(53))
+    query = query.filter(or_(
+        Sujet.titre.ilike(pattern, escape="\\"),
+        Sujet.keywords.ilike(pattern, escape="\\"),
+        needle.op("<%")(Sujet.titre),
+        needle.op("<%")(Sujet.keywords),
+    ))
+    return query, similarity
+
+
+def apply_trigram(db: Session, query, text: str, threshold: Optional[float] = None):
+    """Comme trigram_search, triée par word_similarity décroissante"""
+    query, similarity = trigram_search(db, query, text, threshold)
+    return query.order_by(similarity.desc())
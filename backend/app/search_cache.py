@@ -0,0 +1,131 @@
+# app/search_cache.py
+"""
+Cache des pages de résultats de recherche (GET /sujets, /search, /facets).
+
+Les mêmes recherches populaires ("génie civil", "IA", "béton") reviennent sans cesse:
+on garde pour chaque page la liste des ids et le curseur suivant, jamais les objets ORM.
+Un hit coûte une seule requête `WHERE id IN (...)` par clé primaire, qui renvoie des
+compteurs (vues, likes) à jour.
+
+Clé: version du catalog + recherche normalisée + filtres + position (curseur ou skip)
++ taille de page. Une écriture sur les sujets change la version: les anciennes pages
+ne sont plus jamais lues et sortent du LRU.
+
+Durée de vie selon la forme de la requête (premières pages de recherche, pages
+suivantes, simple navigation filtrée); taux de hit par forme dans /system/status.
+"""
+import os
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import catalog_events, crud
+from app import search as fulltext
+from app.cache import TTLCache
+
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+
+# Durée de vie (secondes) par forme de requête
+SHAPE_TTLS = {
+    # Première page d'une recherche texte: les requêtes populaires reviennent toute la journée
+    "search": float(os.getenv("SEARCH_CACHE_TTL", "600")),
+    # Pages suivantes: rarement redemandées à l'identique
+    "search_next": float(os.getenv("SEARCH_CACHE_NEXT_TTL", "60")),
+    # Navigation sans texte (filtres seuls): peu de combinaisons, toutes réutilisées
+    "browse": float(os.getenv("SEARCH_CACHE_BROWSE_TTL", "900")),
+    "browse_next": float(os.getenv("SEARCH_CACHE_NEXT_TTL", "60")),
+}
+
+FILTER_FIELDS = ("domaine", "faculté", "niveau", "difficulté")
+
+search_result_cache = TTLCache("search_results", maxsize=SEARCH_CACHE_SIZE, ttl=SHAPE_TTLS["search"])
+
+
+def normalize_search(db: Session, search: Optional[str], fuzzy: bool = False) -> Optional[str]:
+    """
+    Texte de recherche pour la clé: espaces réduits, et minuscules quand le moteur
+    ignore la casse (moteurs classés, trigrammes) — pas pour LIKE qui y est sensible.
+    """
+    if not search or not search.strip():
+        return None
+    text = " ".join(search.split())
+    if (fuzzy and fulltext.is_trigram_enabled(db)) or fulltext.get_backend(db).ranked:
+        text = text.lower()
+    return text
+
+
+def query_shape(search: Optional[str], filters: Dict[str, Any], next_page: bool) -> Tuple[str, str]:
+    """
+    (forme pour la durée de vie, libellé des compteurs). Le libellé détaille les filtres
+    utilisés, ex: "search+domaine+niveau:next".
+    """
+    kind = "search" if search else "browse"
+    used = [field for field in FILTER_FIELDS if filters.get(field)]
+    if filters.get("fuzzy"):
+        used.append("fuzzy")
+    label = "+".join([kind] + used) + (":next" if next_page else "")
+    return (f"{kind}_next" if next_page else kind), label
+
+
+def _cached(
+    db: Session,
+    key: Tuple,
+    search: Optional[str],
+    filters: Dict[str, Any],
+    next_page: bool,
+    compute: Callable[[], Tuple[List[Any], Optional[str]]]
+) -> Tuple[List[Any], Optional[str]]:
+    # Écritures des autres workers prises en compte avant de lire la version
+    catalog_events.sync_from_outbox(db)
+    key = (catalog_events.get_catalog_version(),) + key
+    shape, label = query_shape(search, filters, next_page)
+
+    entry = search_result_cache.get(key, label=label)
+    if entry is not None:
+        ids, next_cursor = entry
+        return crud.get_sujets_by_ids(db, ids), next_cursor
+
+    sujets, next_cursor = compute()
+    search_result_cache.set(key, ([sujet.id for sujet in sujets], next_cursor), ttl=SHAPE_TTLS[shape])
+    return sujets, next_cursor
+
+
+def get_sujets_page(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    search: Optional[str] = None,
+    state: Optional[Dict[str, Any]] = None,
+    **filters
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    crud.get_sujets_page avec cache (ValueError si le curseur est invalide: rien
+    n'est alors mis en cache)
+    """
+    key = (
+        "page", normalize_search(db, search, filters.get("fuzzy", False)),
+        tuple(sorted(filters.items())), tuple(sorted((state or {}).items())), cursor, limit
+    )
+    return _cached(
+        db, key, search, filters, bool(cursor),
+        lambda: crud.get_sujets_page(db, cursor=cursor, limit=limit, search=search, state=state, **filters)
+    )
+
+
+def get_sujets(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    **filters
+) -> List[Any]:
+    """crud.get_sujets (pagination par offset) avec cache"""
+    key = (
+        "offset", normalize_search(db, search, filters.get("fuzzy", False)),
+        tuple(sorted(filters.items())), skip, limit
+    )
+    sujets, _ = _cached(
+        db, key, search, filters, skip > 0,
+        lambda: (crud.get_sujets(db, skip=skip, limit=limit, search=search, **filters), None)
+    )
+    return sujets
@@ -0,0 +1,353 @@
+# app/suggest.py
+"""
+Index de préfixes pour l'autocomplétion de la recherche.
+
+Tableau trié de clés normalisées (minuscules, sans accents): les entrées qui
+commencent par un préfixe forment une plage contiguë, trouvée par deux bisect.
+Entrées:
+- titres des sujets actifs, pondérés par leurs vues et likes
+- mots-clés distincts du catalog, pondérés par la somme des sujets qui les portent
+
+Les préfixes courts couvrent de grandes plages (des milliers de titres pour "co"):
+leur top-k est précalculé à la construction puis maintenu à chaque écriture.
+Tenu à jour par catalog_events. Les écritures qui ne touchent que vue_count et
+like_count n'y passent pas: les poids sont relus périodiquement avec reweight(),
+dans un thread de fond (jamais pendant la requête /suggest).
+"""
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import catalog_events, models
+from app.database import SessionLocal
+from app.keyword_index import normalize_keyword, split_keywords
+
+# Poids d'un like par rapport à une vue
+LIKE_WEIGHT = 5
+# Au-delà de ce nombre d'entrées dans la plage, le top-k du préfixe est gardé en mémoire
+SCAN_LIMIT = 256
+# Nombre de suggestions gardées par préfixe (limite maximale d'une requête)
+TOP_K = 20
+
+# Intervalle entre deux relectures des vues/likes pour les poids (secondes)
+REWEIGHT_INTERVAL = float(os.getenv("SUGGEST_REWEIGHT_INTERVAL", "300"))
+
+TITLE = "titre"
+KEYWORD = "keyword"
+
+# Séparateur entre le texte normalisé et l'identifiant de l'entrée (trié avant tout caractère)
+_SEPARATOR = "\x00"
+_UPPER_BOUND = "\uffff"
+
+
+def _text(key: str) -> str:
+    """Texte normalisé d'une clé de l'index"""
+    return key.split(_SEPARATOR, 1)[0]
+
+
+def sujet_weight(vue_count: Optional[int], like_count: Optional[int]) -> int:
+    return 1 + (vue_count or 0) + LIKE_WEIGHT * (like_count or 0)
+
+
+class SuggestIndex:
+    """Titres et mots-clés du catalog, interrogeables par préfixe"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: List[str] = []
+        # clé d'un titre -> (titre d'origine, sujet_id)
+        self._titles: Dict[str, Tuple[str, int]] = {}
+        self._title_weights: Dict[str, int] = {}
+        self._keyword_weights: Counter = Counter()
+        # sujet_id -> (clé du titre, poids, mots-clés) pour retirer sa contribution
+        self._sujets: Dict[int, Tuple[str, int, Tuple[str, ...]]] = {}
+        # préfixe -> TOP_K clés de plus fort poids (préfixes à grande plage seulement)
+        self._top: Dict[str, List[str]] = {}
+        self.is_built = False
+        self.last_reweight = 0.0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def build(self, rows: Iterable[Tuple[int, Optional[str], Optional[str], Optional[int], Optional[int]]]) -> None:
+        """Reconstruit l'index à partir de (sujet_id, titre, keywords, vue_count, like_count)"""
+        with self._lock:
+            self._titles.clear()
+            self._title_weights.clear()
+            self._keyword_weights = Counter()
+            self._sujets.clear()
+            self._top = {}
+            for sujet_id, titre, keywords, vue_count, like_count in rows:
+                self._register(sujet_id, titre, keywords, sujet_weight(vue_count, like_count))
+            self._keys = sorted(
+                list(self._titles) + [self._keyword_key(term) for term in self._keyword_weights]
+            )
+            self._precompute_top()
+            self.is_built = True
+
+    def _precompute_top(self) -> None:
+        """
+        Top-k de chaque préfixe dont la plage dépasse SCAN_LIMIT. Ces préfixes sont
+        ceux communs aux clés i et i + SCAN_LIMIT du tableau trié; leurs top-k sont
+        remplis en une passe par poids décroissant.
+        """
+        texts = [_text(key) for key in self._keys]
+        top: Dict[str, List[str]] = {}
+        for i in range(len(texts) - SCAN_LIMIT):
+            common = os.path.commonprefix([texts[i], texts[i + SCAN_LIMIT]])
+            # Les préfixes d'un préfixe déjà retenu le sont aussi
+            for length in range(len(common), 0, -1):
+                if common[:length] in top:
+                    break
+                top[common[:length]] = []
+        for key in sorted(self._keys, key=self._weight, reverse=True):
+            text = _text(key)
+            for length in range(1, len(text) + 1):
+                bucket = top.get(text[:length])
+                if bucket is None:
+                    break
+                if len(bucket) < TOP_K:
+                    bucket.append(key)
+        self._top = top
+
+    def reweight(self, rows: Iterable[Tuple[int, Optional[int], Optional[int]]]) -> int:
+        """
+        Met à jour les poids à partir de (sujet_id, vue_count, like_count) sans
+        reconstruire l'index. Retourne le nombre de sujets dont le poids a changé.
+        """
+        changed = 0
+        with self._lock:
+            for sujet_id, vue_count, like_count in rows:
+                entry = self._sujets.get(sujet_id)
+                if entry is None:
+                    continue
+                title_key, previous, terms = entry
+                weight = sujet_weight(vue_count, like_count)
+                if weight == previous:
+                    continue
+                self._sujets[sujet_id] = (title_key, weight, terms)
+                keys = []
+                if title_key:
+                    self._title_weights[title_key] = weight
+                    keys.append(title_key)
+                for term in terms:
+                    self._keyword_weights[term] += weight - previous
+                    keys.append(self._keyword_key(term))
+                for key in keys:
+                    if weight > previous:
+                        self._weight_increased(key)
+                    else:
+                        self._weight_decreased(key)
+                changed += 1
+        return changed
+
+    # Abonnement aux changements du catalog (catalog_events)
+    def upsert_sujet(self, row: Dict) -> None:
+        if self.is_built:
+            with self._lock:
+                self._remove(row["id"])
+                self._add(
+                    row["id"], row.get("titre"), row.get("keywords"),
+                    sujet_weight(row.get("vue_count"), row.get("like_count"))
+                )
+
+    def remove_sujet(self, sujet_id: int) -> None:
+        if self.is_built:
+            with self._lock:
+                self._remove(sujet_id)
+
+    @staticmethod
+    def _keyword_key(term: str) -> str:
+        return f"{term}{_SEPARATOR}k"
+
+    def _register(self, sujet_id: int, titre: Optional[str], keywords: Optional[str], weight: int) -> List[str]:
+        """Enregistre les entrées d'un sujet; retourne les clés nouvellement créées"""
+        created = []
+        title_key = ""
+        normalized = normalize_keyword(titre)
+        if normalized:
+            title_key = f"{normalized}{_SEPARATOR}t{sujet_id}"
+            self._titles[title_key] = (titre.strip(), sujet_id)
+            self._title_weights[title_key] = weight
+            created.append(title_key)
+            self._weight_increased(title_key)
+        terms = tuple(split_keywords(keywords))
+        for term in terms:
+            if term not in self._keyword_weights:
+                created.append(self._keyword_key(term))
+            self._keyword_weights[term] += weight
+            self._weight_increased(self._keyword_key(term))
+        self._sujets[sujet_id] = (title_key, weight, terms)
+        return created
+
+    def _add(self, sujet_id: int, titre: Optional[str], keywords: Optional[str], weight: int) -> None:
+        for key in self._register(sujet_id, titre, keywords, weight):
+            insort(self._keys, key)
+
+    def _remove(self, sujet_id: int) -> None:
+        entry = self._sujets.pop(sujet_id, None)
+        if entry is None:
+            return
+        title_key, weight, terms = entry
+        removed = []
+        if title_key:
+            self._weight_decreased(title_key)
+            self._titles.pop(title_key, None)
+            self._title_weights.pop(title_key, None)
+            removed.append(title_key)
+        for term in terms:
+            self._weight_decreased(self._keyword_key(term))
+            self._keyword_weights[term] -= weight
+            if self._keyword_weights[term] <= 0:
+                del self._keyword_weights[term]
+                removed.append(self._keyword_key(term))
+        for key in removed:
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+
+    def _weight_increased(self, key: str) -> None:
+        """Replace `key` dans le top-k des préfixes maintenus (nouvelle entrée ou poids en hausse)"""
+        if not self._top:
+            return
+        text = _text(key)
+        weight = self._weight(key)
+        for length in range(1, len(text) + 1):
+            bucket = self._top.get(text[:length])
+            if bucket is None:
+                continue  # préfixe plus court invalidé, les plus longs peuvent exister
+            if key in bucket:
+                bucket.remove(key)
+            position = 0
+            while position < len(bucket) and self._weight(bucket[position]) >= weight:
+                position += 1
+            if position < TOP_K:
+                bucket.insert(position, key)
+                del bucket[TOP_K:]
+
+    def _weight_decreased(self, key: str) -> None:
+        """
+        Une entrée du top-k perd du poids: le suivant de la plage est inconnu, le top-k
+        du préfixe sera recalculé à la prochaine lecture
+        """
+        text = _text(key)
+        for length in range(1, len(text) + 1):
+            bucket = self._top.get(text[:length])
+            if bucket is not None and key in bucket:
+                del self._top[text[:length]]
+
+    # ======================
+    # LECTURE
+    # ======================
+
+    def _weight(self, key: str) -> int:
+        if key in self._title_weights:
+            return self._title_weights[key]
+        return self._keyword_weights.get(_text(key), 0)
+
+    def _entry(self, key: str) -> Tuple[str, str, Optional[int], int]:
+        """(type, libellé ou terme normalisé, sujet_id, poids)"""
+        if key in self._titles:
+            label, sujet_id = self._titles[key]
+            return TITLE, label, sujet_id, self._title_weights[key]
+        term = _text(key)
+        return KEYWORD, term, None, self._keyword_weights.get(term, 0)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, Optional[int], int]]:
+        """
+        Entrées qui commencent par `prefix` (sans tenir compte des accents ni de la casse),
+        les plus consultées d'abord: (type, libellé, sujet_id, poids).
+        Pour un mot-clé, le libellé est le terme normalisé (voir vocabulary.surface).
+        """
+        normalized = normalize_keyword(prefix)
+        if not normalized:
+            return []
+        # "reseau " doit continuer à correspondre à "reseau de neurones"
+        if prefix[-1:].isspace():
+            normalized += " "
+        limit = min(limit, TOP_K)
+        with self._lock:
+            keys = self._top.get(normalized)
+            if keys is None:
+                start = bisect_left(self._keys, normalized)
+                end = bisect_left(self._keys, normalized + _UPPER_BOUND, lo=start)
+                keys = heapq.nlargest(TOP_K, self._keys[start:end], key=self._weight)
+                if end - start > SCAN_LIMIT:
+                    self._top[normalized] = keys
+            return [self._entry(key) for key in keys[:limit]]
+
+
+# Instance globale de l'index d'autocomplétion
+suggest_index = SuggestIndex()
+catalog_events.register_listener(suggest_index)
+
+# Une seule relecture des poids en arrière-plan à la fois
+_reweight_lock = threading.Lock()
+_reweight_running = False
+
+
+# ======================
+# CYCLE DE VIE
+# ======================
+
+def ensure_suggest_index(db: Session) -> SuggestIndex:
+    """
+    Construit l'index au premier appel; ensuite il est mis à jour par les écritures
+    locales et l'outbox des autres workers. Toutes les REWEIGHT_INTERVAL secondes,
+    la relecture des poids part dans un thread: la requête sert les poids actuels.
+    """
+    catalog_events.sync_from_outbox(db)
+    if not suggest_index.is_built:
+        catalog_events.build_from_db(db, suggest_index, [
+            models.Sujet.id,
+            models.Sujet.titre,
+            models.Sujet.keywords,
+            models.Sujet.vue_count,
+            models.Sujet.like_count
+        ])
+        print(f"✅ Index d'autocomplétion construit: {len(suggest_index)} entrées")
+        suggest_index.last_reweight = time.monotonic()
+    elif time.monotonic() - suggest_index.last_reweight >= REWEIGHT_INTERVAL:
+        suggest_index.last_reweight = time.monotonic()
+        schedule_reweight()
+    return suggest_index
+
+
+def reweight_from_db(db: Session) -> int:
+    """Relit vue_count/like_count (hors catalog_events) et met à jour les poids"""
+    changed = suggest_index.reweight(db.query(
+        models.Sujet.id, models.Sujet.vue_count, models.Sujet.like_count
+    ).filter(models.Sujet.is_active == True).all())
+    if changed:
+        print(f"✅ Poids de l'autocomplétion mis à jour: {changed} sujets")
+    return changed
+
+
+def _reweight_in_background() -> None:
+    global _reweight_running
+    db = SessionLocal()
+    try:
+        reweight_from_db(db)
+    except Exception as e:
+        print(f"⚠️ Erreur relecture des poids de l'autocomplétion: {e}")
+    finally:
+        db.close()
+        with _reweight_lock:
+            _reweight_running = False
+
+
+def schedule_reweight() -> bool:
+    """Lance la relecture des poids dans un thread (une seule à la fois)"""
+    global _reweight_running
+    with _reweight_lock:
+        if _reweight_running:
+            return False
+        _reweight_running = True
+    threading.Thread(target=_reweight_in_background, name="suggest-reweight", daemon=True).start()
+    return True
@@ -0,0 +1,198 @@
+# app/sujet_analysis.py
+"""
+Analyses IA des sujets enregistrées dans Sujet.ai_analysis.
+
+GET /sujets/{id} appelait analyser_sujet (Gemini + Chroma) à chaque vue. L'analyse
+est maintenant calculée une fois et enregistrée avec:
+- l'empreinte des champs analysés (titre, domaine, niveau, faculté, problématique,
+  description, mots-clés): une modification du sujet la rend obsolète
+- la version du prompt et le modèle (llm_service.get_analysis_version())
+Elle n'est recalculée que si l'un des deux change.
+
+En mode asynchrone (SUJET_ANALYSIS_ASYNC, par défaut), la première vue répond tout de
+suite avec le statut "pending" et l'analyse est calculée après la réponse.
+
+Format de ai_analysis:
+    {"status": "ready" | "pending", "content_hash": ..., "version": ...,
+     "timestamp": ..., "result": {...}, "fallback": bool}
+
+L'analyse est écrite par un UPDATE direct qui laisse Sujet.updated_at inchangé:
+seules les modifications du contenu comptent comme mises à jour du sujet.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import llm_service
+from app.database import SessionLocal
+from app.models import Sujet
+
+ANALYSIS_ASYNC = os.getenv("SUJET_ANALYSIS_ASYNC", "true").lower() == "true"
+# Une analyse en attente depuis plus longtemps est considérée comme perdue (worker redémarré)
+PENDING_TIMEOUT = float(os.getenv("SUJET_ANALYSIS_PENDING_TIMEOUT", "180"))
+# Analyse de secours (LLM indisponible ou en erreur): nouvel essai après ce délai
+FALLBACK_RETRY_AFTER = float(os.getenv("SUJET_ANALYSIS_FALLBACK_RETRY", "600"))
+
+READY = "ready"
+PENDING = "pending"
+
+# Utilisateur des calculs en arrière-plan pour la file LLM (llm_gateway)
+BACKGROUND_USER = "sujet-analysis"
+
+ANALYZED_FIELDS = ("titre", "domaine", "niveau", "faculté", "problématique", "description", "keywords")
+
+
+def analysis_input(sujet: Sujet) -> Dict[str, Any]:
+    """Données transmises à analyser_sujet"""
+    return {
+        "titre": sujet.titre,
+        "domaine": sujet.domaine,
+        "niveau": sujet.niveau,
+        "faculté": sujet.faculté,
+        "problematique": sujet.problématique,
+        "description": sujet.description,
+        "keywords": sujet.keywords,
+    }
+
+
+def content_hash(sujet: Sujet) -> str:
+    """Empreinte des champs analysés"""
+    payload = json.dumps(
+        [" ".join(str(getattr(sujet, field) or "").split()) for field in ANALYZED_FIELDS],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _age(entry: Dict[str, Any]) -> float:
+    return time.time() - float(entry.get("timestamp", 0))
+
+
+def _entry(status: str, digest: str, version: str, result: Optional[Dict] = None, fallback: bool = False) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "content_hash": digest,
+        "version": version,
+        "timestamp": time.time(),
+        "result": result,
+        "fallback": fallback,
+    }
+
+
+def stored_analysis(sujet: Sujet) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    (analyse enregistrée utilisable, statut): (résultat, "ready") si elle correspond au
+    contenu et à la version courants, (None, "pending") si un calcul est en cours,
+    (None, None) s'il faut la (re)calculer.
+    """
+    entry = sujet.ai_analysis
+    if not isinstance(entry, dict) or entry.get("content_hash") != content_hash(sujet):
+        return None, None
+    if entry.get("status") == PENDING:
+        return (None, PENDING) if _age(entry) < PENDING_TIMEOUT else (None, None)
+    if entry.get("status") != READY or not isinstance(entry.get("result"), dict):
+        return None, None
+    if entry.get("version") == llm_service.get_analysis_version():
+        return entry["result"], READY
+    # Analyse de secours récente: on ne relance pas le LLM à chaque vue
+    if entry.get("fallback") and _age(entry) < FALLBACK_RETRY_AFTER:
+        return entry["result"], READY
+    return None, None
+
+
+def _save(db: Session, sujet: Sujet, entry: Dict[str, Any]) -> None:
+    # updated_at affecté à lui-même: l'onupdate de la colonne ne s'applique pas
+    db.execute(
+        update(Sujet.__table__)
+        .where(Sujet.__table__.c.id == sujet.id)
+        .values(ai_analysis=entry, updated_at=Sujet.__table__.c.updated_at)
+    )
+    set_committed_value(sujet, "ai_analysis", entry)
+    db.commit()
+
+
+def _store_result(db: Session, sujet: Sujet, digest: str, version: str, data: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    fallback = result == llm_service.get_fallback_analysis(data)
+    _save(db, sujet, _entry(READY, digest, version, result, fallback))
+    return result
+
+
+def compute_analysis(db: Session, sujet: Sujet) -> Dict[str, Any]:
+    """Analyse le sujet et l'enregistre; retourne le résultat"""
+    digest = content_hash(sujet)
+    version = llm_service.get_analysis_version()
+    data = analysis_input(sujet)
+    return _store_result(db, sujet, digest, version, data, llm_service.analyser_sujet(data))
+
+
+async def compute_analysis_async(db: Session, sujet: Sujet, user_key: Optional[str] = None) -> Dict[str, Any]:
+    """compute_analysis avec analyser_sujet_async (routes async, file LLM "analyze")"""
+    digest = content_hash(sujet)
+    version = llm_service.get_analysis_version()
+    data = analysis_input(sujet)
+    return _store_result(db, sujet, digest, version, data, await llm_service.analyser_sujet_async(data, user_key=user_key))
+
+
+async def compute_analysis_task(sujet_id: int) -> None:
+    """
+    Calcul en arrière-plan (après la réponse), avec sa propre session. Passe par la
+    file LLM comme les routes: si elle est pleine, l'analyse reste "pending" jusqu'à
+    PENDING_TIMEOUT puis est replanifiée à la vue suivante.
+    """
+    db = SessionLocal()
+    try:
+        sujet = db.query(Sujet).filter(Sujet.id == sujet_id).first()
+        if sujet is None:
+            return
+        await compute_analysis_async(db, sujet, user_key=BACKGROUND_USER)
+        print(f"🧠 Analyse IA enregistrée pour le sujet {sujet_id}")
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Erreur analyse IA en arrière-plan (sujet {sujet_id}): {e}")
+    finally:
+        db.close()
+
+
+def _schedule(db: Session, sujet: Sujet, background_tasks) -> Tuple[None, str]:
+    _save(db, sujet, _entry(PENDING, content_hash(sujet), llm_service.get_analysis_version()))
+    background_tasks.add_task(compute_analysis_task, sujet.id)
+    return None, PENDING
+
+
+def get_or_schedule_analysis(db: Session, sujet: Sujet, background_tasks=None) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Analyse d'un sujet pour l'affichage: (résultat, "ready") depuis ai_analysis si elle
+    est à jour; sinon, en mode asynchrone, (None, "pending") et calcul planifié dans
+    `background_tasks`; sinon calcul immédiat.
+    """
+    result, status = stored_analysis(sujet)
+    if status is not None:
+        return result, status
+
+    if ANALYSIS_ASYNC and background_tasks is not None:
+        return _schedule(db, sujet, background_tasks)
+
+    return compute_analysis(db, sujet), READY
+
+
+async def get_or_schedule_analysis_async(
+    db: Session,
+    sujet: Sujet,
+    background_tasks=None,
+    user_key: Optional[str] = None
+) -> Tuple[Optional[Dict[str, Any]], str]:
+    """get_or_schedule_analysis pour les routes async: le calcul immédiat attend ainvoke"""
+    result, status = stored_analysis(sujet)
+    if status is not None:
+        return result, status
+
+    if ANALYSIS_ASYNC and background_tasks is not None:
+        return _schedule(db, sujet, background_tasks)
+
+    return await compute_analysis_async(db, sujet, user_key=user_key), READY
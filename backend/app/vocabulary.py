@@ -0,0 +1,251 @@
+# app/vocabulary.py
+"""
+Vocabulaire des mots-clés du catalog avec correction orthographique.
+
+Dictionnaire à suppressions symétriques (SymSpell): chaque terme est indexé par
+toutes les variantes obtenues en supprimant jusqu'à MAX_EDIT_DISTANCE caractères
+de son préfixe. Une faute de frappe se corrige alors par quelques lookups de
+dictionnaire au lieu d'une comparaison avec chaque mot-clé.
+
+Les termes sont normalisés (minuscules, sans accents): "béton armé" et
+"beton arme" sont le même terme. La forme d'origine la plus courante est gardée
+pour les recherches SQL.
+
+Partagé par les recommandations (correction des intérêts), la recherche et
+l'autocomplétion.
+"""
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.keyword_index import normalize_keyword
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Les tokens plus courts ne sont pas corrigés (trop de voisins: "ia", "3d", ...)
+MIN_TOKEN_LENGTH = 3
+
+
+def max_distance_for(term: str) -> int:
+    """Distance tolérée selon la longueur: 1 faute jusqu'à 5 caractères, 2 au-delà"""
+    return 1 if len(term) <= 5 else MAX_EDIT_DISTANCE
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Distance de Damerau-Levenshtein restreinte (transpositions adjacentes).
+    Retourne max_distance + 1 dès que la distance dépasse max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                previous_previous is not None and i > 1 and j > 1
+                and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+
+def _deletes(key: str, max_distance: int) -> Set[str]:
+    """Variantes de `key` avec 0 à max_distance caractères supprimés"""
+    result = {key}
+    frontier = {key}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for word in frontier:
+            for i in range(len(word)):
+                variant = word[:i] + word[i + 1:]
+                if variant not in result:
+                    next_frontier.add(variant)
+        result |= next_frontier
+        frontier = next_frontier
+    return result
+
+
+class SymSpell:
+    """Dictionnaire de termes avec compteur et recherche tolérante aux fautes"""
+
+    def __init__(self, max_distance: int = MAX_EDIT_DISTANCE, prefix_length: int = PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.counts: Counter = Counter()
+        self._deletes: Dict[str, Set[str]] = defaultdict(set)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.counts
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, term: str, count: int = 1) -> None:
+        if term not in self.counts:
+            for variant in _deletes(term[:self.prefix_length], self.max_distance):
+                self._deletes[variant].add(term)
+        self.counts[term] += count
+
+    def remove(self, term: str, count: int = 1) -> None:
+        if term not in self.counts:
+            return
+        self.counts[term] -= count
+        if self.counts[term] > 0:
+            return
+        del self.counts[term]
+        for variant in _deletes(term[:self.prefix_length], self.max_distance):
+            terms = self._deletes.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._deletes[variant]
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """Termes à distance <= max_distance: (terme, distance, compteur), les plus proches d'abord"""
+        if max_distance is None:
+            max_distance = self.max_distance
+        max_distance = min(max_distance, self.max_distance)
+        if not word:
+            return []
+
+        candidates: Set[str] = set()
+        for variant in _deletes(word[:self.prefix_length], max_distance):
+            candidates |= self._deletes.get(variant, set())
+
+        results = []
+        for candidate in candidates:
+            distance = 0 if candidate == word else edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                results.append((candidate, distance, self.counts[candidate]))
+        results.sort(key=lambda r: (r[1], -r[2], r[0]))
+        return results
+
+
+class Vocabulary:
+    """Mots-clés distincts du catalog (et leurs tokens), tenu à jour par catalog_events"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.terms = SymSpell()
+        self.tokens = SymSpell()
+        self._surfaces: Dict[str, Counter] = defaultdict(Counter)
+        self._sujet_keywords: Dict[int, Tuple[Tuple[str, str], ...]] = {}
+        self.is_built = False
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def build(self, rows: Iterable[Tuple[int, Optional[str]]]) -> None:
+        """Reconstruit le vocabulaire à partir de couples (sujet_id, keywords)"""
+        with self._lock:
+            self.terms = SymSpell()
+            self.tokens = SymSpell()
+            self._surfaces.clear()
+            self._sujet_keywords.clear()
+            for sujet_id, keywords in rows:
+                self._add(sujet_id, keywords)
+            self.is_built = True
+
+    # Abonnement aux changements du catalog (catalog_events)
+    def upsert_sujet(self, row: Dict) -> None:
+        if self.is_built:
+            with self._lock:
+                self._remove(row["id"])
+                self._add(row["id"], row.get("keywords"))
+
+    def remove_sujet(self, sujet_id: int) -> None:
+        if self.is_built:
+            with self._lock:
+                self._remove(sujet_id)
+
+    @staticmethod
+    def _raw_keywords(keywords: Optional[str]) -> List[Tuple[str, str]]:
+        """(terme normalisé, forme d'origine) sans doublons"""
+        seen = {}
+        for raw in (keywords or "").replace(";", ",").split(","):
+            term = normalize_keyword(raw)
+            if term and term not in seen:
+                seen[term] = raw.strip()
+        return list(seen.items())
+
+    def _add(self, sujet_id: int, keywords: Optional[str]) -> None:
+        pairs = self._raw_keywords(keywords)
+        if not pairs:
+            return
+        self._sujet_keywords[sujet_id] = tuple(pairs)
+        for term, raw in pairs:
+            self.terms.add(term)
+            self._surfaces[term][raw] += 1
+            for token in term.split():
+                self.tokens.add(token)
+
+    def _remove(self, sujet_id: int) -> None:
+        for term, raw in self._sujet_keywords.pop(sujet_id, ()):
+            self.terms.remove(term)
+            surfaces = self._surfaces.get(term)
+            if surfaces is not None:
+                surfaces[raw] -= 1
+                if surfaces[raw] <= 0:
+                    del surfaces[raw]
+                if not surfaces:
+                    del self._surfaces[term]
+            for token in term.split():
+                self.tokens.remove(token)
+
+    # ======================
+    # LECTURE
+    # ======================
+
+    def lookup(self, text: str, limit: int = 5) -> List[Tuple[str, int, int]]:
+        """Mots-clés proches de `text` (terme normalisé, distance, nombre de sujets)"""
+        term = normalize_keyword(text)
+        with self._lock:
+            return self.terms.lookup(term, max_distance_for(term))[:limit]
+
+    def correct(self, text: str) -> Optional[str]:
+        """
+        Forme normalisée corrigée de `text`: le mot-clé le plus proche, sinon chaque
+        token corrigé séparément. None si rien n'est reconnu.
+        """
+        term = normalize_keyword(text)
+        if not term:
+            return None
+        with self._lock:
+            if term in self.terms:
+                return term
+            matches = self.terms.lookup(term, max_distance_for(term))
+            if matches:
+                return matches[0][0]
+
+            corrected = []
+            changed = False
+            for token in term.split():
+                if token in self.tokens or len(token) < MIN_TOKEN_LENGTH:
+                    corrected.append(token)
+                    continue
+                token_matches = self.tokens.lookup(token, max_distance_for(token))
+                if token_matches:
+                    corrected.append(token_matches[0][0])
+                    changed = True
+                else:
+                    corrected.append(token)
+            return " ".join(corrected) if changed else None
+
+    def surface(self, term: str) -> str:
+        """Forme d'origine la plus fréquente d'un terme normalisé (accents, majuscules)"""
+        with self._lock:
+            surfaces = self._surfaces.get(term)
+            return surfaces.most_common(1)[0][0] if surfaces else term
+
+
+# Instance globale du vocabulaire
+vocabulary = Vocabulary()
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Benchmarks de performance (hors tests): python -m benchmarks.<module> --help"""
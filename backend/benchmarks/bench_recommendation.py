@@ -0,0 +1,173 @@
+# benchmarks/bench_recommendation.py
+"""
+Micro-benchmarks du moteur de recommandation sur des catalogs synthétiques SQLite.
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_recommendation --sizes 1000 10000
+    python -m benchmarks.bench_recommendation --sizes 100000 --rounds 20 --output bench.json
+    python -m benchmarks.bench_recommendation --baseline bench.json --threshold 1.25
+
+Les bases générées sont gardées dans --workdir et réutilisées d'un lancement à l'autre.
+Avec --baseline, le code de sortie vaut 1 si un p95 régresse au-delà du seuil.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "memobot-bench")
+os.makedirs(DEFAULT_WORKDIR, exist_ok=True)
+# app.database lit DATABASE_URL à l'import; chaque taille utilise ensuite sa propre base
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(DEFAULT_WORKDIR, 'default.db')}")
+os.environ.setdefault("COLLABORATIVE_MODEL_DIR", os.path.join(DEFAULT_WORKDIR, "collaborative"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, llm_service
+from app.catalog_matrix import NUMPY_AVAILABLE, catalog_matrix
+from app.collaborative import collaborative_model
+from app.keyword_index import keyword_index
+from app.recommendation import recommendation_cache, recommendation_engine
+from app.vocabulary import vocabulary
+
+from benchmarks.harness import compare, measure, print_report, save_results
+from benchmarks.synthetic_catalog import create_catalog_db, generate_profiles
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def reset_engine_state(model_dir: str) -> None:
+    """Oublie les index en mémoire: ils seront reconstruits depuis la nouvelle base"""
+    keyword_index.is_built = False
+    vocabulary.is_built = False
+    if catalog_matrix is not None:
+        catalog_matrix.is_built = False
+    if collaborative_model is not None:
+        collaborative_model.is_built = False
+        collaborative_model.directory = model_dir
+        collaborative_model.last_check = 0.0
+    recommendation_cache.clear()
+
+
+def measure_build(name, structure, func, params, rounds: int = 3):
+    """Construction complète d'une structure en mémoire (invalidée avant chaque tour)"""
+    def invalidate():
+        structure.is_built = False
+    return measure(name, lambda i: func(), rounds=rounds, warmup=0, params=params, setup=invalidate)
+
+
+def bench_size(size: int, workdir: str, rounds: int) -> list:
+    path = os.path.join(workdir, f"catalog_{size}.db")
+    print(f"📦 Catalog synthétique: {size} sujets ({path})")
+    url = create_catalog_db(path, size)
+    engine = create_engine(url)
+    db = sessionmaker(bind=engine)()
+    params = {"size": size}
+    profiles = generate_profiles(200)
+    results = []
+
+    try:
+        reset_engine_state(os.path.join(workdir, f"collaborative_{size}"))
+
+        # Construction des structures en mémoire
+        results.append(measure_build("build.keyword_index", keyword_index, lambda: recommendation_engine.ensure_keyword_index(db), params))
+        results.append(measure_build("build.vocabulary", vocabulary, lambda: recommendation_engine.ensure_vocabulary(db), params))
+        if NUMPY_AVAILABLE:
+            results.append(measure_build("build.catalog_matrix", catalog_matrix, lambda: recommendation_engine.ensure_catalog_matrix(db), params))
+            # Calcul complet du modèle (sans relecture d'une version déjà sur disque)
+            results.append(measure_build(
+                "build.collaborative", collaborative_model,
+                lambda: collaborative_model.build(crud.get_feedback_interactions(db)), params
+            ))
+            recommendation_engine.ensure_collaborative_model(db)
+
+        def profile(i):
+            return profiles[i % len(profiles)]
+
+        def run_engine(method):
+            def run(i):
+                p = profile(i)
+                return method(
+                    db, recommendation_engine.correct_interests(db, p["interests"]),
+                    niveau=p["niveau"], faculté=p["faculté"], difficulté=p["difficulté"], limit=10
+                )
+            return run
+
+        def run_cached(i):
+            # Mêmes 5 profils en boucle: mesure le chemin du cache
+            p = profiles[i % 5]
+            return recommendation_engine.recommend_sujets(
+                db, p["interests"], niveau=p["niveau"], faculté=p["faculté"], difficulté=p["difficulté"], limit=10
+            )
+
+        results.append(measure("engine.recommend_sujets_indexed", run_engine(recommendation_engine.recommend_sujets_indexed), rounds, params=params))
+        if NUMPY_AVAILABLE:
+            results.append(measure("engine.recommend_sujets_vectorized", run_engine(recommendation_engine.recommend_sujets_vectorized), rounds, params=params))
+        results.append(measure("engine.recommend_sujets_cached", run_cached, rounds, params=params))
+
+        results.append(measure(
+            "engine.batch_64_profiles",
+            lambda i: list(recommendation_engine.iter_batch_recommendations(db, profiles[:64], limit=3)),
+            max(rounds // 10, 3), warmup=1, params=params
+        ))
+        results.append(measure("vocabulary.correct", lambda i: [vocabulary.correct(x) for x in profile(i)["interests"]], rounds, params=params))
+        results.append(measure("keyword_index.score", lambda i: keyword_index.score(profile(i)["interests"]), rounds, params=params))
+
+        if NUMPY_AVAILABLE:
+            ids = [int(x) for x in collaborative_model.ids[:200]] if len(collaborative_model) else [1]
+            results.append(measure("collaborative.similar", lambda i: collaborative_model.similar(ids[i % len(ids)], 10), rounds, params=params))
+
+        results.append(measure("crud.get_popular_keywords", lambda i: crud.get_popular_keywords(db, limit=20), rounds, params=params))
+
+        sujets = [
+            {"id": s.id, "titre": s.titre, "keywords": s.keywords, "domaine": s.domaine, "niveau": s.niveau}
+            for s in crud.search_sujets_by_keywords(db, profiles[0]["interests"], limit=50)
+        ]
+        results.append(measure(
+            "llm_service.fallback_recommendation",
+            lambda i: llm_service.fallback_recommendation(profile(i)["interests"], sujets),
+            rounds, params=params
+        ))
+    finally:
+        db.close()
+        engine.dispose()
+
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks du moteur de recommandation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Tailles de catalog")
+    parser.add_argument("--rounds", type=int, default=50, help="Tours mesurés par benchmark")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Dossier des bases synthétiques")
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", help="Résultats de référence (JSON) à comparer")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Facteur de régression toléré sur le p95")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for size in args.sizes:
+        results.extend(bench_size(size, args.workdir, args.rounds))
+
+    print()
+    print_report(results)
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"\n💾 Résultats enregistrés dans {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, threshold=args.threshold)
+        if regressions:
+            print("\n❌ Régressions détectées:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ Aucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+# benchmarks/bench_search.py
+"""
+Benchmarks de la recherche (crud.get_sujets, crud.search_sujets_by_keywords), pour
+chaque moteur disponible (voir app/search.py): latence, lignes lues et pertinence.
+
+- catalog synthétique tiré de data/Sujet_EtudiantsB.csv, dans SQLite (une base par
+  taille) ou dans une base PostgreSQL dédiée (--database-url, migrée avec
+  `alembic upgrade head` pour les index plein texte et trigrammes)
+- journal de requêtes rejoué (synthétique, ou --query-log: une requête par ligne,
+  ou JSON lignes {"q": ..., "intended": ...})
+- latence p50/p95/p99 par moteur
+- plan d'exécution capturé sur un échantillon de requêtes: EXPLAIN ANALYZE sous
+  PostgreSQL (lignes lues, blocs), EXPLAIN QUERY PLAN sous SQLite (parcours complets)
+- pertinence nDCG@k / MRR@k / rappel@k contre des jugements (--qrels, sinon dérivés
+  du contenu du catalog, voir benchmarks/relevance.py)
+
+Usage (depuis backend/):
+    python -m benchmarks.bench_search --sizes 1000 10000
+    python -m benchmarks.bench_search --database-url postgresql://bench@localhost/memobot_bench --sizes 100000
+    python -m benchmarks.bench_search --sizes 10000 --output search.json
+    python -m benchmarks.bench_search --sizes 10000 --baseline search.json --threshold 1.25
+
+Avec --baseline, le code de sortie vaut 1 si un p95 régresse au-delà du seuil ou si
+un nDCG baisse de plus de --max-ndcg-drop.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), "memobot-bench")
+os.makedirs(DEFAULT_WORKDIR, exist_ok=True)
+# app.database lit DATABASE_URL à l'import; chaque taille utilise ensuite sa propre base
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(DEFAULT_WORKDIR, 'default.db')}")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app import search as fulltext
+from app.bm25 import bm25_index
+from app.models import Sujet
+
+from benchmarks.harness import compare, measure, percentile, print_report, result_key, save_results
+from benchmarks.relevance import build_synthetic_qrels, evaluate, load_qrels, save_qrels
+from benchmarks.synthetic_catalog import create_catalog, create_catalog_db, generate_query_log
+
+DEFAULT_SIZES = [1000, 10000]
+# Recherche approchée (pg_trgm), mesurée comme un moteur à part
+TRIGRAM = "trigram"
+OPERATIONS = ("get_sujets", "search_sujets_by_keywords")
+
+
+# ======================
+# MOTEURS
+# ======================
+
+def available_backends(db, wanted=None):
+    """Moteurs utilisables sur cette base (un moteur forcé mais indisponible retombe sur 'auto')"""
+    names = []
+    for name in fulltext.BACKENDS:
+        use_backend(name)
+        if fulltext.get_backend(db).name == name:
+            names.append(name)
+    if fulltext.is_trigram_enabled(db):
+        names.append(TRIGRAM)
+    use_backend("auto")
+    return [name for name in names if not wanted or name in wanted]
+
+
+def use_backend(name: str) -> None:
+    fulltext.SEARCH_BACKEND = "auto" if name == TRIGRAM else name
+
+
+def run_operation(db, operation: str, backend: str, query: str, limit: int):
+    if operation == "get_sujets":
+        return crud.get_sujets(db, skip=0, limit=limit, search=query, fuzzy=backend == TRIGRAM)
+    return crud.search_sujets_by_keywords(db, [query], limit=limit)
+
+
+# ======================
+# PLANS D'EXÉCUTION
+# ======================
+
+class StatementRecorder:
+    """Requêtes SELECT envoyées à la base pendant le bloc (texte SQL et paramètres DBAPI)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def explain(engine, statement: str, parameters) -> dict:
+    """
+    Plan d'une requête capturée. PostgreSQL: lignes lues par les nœuds de parcours
+    (y compris celles écartées par le filtre), blocs lus, temps d'exécution.
+    SQLite: nombre de parcours complets de table (SCAN) dans EXPLAIN QUERY PLAN.
+    """
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            root = plan[0]["Plan"]
+            scanned = 0
+            for node in _walk(root):
+                if "Scan" in node.get("Node Type", ""):
+                    read = (
+                        node.get("Actual Rows", 0)
+                        + node.get("Rows Removed by Filter", 0)
+                        + node.get("Rows Removed by Index Recheck", 0)
+                    )
+                    scanned += read * node.get("Actual Loops", 1)
+            return {
+                "rows_scanned": scanned,
+                "blocks": root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+                "execution_ms": plan[0].get("Execution Time"),
+                "full_scans": sum(1 for node in _walk(root) if node.get("Node Type") == "Seq Scan"),
+            }
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        details = [row[-1] for row in rows]
+        return {
+            "rows_scanned": None,
+            "blocks": None,
+            "execution_ms": None,
+            "full_scans": sum(1 for detail in details if detail.startswith("SCAN") and "VIRTUAL TABLE" not in detail),
+        }
+
+
+def explain_operation(engine, db, operation: str, backend: str, queries, limit: int) -> dict:
+    """Plans agrégés des requêtes SQL d'une opération sur un échantillon de recherches"""
+    plans = []
+    for query in queries:
+        with StatementRecorder(engine) as recorder:
+            run_operation(db, operation, backend, query, limit)
+        for statement, parameters in recorder.statements:
+            try:
+                plans.append(explain(engine, statement, parameters))
+            except Exception as e:
+                print(f"⚠️ EXPLAIN impossible ({operation}, {backend}): {e}")
+    if not plans:
+        return {}
+    summary = {
+        "explained_statements": len(plans),
+        "full_scan_ratio": round(sum(1 for p in plans if p["full_scans"]) / len(plans), 3),
+    }
+    scanned = sorted(p["rows_scanned"] for p in plans if p["rows_scanned"] is not None)
+    if scanned:
+        summary["rows_scanned_mean"] = round(statistics.fmean(scanned), 1)
+        summary["rows_scanned_p95"] = round(percentile(scanned, 95), 1)
+        summary["blocks_mean"] = round(statistics.fmean(p["blocks"] for p in plans), 1)
+    return summary
+
+
+# ======================
+# BENCHMARK
+# ======================
+
+def load_query_log(path: str):
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                entries.append({"q": entry["q"], "intended": entry.get("intended", entry["q"])})
+            else:
+                entries.append({"q": line, "intended": line})
+    return entries
+
+
+def bench_catalog(url: str, size: int, args, query_log) -> list:
+    engine = create_engine(url)
+    db = sessionmaker(bind=engine)()
+    results = []
+    queries = [entry["q"] for entry in query_log]
+    distinct = list(dict.fromkeys(queries))
+    judged = distinct[:args.judged_queries]
+
+    try:
+        if args.qrels:
+            qrels = load_qrels(args.qrels)
+        else:
+            rows = db.query(Sujet.id, Sujet.titre, Sujet.keywords).filter(Sujet.is_active == True).all()
+            corrections = {entry["q"]: entry["intended"] for entry in query_log}
+            qrels = build_synthetic_qrels(rows, judged, corrections)
+            if args.save_qrels:
+                save_qrels(qrels, args.save_qrels)
+
+        bm25_index.is_built = False
+        backends = available_backends(db, args.backends)
+        print(f"🔎 Moteurs mesurés: {', '.join(backends)}")
+
+        for backend in backends:
+            use_backend(backend)
+            params = {"size": size, "backend": backend}
+            for operation in OPERATIONS:
+                if operation == "search_sujets_by_keywords" and backend == TRIGRAM:
+                    continue  # pas de mode approché pour cette fonction
+                results.append(measure(
+                    f"search.{operation}",
+                    lambda i, op=operation: run_operation(db, op, backend, queries[i % len(queries)], args.limit),
+                    args.rounds, params=params
+                ))
+
+                runs = {
+                    query: [sujet.id for sujet in run_operation(db, operation, backend, query, args.k)]
+                    for query in judged
+                }
+                quality = {"name": f"quality.{operation}", "params": params}
+                quality.update(evaluate(runs, {q: qrels.get(q, {}) for q in judged}, k=args.k))
+                quality.update(explain_operation(engine, db, operation, backend, distinct[:args.explain], args.limit))
+                results.append(quality)
+    finally:
+        use_backend("auto")
+        db.close()
+        engine.dispose()
+    return results
+
+
+def print_quality_report(results: list, k: int) -> None:
+    quality = [r for r in results if r["name"].startswith("quality.")]
+    if not quality:
+        return
+    header = (
+        f"{'pertinence / plan':<64} {'nDCG@' + str(k):>8} {'MRR@' + str(k):>8} {'R@' + str(k):>8} "
+        f"{'lignes lues':>12} {'p95 lues':>10} {'scans':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in quality:
+        rows_mean = r.get("rows_scanned_mean")
+        rows_p95 = r.get("rows_scanned_p95")
+        print(
+            f"{result_key(r):<64} {r.get(f'ndcg@{k}', 0):>8.3f} {r.get(f'mrr@{k}', 0):>8.3f} "
+            f"{r.get(f'recall@{k}', 0):>8.3f} "
+            f"{'-' if rows_mean is None else f'{rows_mean:.0f}':>12} "
+            f"{'-' if rows_p95 is None else f'{rows_p95:.0f}':>10} "
+            f"{r.get('full_scan_ratio', 0):>7.2f}"
+        )
+
+
+def compare_quality(results: list, baseline_path: str, metric: str, max_drop: float) -> list:
+    """Baisses de pertinence (écart absolu) par rapport à la référence"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result_key(r): r for r in json.load(f)}
+    regressions = []
+    for r in results:
+        reference = baseline.get(result_key(r))
+        if not reference or metric not in reference or metric not in r:
+            continue
+        if reference[metric] - r[metric] > max_drop:
+            regressions.append(f"{result_key(r)}: {metric} {reference[metric]:.3f} -> {r[metric]:.3f}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de latence et de pertinence de la recherche")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Tailles de catalog")
+    parser.add_argument("--database-url", help="Base PostgreSQL dédiée (chargée si vide) au lieu de SQLite")
+    parser.add_argument("--backends", nargs="+", help=f"Moteurs à mesurer (défaut: tous ceux disponibles, plus '{TRIGRAM}')")
+    parser.add_argument("--rounds", type=int, default=100, help="Requêtes rejouées par benchmark")
+    parser.add_argument("--limit", type=int, default=20, help="Taille de page des requêtes rejouées")
+    parser.add_argument("--queries", type=int, default=500, help="Longueur du journal de requêtes synthétique")
+    parser.add_argument("--query-log", help="Journal de requêtes à rejouer")
+    parser.add_argument("--qrels", help="Jugements de pertinence (JSON, voir benchmarks/relevance.py)")
+    parser.add_argument("--save-qrels", help="Enregistre les jugements synthétiques générés")
+    parser.add_argument("--judged-queries", type=int, default=200, help="Requêtes distinctes évaluées")
+    parser.add_argument("--k", type=int, default=10, help="Profondeur des mesures de pertinence")
+    parser.add_argument("--explain", type=int, default=20, help="Requêtes distinctes dont le plan est capturé")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Dossier des bases synthétiques")
+    parser.add_argument("--output", help="Fichier JSON des résultats")
+    parser.add_argument("--baseline", help="Résultats de référence (JSON) à comparer")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Facteur de régression toléré sur le p95")
+    parser.add_argument("--max-ndcg-drop", type=float, default=0.02, help="Baisse de nDCG tolérée (absolue)")
+    args = parser.parse_args(argv)
+
+    query_log = load_query_log(args.query_log) if args.query_log else generate_query_log(args.queries)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for size in args.sizes:
+        if args.database_url:
+            print(f"📦 Catalog synthétique: {size} sujets ({args.database_url.split('@')[-1]})")
+            url = create_catalog(args.database_url, size)
+        else:
+            path = os.path.join(args.workdir, f"catalog_{size}.db")
+            print(f"📦 Catalog synthétique: {size} sujets ({path})")
+            url = create_catalog_db(path, size)
+        results.extend(bench_catalog(url, size, args, query_log))
+
+    print()
+    print_report([r for r in results if "p95_ms" in r])
+    print()
+    print_quality_report(results, args.k)
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"\n💾 Résultats enregistrés dans {args.output}")
+
+    if args.baseline:
+        regressions = compare([r for r in results if "p95_ms" in r], args.baseline, threshold=args.threshold)
+        regressions += compare_quality(results, args.baseline, f"ndcg@{args.k}", args.max_ndcg_drop)
+        if regressions:
+            print("\n❌ Régressions détectées:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ Aucune régression par rapport à la référence")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# benchmarks/harness.py
+"""
+Mesure de latence et de mémoire pour les benchmarks (à la pytest-benchmark).
+
+- measure(): exécute une fonction N fois après quelques tours de chauffe,
+  retourne les percentiles de latence (ms) et le pic mémoire Python (tracemalloc)
+- print_report(): tableau lisible
+- save_results() / compare(): comparaison avec une référence JSON pour détecter
+  les régressions
+"""
+import gc
+import json
+import math
+import resource
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentile par interpolation linéaire (q entre 0 et 100)"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def max_rss_mb() -> float:
+    """Mémoire résidente maximale du processus (Mo)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(
+    name: str,
+    func: Callable[[int], Any],
+    rounds: int = 50,
+    warmup: int = 3,
+    params: Optional[Dict[str, Any]] = None,
+    setup: Optional[Callable[[], Any]] = None
+) -> Dict[str, Any]:
+    """
+    Mesure `func(i)` (i = numéro du tour, pour varier les entrées).
+    `setup` est appelé avant chaque tour, hors chronométrage (ex: invalider un index
+    pour mesurer sa construction).
+    Le pic mémoire est mesuré sur un tour séparé: tracemalloc ralentit l'exécution.
+    """
+    for i in range(warmup):
+        if setup:
+            setup()
+        func(i)
+
+    gc.collect()
+    if setup:
+        setup()
+    tracemalloc.start()
+    func(warmup)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(rounds):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func(warmup + 1 + i)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    timings.sort()
+    return {
+        "name": name,
+        "params": params or {},
+        "rounds": rounds,
+        "min_ms": round(timings[0], 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "p50_ms": round(percentile(timings, 50), 4),
+        "p95_ms": round(percentile(timings, 95), 4),
+        "p99_ms": round(percentile(timings, 99), 4),
+        "max_ms": round(timings[-1], 4),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "rss_mb": round(max_rss_mb(), 1),
+    }
+
+
+def result_key(result: Dict[str, Any]) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]"
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    header = f"{'benchmark':<64} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10} {'alloc KB':>10} {'RSS MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{result_key(r):<64} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} "
+            f"{r['max_ms']:>10.3f} {r['peak_alloc_kb']:>10.1f} {r['rss_mb']:>8.1f}"
+        )
+
+
+def save_results(results: List[Dict[str, Any]], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float = 1.25,
+            metric: str = "p95_ms") -> List[str]:
+    """
+    Benchmarks dont `metric` dépasse la référence d'un facteur > threshold.
+    Retourne la liste des régressions (vide si tout va bien).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {result_key(r): r for r in json.load(f)}
+
+    regressions = []
+    for r in results:
+        reference = baseline.get(result_key(r))
+        if not reference or not reference.get(metric):
+            continue
+        ratio = r[metric] / reference[metric]
+        if ratio > threshold:
+            regressions.append(
+                f"{result_key(r)}: {metric} {reference[metric]:.3f} -> {r[metric]:.3f} ms (x{ratio:.2f})"
+            )
+    return regressions
@@ -0,0 +1,130 @@
+# benchmarks/relevance.py
+"""
+Mesures de pertinence des recherches: nDCG@k, MRR@k et rappel@k contre des
+jugements (qrels) gradués.
+
+Format des jugements (JSON):
+    {"queries": [{"query": "génie civil", "relevant": {"12": 3, "40": 1}}]}
+Les notes vont de 1 (lié) à 3 (exactement le sujet cherché); un sujet absent vaut 0.
+
+build_synthetic_qrels() produit des jugements pour le catalog synthétique, à partir
+du contenu des sujets (et non d'un moteur de recherche):
+- 2 si la requête est un mot-clé du sujet, +1 si elle apparaît aussi dans le titre
+- 1 si tous les mots de la requête apparaissent dans le titre ou les mots-clés
+Les accents et la casse sont ignorés, pas les fautes de frappe: une requête mal
+orthographiée garde les jugements de sa forme correcte.
+"""
+import json
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.keyword_index import normalize_keyword, split_keywords
+
+
+# ======================
+# MÉTRIQUES
+# ======================
+
+def dcg(grades: Sequence[float]) -> float:
+    return sum((2 ** grade - 1) / math.log2(rank + 2) for rank, grade in enumerate(grades))
+
+
+def ndcg_at_k(ranked_ids: Sequence[int], relevant: Dict[int, int], k: int = 10) -> float:
+    ideal = dcg(sorted(relevant.values(), reverse=True)[:k])
+    if not ideal:
+        return 0.0
+    return dcg([relevant.get(sujet_id, 0) for sujet_id in ranked_ids[:k]]) / ideal
+
+
+def reciprocal_rank(ranked_ids: Sequence[int], relevant: Dict[int, int], k: int = 10) -> float:
+    for rank, sujet_id in enumerate(ranked_ids[:k], start=1):
+        if relevant.get(sujet_id, 0) > 0:
+            return 1.0 / rank
+    return 0.0
+
+
+def recall_at_k(ranked_ids: Sequence[int], relevant: Dict[int, int], k: int = 10) -> float:
+    judged = {sujet_id for sujet_id, grade in relevant.items() if grade > 0}
+    if not judged:
+        return 0.0
+    # Rappel borné par k: avec 500 sujets pertinents, 10 trouvés sur 10 est parfait
+    return len(judged.intersection(ranked_ids[:k])) / min(len(judged), k)
+
+
+def evaluate(runs: Dict[str, List[int]], qrels: Dict[str, Dict[int, int]], k: int = 10) -> Dict[str, float]:
+    """Moyennes des métriques sur les requêtes jugées: {query: ids classés} -> métriques"""
+    queries = [query for query in qrels if qrels[query]]
+    if not queries:
+        return {"queries": 0, f"ndcg@{k}": 0.0, f"mrr@{k}": 0.0, f"recall@{k}": 0.0}
+    totals = defaultdict(float)
+    for query in queries:
+        ranked = runs.get(query, [])
+        totals["ndcg"] += ndcg_at_k(ranked, qrels[query], k)
+        totals["mrr"] += reciprocal_rank(ranked, qrels[query], k)
+        totals["recall"] += recall_at_k(ranked, qrels[query], k)
+    return {
+        "queries": len(queries),
+        f"ndcg@{k}": round(totals["ndcg"] / len(queries), 4),
+        f"mrr@{k}": round(totals["mrr"] / len(queries), 4),
+        f"recall@{k}": round(totals["recall"] / len(queries), 4),
+    }
+
+
+# ======================
+# JUGEMENTS
+# ======================
+
+def load_qrels(path: str) -> Dict[str, Dict[int, int]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        entry["query"]: {int(sujet_id): int(grade) for sujet_id, grade in entry.get("relevant", {}).items()}
+        for entry in data.get("queries", [])
+    }
+
+
+def save_qrels(qrels: Dict[str, Dict[int, int]], path: str) -> None:
+    data = {"queries": [
+        {"query": query, "relevant": {str(sujet_id): grade for sujet_id, grade in relevant.items()}}
+        for query, relevant in qrels.items()
+    ]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+
+
+def build_synthetic_qrels(
+    rows: Iterable,
+    queries: Iterable[str],
+    corrections: Optional[Dict[str, str]] = None
+) -> Dict[str, Dict[int, int]]:
+    """
+    Jugements d'après le contenu des sujets (id, titre, keywords).
+    corrections: requête mal orthographiée -> forme correcte dont elle prend les jugements.
+    """
+    corrections = corrections or {}
+    titles: Dict[int, str] = {}
+    by_term: Dict[str, set] = defaultdict(set)
+    by_word: Dict[str, set] = defaultdict(set)
+    for sujet_id, titre, keywords in rows:
+        title = normalize_keyword(titre)
+        titles[sujet_id] = f" {title} "
+        for word in title.split():
+            by_word[word].add(sujet_id)
+        for term in split_keywords(keywords):
+            by_term[term].add(sujet_id)
+            for word in term.split():
+                by_word[word].add(sujet_id)
+
+    qrels: Dict[str, Dict[int, int]] = {}
+    for query in queries:
+        text = normalize_keyword(corrections.get(query, query))
+        if not text or query in qrels:
+            continue
+        words = text.split()
+        matching = set.intersection(*(by_word.get(word, set()) for word in words))
+        judged = {sujet_id: 1 for sujet_id in matching}
+        for sujet_id in by_term.get(text, ()):
+            judged[sujet_id] = 3 if f" {text} " in titles[sujet_id] else 2
+        qrels[query] = judged
+    return qrels
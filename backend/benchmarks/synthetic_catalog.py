@@ -0,0 +1,246 @@
+# benchmarks/synthetic_catalog.py
+"""
+Génération de catalogs synthétiques pour les benchmarks.
+
+Les distributions (mots-clés par faculté, nombre de mots-clés par sujet, niveaux,
+titres, problématiques) sont tirées de data/Sujet_EtudiantsB.csv, puis
+échantillonnées pour produire 1k / 10k / 100k sujets réalistes dans une base SQLite.
+"""
+import csv
+import os
+import random
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, func, select
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "Sujet_EtudiantsB.csv")
+DIFFICULTIES = ["facile", "moyenne", "difficile"]
+INSERT_BATCH_SIZE = 5000
+
+
+class CatalogDistribution:
+    """Distributions observées dans le CSV des sujets étudiants"""
+
+    def __init__(self, path: str = CSV_PATH):
+        self.keywords_by_faculty: Dict[str, Counter] = defaultdict(Counter)
+        self.keyword_counts: Counter = Counter()
+        self.keywords_per_sujet: List[int] = []
+        self.faculties: Counter = Counter()
+        self.levels: Counter = Counter()
+        self.titles: List[str] = []
+        self.problems: List[str] = []
+        self.descriptions: List[str] = []
+
+        with open(path, mode="r", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                faculty = " ".join((row.get("student_faculty") or "").split()).title()
+                keywords = [" ".join(k.split()) for k in (row.get("thesis_keywords") or "").split(",")]
+                keywords = [k for k in keywords if k]
+                if not faculty or not keywords:
+                    continue
+                self.faculties[faculty] += 1
+                self.levels[(row.get("student_level") or "L3").strip()] += 1
+                self.keywords_per_sujet.append(len(keywords))
+                for keyword in keywords:
+                    self.keywords_by_faculty[faculty][keyword] += 1
+                    self.keyword_counts[keyword] += 1
+                self.titles.append(" ".join((row.get("thesis_title") or "").split()))
+                self.problems.append((row.get("Problématique") or "").strip('" '))
+                self.descriptions.append((row.get("description_sujet") or "").strip())
+
+        self._faculty_names = list(self.faculties)
+        self._faculty_weights = list(self.faculties.values())
+        self._level_names = list(self.levels)
+        self._level_weights = list(self.levels.values())
+        self._pools = {
+            faculty: (list(counter), list(counter.values()))
+            for faculty, counter in self.keywords_by_faculty.items()
+        }
+        self._all_keywords = (list(self.keyword_counts), list(self.keyword_counts.values()))
+
+    def faculty(self, rng: random.Random) -> str:
+        return rng.choices(self._faculty_names, self._faculty_weights)[0]
+
+    def level(self, rng: random.Random) -> str:
+        return rng.choices(self._level_names, self._level_weights)[0]
+
+    def keywords(self, rng: random.Random, faculty: str, count: Optional[int] = None) -> List[str]:
+        """Mots-clés tirés selon leur fréquence dans la faculté (10% hors faculté)"""
+        if count is None:
+            count = rng.choice(self.keywords_per_sujet)
+        chosen: List[str] = []
+        for _ in range(count * 3):
+            names, weights = self._pools[faculty] if rng.random() > 0.1 else self._all_keywords
+            keyword = rng.choices(names, weights)[0]
+            if keyword not in chosen:
+                chosen.append(keyword)
+            if len(chosen) == count:
+                break
+        return chosen
+
+
+def add_typo(text: str, rng: random.Random) -> str:
+    """Faute de frappe réaliste: accents retirés, lettre supprimée ou doublée"""
+    choice = rng.random()
+    if choice < 0.4:
+        decomposed = unicodedata.normalize("NFKD", text)
+        return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    if len(text) < 5:
+        return text
+    position = rng.randrange(1, len(text) - 1)
+    if choice < 0.7:
+        return text[:position] + text[position + 1:]
+    return text[:position] + text[position] + text[position:]
+
+
+def generate_sujets(size: int, seed: int = 42, distribution: Optional[CatalogDistribution] = None) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    distribution = distribution or CatalogDistribution()
+    sujets = []
+    for i in range(size):
+        faculty = distribution.faculty(rng)
+        keywords = distribution.keywords(rng, faculty)
+        source = rng.randrange(len(distribution.titles))
+        sujets.append({
+            "titre": f"{distribution.titles[source][:450]} ({i})",
+            "keywords": ", ".join(keywords),
+            "domaine": faculty,
+            "faculté": faculty,
+            "niveau": distribution.level(rng),
+            "problématique": distribution.problems[source] or "Problématique",
+            "description": distribution.descriptions[source] or "Description",
+            "difficulté": rng.choice(DIFFICULTIES),
+            "vue_count": int(rng.paretovariate(1.5) * 10),
+            "like_count": int(rng.paretovariate(2.0)),
+            "is_active": True,
+            "is_generated": False,
+        })
+    return sujets
+
+
+def generate_profiles(count: int, seed: int = 7, typo_rate: float = 0.2,
+                      distribution: Optional[CatalogDistribution] = None) -> List[Dict[str, Any]]:
+    """Profils étudiants pour les requêtes: 1 à 3 intérêts, avec des fautes de frappe"""
+    rng = random.Random(seed)
+    distribution = distribution or CatalogDistribution()
+    profiles = []
+    for _ in range(count):
+        faculty = distribution.faculty(rng)
+        interests = distribution.keywords(rng, faculty, count=rng.randint(1, 3))
+        interests = [add_typo(i, rng) if rng.random() < typo_rate else i for i in interests]
+        profiles.append({
+            "interests": interests,
+            "niveau": distribution.level(rng) if rng.random() < 0.7 else None,
+            "faculté": faculty if rng.random() < 0.7 else None,
+            "domaine": None,
+            "difficulté": rng.choice(DIFFICULTIES) if rng.random() < 0.3 else None,
+        })
+    return profiles
+
+
+def generate_query_log(count: int, seed: int = 11, typo_rate: float = 0.1,
+                       distribution: Optional[CatalogDistribution] = None) -> List[Dict[str, str]]:
+    """
+    Journal de recherches [{"q": saisie, "intended": forme correcte}]: mots-clés tirés
+    selon leur fréquence (les requêtes populaires reviennent souvent), quelques paires
+    de mots-clés et fragments de titres, avec fautes de frappe.
+    """
+    rng = random.Random(seed)
+    distribution = distribution or CatalogDistribution()
+    names, weights = distribution._all_keywords
+    queries = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.7:
+            query = rng.choices(names, weights)[0]
+        elif choice < 0.85:
+            query = " ".join(rng.choices(names, weights, k=2))
+        else:
+            words = rng.choice(distribution.titles).split()
+            start = rng.randrange(max(len(words) - 3, 1))
+            query = " ".join(words[start:start + 3])
+        typed = add_typo(query, rng) if rng.random() < typo_rate else query
+        queries.append({"q": typed, "intended": query})
+    return queries
+
+
+def create_catalog_db(path: str, size: int, seed: int = 42, feedbacks_per_user: int = 5) -> str:
+    """
+    Crée (si absente) une base SQLite avec `size` sujets, size/10 étudiants avec
+    préférences et feedbacks. Retourne l'URL SQLAlchemy.
+    """
+    url = f"sqlite:///{path}"
+    if os.path.exists(path):
+        return url
+    return create_catalog(url, size, seed=seed, feedbacks_per_user=feedbacks_per_user)
+
+
+def create_catalog(url: str, size: int, seed: int = 42, feedbacks_per_user: int = 5) -> str:
+    """
+    Charge le catalog synthétique dans la base `url` (SQLite ou PostgreSQL) si sa
+    table sujets est vide. Les tables manquantes sont créées; sous PostgreSQL, les
+    colonnes et index de recherche viennent des migrations (alembic upgrade head).
+    """
+    from app.database import Base
+    from app.models import Feedback, Sujet, User, UserPreference
+
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        existing = connection.execute(select(func.count()).select_from(Sujet.__table__)).scalar()
+    if existing:
+        if existing != size:
+            print(f"⚠️ {url}: {existing} sujets déjà présents (au lieu de {size}), base conservée")
+        engine.dispose()
+        return url
+
+    distribution = CatalogDistribution()
+    rng = random.Random(seed)
+
+    sujets = generate_sujets(size, seed=seed, distribution=distribution)
+    n_users = max(size // 10, 10)
+    by_faculty: Dict[str, List[int]] = defaultdict(list)
+    for sujet_id, sujet in enumerate(sujets, start=1):
+        by_faculty[sujet["faculté"]].append(sujet_id)
+
+    users, preferences, feedbacks = [], [], []
+    for user_id in range(1, n_users + 1):
+        faculty = distribution.faculty(rng)
+        users.append({
+            "id": user_id,
+            "email": f"etudiant{user_id}@bench.local",
+            "full_name": f"Étudiant {user_id}",
+            "hashed_password": "x",
+            "role": "etudiant",
+            "is_active": True,
+        })
+        preferences.append({
+            "user_id": user_id,
+            "interests": ", ".join(distribution.keywords(rng, faculty, count=rng.randint(1, 3))),
+            "faculty": faculty,
+            "level": distribution.level(rng),
+        })
+        for sujet_id in rng.sample(by_faculty[faculty], min(feedbacks_per_user, len(by_faculty[faculty]))):
+            feedbacks.append({
+                "user_id": user_id,
+                "sujet_id": sujet_id,
+                "rating": rng.randint(1, 5),
+                "pertinence": rng.randint(1, 10),
+                "intéressé": rng.random() < 0.5,
+                "sélectionné": rng.random() < 0.1,
+            })
+
+    # Insertions en Core: pas de hooks ORM (outbox) pendant le chargement
+    with engine.begin() as connection:
+        for table, rows in (
+            (Sujet.__table__, sujets),
+            (User.__table__, users),
+            (UserPreference.__table__, preferences),
+            (Feedback.__table__, feedbacks),
+        ):
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                connection.execute(table.insert(), rows[start:start + INSERT_BATCH_SIZE])
+    engine.dispose()
+    return url
@@ -0,0 +1,43 @@
+# precompute_recommendations.py
+"""
+Mise à jour du modèle collaboratif, précalcul des recommandations personnalisées
+(table user_recommendations), puis purge des anciennes entrées de l'outbox du
+catalog (sujet_changes).
+À planifier chaque nuit, par exemple:
+    0 3 * * * cd /app/backend && python precompute_recommendations.py
+"""
+import argparse
+
+from sqlalchemy.orm import Session
+from app.catalog_events import prune_outbox
+from app.database import SessionLocal
+from app.precompute import PRECOMPUTE_TOP_K, refresh_user_recommendations
+from app.recommendation import recommendation_engine
+
+
+def precompute(full: bool = False, top_k: int = PRECOMPUTE_TOP_K):
+    db: Session = SessionLocal()
+    try:
+        # Modèle collaboratif à jour avant le calcul des bonus
+        recommendation_engine.update_collaborative_model(db)
+        stats = refresh_user_recommendations(db, full=full, top_k=top_k)
+        print(
+            f"✅ Recommandations précalculées: {stats['refreshed']} utilisateurs mis à jour, "
+            f"{stats['skipped']} inchangés, {stats['removed']} supprimés"
+        )
+        pruned = prune_outbox(db)
+        print(f"🧹 Outbox du catalog: {pruned} entrées anciennes supprimées")
+    except Exception as e:
+        db.rollback()
+        print("❌ Erreur précalcul des recommandations:", e)
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Précalcul nocturne des recommandations")
+    parser.add_argument("--full", action="store_true", help="Recalculer tous les utilisateurs")
+    parser.add_argument("--top-k", type=int, default=PRECOMPUTE_TOP_K, help="Recommandations stockées par utilisateur")
+    args = parser.parse_args()
+    precompute(full=args.full, top_k=args.top_k)
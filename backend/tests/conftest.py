@@ -0,0 +1,70 @@
+# tests/conftest.py
+"""
+Base SQLite temporaire pour les tests (DATABASE_URL fixé avant d'importer app).
+PostgreSQL: définir TEST_POSTGRES_URL pour les tests qui en ont besoin.
+"""
+import ast
+import os
+import sys
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="memobot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'tests.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app import search as fulltext
+from app.database import Base, SessionLocal, engine
+from app.models import Sujet
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_fts_schema():
+    """
+    DDL FTS5 de la migration SQLite (create_all ne crée pas les tables virtuelles),
+    lue sans importer alembic
+    """
+    path = os.path.join(_BACKEND_DIR, "alembic", "versions", "6f1a2c8d4b97_add_sujets_fts5.py")
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "SCHEMA" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise RuntimeError(f"SCHEMA introuvable dans {path}")
+
+
+FTS_SCHEMA = _load_fts_schema()
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        for statement in FTS_SCHEMA:
+            connection.exec_driver_sql(statement)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        with engine.begin() as connection:
+            connection.exec_driver_sql("DROP TABLE IF EXISTS sujets_fts")
+        # Disponibilité des moteurs revérifiée sur la base suivante
+        fulltext._features.clear()
+
+
+def make_sujet(**fields) -> Sujet:
+    values = {
+        "titre": "Sujet",
+        "keywords": "",
+        "domaine": "Informatique",
+        "faculté": "Sciences",
+        "niveau": "M2",
+        "problématique": "Problématique",
+        "description": "Description",
+    }
+    values.update(fields)
+    return Sujet(**values)
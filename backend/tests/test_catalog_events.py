@@ -0,0 +1,52 @@
+# tests/test_catalog_events.py
+from app import catalog_events
+from app.models import Sujet, SujetChange
+from tests.conftest import make_sujet
+
+
+class _Recorder:
+    def __init__(self):
+        self.upserted = []
+
+    def upsert_sujet(self, row):
+        self.upserted.append(row["id"])
+
+    def remove_sujet(self, sujet_id):
+        pass
+
+
+def _reset(monkeypatch):
+    monkeypatch.setattr(catalog_events, "_last_outbox_id", None)
+    monkeypatch.setattr(catalog_events, "_seen_outbox_ids", set())
+    monkeypatch.setattr(catalog_events, "_listeners", [])
+
+
+def test_outbox_ids_are_not_kept_before_a_baseline(db, monkeypatch):
+    _reset(monkeypatch)
+    db.add(make_sujet())
+    db.commit()
+    assert catalog_events._seen_outbox_ids == set()
+
+
+def test_sync_replays_an_id_committed_out_of_order(db, monkeypatch):
+    _reset(monkeypatch)
+    early = make_sujet(titre="Premier")
+    late = make_sujet(titre="Second")
+    db.add_all([early, late])
+    db.commit()
+    catalog_events.mark_outbox_position(db)
+    recorder = _Recorder()
+    catalog_events.register_listener(recorder)
+
+    # Un autre worker: id plus grand visible d'abord, id plus petit validé ensuite
+    db.execute(SujetChange.__table__.insert().values(id=1000, sujet_id=late.id, operation="upsert"))
+    db.commit()
+    assert catalog_events.sync_from_outbox(db, force=True) == 1
+    db.execute(SujetChange.__table__.insert().values(id=900, sujet_id=early.id, operation="upsert"))
+    db.commit()
+    assert catalog_events.sync_from_outbox(db, force=True) == 1
+    # Déjà traités: rien à rejouer
+    assert catalog_events.sync_from_outbox(db, force=True) == 0
+
+    assert recorder.upserted == [late.id, early.id]
+    assert catalog_events._last_outbox_id == 1000
@@ -0,0 +1,52 @@
+# tests/test_collaborative.py
+import pytest
+
+from app import recommendation
+from app.collaborative import collaborative_model
+from app.models import Feedback
+from app.recommendation import recommendation_engine
+from tests.conftest import make_sujet
+
+
+def _feedbacks(db):
+    sujets = [make_sujet(titre=f"Sujet {i}") for i in range(3)]
+    db.add_all(sujets)
+    db.commit()
+    for user_id in (1, 2):
+        for sujet in sujets[:2]:
+            db.add(Feedback(user_id=user_id, sujet_id=sujet.id, intéressé=True))
+    db.commit()
+    return sujets
+
+
+def test_request_path_never_rebuilds_the_model(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(collaborative_model, "directory", str(tmp_path))
+    monkeypatch.setattr(collaborative_model, "is_built", False)
+    monkeypatch.setattr(collaborative_model, "last_check", 0.0)
+    scheduled = []
+    monkeypatch.setattr(recommendation_engine, "schedule_collaborative_update", lambda: scheduled.append(True))
+    monkeypatch.setattr(collaborative_model, "refresh", lambda rows: (_ for _ in ()).throw(AssertionError("refresh")))
+    _feedbacks(db)
+
+    recommendation_engine.ensure_collaborative_model(db)
+    assert scheduled == [True]
+    assert not collaborative_model.is_built
+
+
+def test_published_update_is_loaded_by_requests(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(collaborative_model, "directory", str(tmp_path))
+    monkeypatch.setattr(collaborative_model, "is_built", False)
+    monkeypatch.setattr(recommendation, "COLLABORATIVE_REFRESH_INTERVAL", 0.0)
+    sujets = _feedbacks(db)
+
+    assert recommendation_engine.update_collaborative_model(db) == 2
+    assert recommendation_engine.update_collaborative_model(db) == 0
+    assert collaborative_model.latest_version() == collaborative_model.last_feedback_id
+
+    monkeypatch.setattr(collaborative_model, "is_built", False)
+    monkeypatch.setattr(recommendation_engine, "schedule_collaborative_update", lambda: None)
+    model = recommendation_engine.ensure_collaborative_model(db)
+    assert model.is_built
+    [(neighbour, similarity)] = model.similar(sujets[0].id)
+    assert neighbour == sujets[1].id
+    assert similarity == pytest.approx(1.0)
@@ -0,0 +1,40 @@
+# tests/test_keyword_index.py
+import pytest
+
+from app.keyword_index import TITLE_WEIGHT, KeywordIndex, fold_accents, keyword_match, normalize_keyword
+
+
+def test_fold_accents():
+    assert fold_accents("béton armé") == "beton arme"
+    assert fold_accents("Ça génère des données") == "Ca genere des donnees"
+    assert fold_accents("ﬁbre") == "fibre"
+    assert normalize_keyword("  Réseaux-de-Neurones ") == "reseaux de neurones"
+
+
+@pytest.mark.parametrize("interests", [
+    ["béton"],
+    ["beton armé", "génie"],
+    ["apprentissage profond", "xyz"],
+    ["chimie organique"],
+])
+def test_keyword_match_agrees_with_index(interests):
+    keywords = "Béton armé, génie civil, apprentissage automatique"
+    titre = "Chimie organique des liants"
+    index = KeywordIndex()
+    index.build([(1, keywords, titre)])
+
+    assert keyword_match(keywords, interests, titre) == pytest.approx(index.score(interests).get(1, 0.0))
+
+
+def test_title_counts_less_than_keywords():
+    index = KeywordIndex()
+    index.build([(1, "béton", "Étude des ponts"), (2, "ponts", "Étude du béton")])
+
+    scores = index.score(["béton"])
+
+    assert scores[1] == pytest.approx(100.0)
+    assert 0.0 < scores[2] <= 100.0 * TITLE_WEIGHT
+
+
+def test_keyword_match_ignores_weak_similarities():
+    assert keyword_match("génie civil", ["chimie organique"]) == 0.0
@@ -0,0 +1,159 @@
+# tests/test_llm_gateway.py
+import asyncio
+
+import pytest
+
+from app import llm_gateway
+from app.llm_gateway import LLMOverloaded, _Lane
+
+
+@pytest.fixture
+def lane(monkeypatch):
+    """Une place, file de 8 appels, échéance de 1 s"""
+    lane = _Lane("chat", limit=1, queue_size=8, deadline=1.0)
+    monkeypatch.setitem(llm_gateway._lanes, "chat", lane)
+    return lane
+
+
+def _recording(order, name, seconds=0.01):
+    async def factory():
+        order.append(name)
+        await asyncio.sleep(seconds)
+        return name
+    return factory
+
+
+async def _queued(*calls):
+    """Lance les appels dans l'ordre, chacun entré en file avant le suivant"""
+    tasks = []
+    for user_key, factory in calls:
+        tasks.append(asyncio.ensure_future(llm_gateway.call("chat", factory, user_key=user_key)))
+        await asyncio.sleep(0)
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# ======================
+# ÉQUITÉ, FILE, ÉCHÉANCE
+# ======================
+
+def test_free_slots_alternate_between_waiting_users(lane):
+    order = []
+    asyncio.run(_queued(
+        ("lourd", _recording(order, "lourd-1")),
+        ("lourd", _recording(order, "lourd-2")),
+        ("lourd", _recording(order, "lourd-3")),
+        ("leger", _recording(order, "leger-1")),
+    ))
+    # L'utilisateur léger passe avant le troisième appel de l'utilisateur lourd
+    assert order == ["lourd-1", "lourd-2", "leger-1", "lourd-3"]
+    assert lane.active == 0 and lane.queued == 0
+
+
+def test_full_queue_is_rejected_with_retry_after(lane):
+    lane.queue_size = 1
+    order = []
+    results = asyncio.run(_queued(
+        ("a", _recording(order, "a")),
+        ("b", _recording(order, "b")),
+        ("c", _recording(order, "c")),
+    ))
+    assert results[:2] == ["a", "b"]
+    assert isinstance(results[2], LLMOverloaded)
+    assert results[2].reason == "queue_full"
+    assert results[2].retry_after >= 1
+    assert lane.stats()["shed"] == 1
+
+
+def test_per_user_queue_cap(lane, monkeypatch):
+    monkeypatch.setattr(llm_gateway, "LLM_QUEUE_PER_USER", 1)
+    order = []
+    results = asyncio.run(_queued(
+        ("a", _recording(order, "a-1")),
+        ("a", _recording(order, "a-2")),
+        ("a", _recording(order, "a-3")),
+        ("b", _recording(order, "b-1")),
+    ))
+    assert isinstance(results[2], LLMOverloaded) and results[2].reason == "user_queue_full"
+    assert order == ["a-1", "a-2", "b-1"]
+
+
+def test_deadline_in_queue_releases_the_waiting_place(lane):
+    order = []
+
+    async def run():
+        first = asyncio.ensure_future(llm_gateway.call("chat", _recording(order, "a", seconds=0.2), user_key="a"))
+        await asyncio.sleep(0)
+        # Échéance courte pour l'appel en file seulement
+        lane.deadline = 0.05
+        second = asyncio.ensure_future(llm_gateway.call("chat", _recording(order, "b"), user_key="b"))
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[0] == "a"
+    assert isinstance(results[1], LLMOverloaded) and results[1].reason == "deadline"
+    assert order == ["a"]
+    assert lane.active == 0 and lane.queued == 0 and lane.expired == 1
+
+
+def test_deadline_during_call_releases_the_slot(lane):
+    lane.deadline = 0.05
+    order = []
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await llm_gateway.call("chat", _recording(order, "lent", seconds=1.0), user_key="a")
+        assert lane.active == 0
+        return await llm_gateway.call("chat", _recording(order, "suivant"), user_key="b")
+
+    assert asyncio.run(run()) == "suivant"
+    assert order == ["lent", "suivant"]
+    assert lane.failed == 1 and lane.completed == 1
+
+
+# ======================
+# SINGLE-FLIGHT
+# ======================
+
+def test_identical_prompts_share_one_upstream_call(lane):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "réponse"
+
+    async def run():
+        return await asyncio.gather(*[
+            llm_gateway.call("chat", factory, user_key=f"u{i}", key="prompt") for i in range(5)
+        ])
+
+    assert asyncio.run(run()) == ["réponse"] * 5
+    assert len(calls) == 1
+    assert lane.stats()["single_flight"] == {"flights": 1, "coalesced": 4, "inflight": 0}
+
+
+def test_cancelled_waiter_leaves_the_shared_call_running(lane):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "réponse"
+
+    async def run():
+        first = asyncio.ensure_future(llm_gateway.call("chat", factory, user_key="a", key="prompt"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(llm_gateway.call("chat", factory, user_key="b", key="prompt"))
+        await asyncio.sleep(0.01)
+        shared = lane._inflight["prompt"]
+        first.cancel()
+        result = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return shared, result
+
+    shared, result = asyncio.run(run())
+    assert result == "réponse"
+    assert shared.done() and not shared.cancelled()
+    assert len(calls) == 1
+    assert lane.active == 0 and lane._inflight == {}
@@ -0,0 +1,63 @@
+# tests/test_pagination.py
+from app import crud
+from app.models import Feedback, User
+from tests.conftest import make_sujet
+
+
+def _cursor_pages(fetch, limit=3):
+    ids, cursor = [], None
+    while True:
+        items, cursor = fetch(cursor, limit)
+        ids.extend(item.id for item in items)
+        if cursor is None:
+            return ids
+
+
+def test_sujet_listing_keeps_ascending_order_in_both_modes(db):
+    db.add_all([make_sujet(titre=f"Sujet {i}") for i in range(10)])
+    db.commit()
+
+    offset_ids = [s.id for skip in range(0, 10, 3) for s in crud.get_sujets(db, skip=skip, limit=3)]
+    cursor_ids = _cursor_pages(lambda cursor, limit: crud.get_sujets_page(db, cursor=cursor, limit=limit))
+
+    assert offset_ids == sorted(offset_ids)
+    assert cursor_ids == offset_ids
+
+
+def test_user_listing_keeps_ascending_order_in_both_modes(db):
+    db.add_all([
+        User(email=f"etudiant{i}@example.com", full_name=f"Étudiant {i}", hashed_password="x")
+        for i in range(7)
+    ])
+    db.commit()
+
+    offset_ids = [u.id for skip in range(0, 7, 3) for u in crud.get_users(db, skip=skip, limit=3)]
+    cursor_ids = _cursor_pages(lambda cursor, limit: crud.get_users_page(db, cursor=cursor, limit=limit))
+
+    assert offset_ids == sorted(offset_ids)
+    assert cursor_ids == offset_ids
+
+
+def test_user_feedbacks_keep_ascending_order_in_both_modes(db):
+    etudiant = User(email="etudiant@example.com", full_name="Étudiant", hashed_password="x")
+    autre = User(email="autre@example.com", full_name="Autre", hashed_password="x")
+    sujet = make_sujet()
+    db.add_all([etudiant, autre, sujet])
+    db.commit()
+    db.add_all([
+        Feedback(user_id=(etudiant if i % 3 else autre).id, sujet_id=sujet.id, rating=1 + i % 5)
+        for i in range(12)
+    ])
+    db.commit()
+
+    offset_ids = [
+        f.id for skip in range(0, 8, 3)
+        for f in crud.get_user_feedbacks(db, etudiant.id, skip=skip, limit=3)
+    ]
+    cursor_ids = _cursor_pages(
+        lambda cursor, limit: crud.get_user_feedbacks_page(db, etudiant.id, cursor=cursor, limit=limit)
+    )
+
+    assert len(offset_ids) == 8
+    assert offset_ids == sorted(offset_ids)
+    assert cursor_ids == offset_ids
@@ -0,0 +1,51 @@
+# tests/test_recommendation.py
+from app.catalog_matrix import catalog_matrix
+from app.keyword_index import keyword_index
+from app.recommendation import RETRIEVAL_REASON, recommendation_cache, recommendation_engine
+from app.vocabulary import vocabulary
+from tests.conftest import make_sujet
+
+
+def _summary(recommendations):
+    return [(rec["sujet"].id, rec["score"], tuple(rec["raisons"])) for rec in recommendations]
+
+
+def test_batch_ranks_like_the_live_path(db, monkeypatch):
+    for structure in (catalog_matrix, keyword_index, vocabulary):
+        monkeypatch.setattr(structure, "is_built", False)
+    recommendation_cache.clear()
+    db.add_all([
+        make_sujet(titre="Béton fibré", keywords="béton, matériaux", niveau="M2", faculté="Sciences"),
+        make_sujet(titre="Ponts en béton armé", keywords="génie civil", niveau="M2", faculté="Sciences"),
+        make_sujet(titre="Chaîne logistique", keywords="logistique", niveau="M2", faculté="Sciences"),
+        make_sujet(titre="Réseaux de capteurs", keywords="iot, réseaux", niveau="L3", faculté="Sciences"),
+    ])
+    db.commit()
+    profile = {"interests": ["béton"], "niveau": "M2", "faculté": "Sciences", "domaine": None, "difficulté": None}
+
+    live = recommendation_engine.recommend_sujets(db, profile["interests"], niveau="M2", faculté="Sciences", limit=3)
+    [(index, batch)] = list(recommendation_engine.iter_batch_recommendations(db, [profile], limit=3))
+
+    assert index == 0
+    assert _summary(batch) == _summary(live)
+    # Le titre "Ponts en béton armé" n'est trouvé que par la recherche plein texte
+    assert any(RETRIEVAL_REASON in reasons for _, _, reasons in _summary(batch))
+
+
+def test_vectorized_scores_titles_like_the_index(db, monkeypatch):
+    for structure in (catalog_matrix, keyword_index, vocabulary):
+        monkeypatch.setattr(structure, "is_built", False)
+    db.add_all([
+        make_sujet(titre="Béton fibré", keywords="matériaux", niveau="M2"),
+        make_sujet(titre="Chaîne logistique", keywords="béton", niveau="M2"),
+        make_sujet(titre="Réseaux de capteurs", keywords="iot", niveau="M2"),
+    ])
+    db.commit()
+    options = dict(niveau="M2", limit=3, bonus={}, related={})
+
+    vectorized = recommendation_engine.recommend_sujets_vectorized(db, ["béton"], **options)
+    indexed = recommendation_engine.recommend_sujets_indexed(db, ["béton"], **options)
+
+    assert _summary(vectorized) == _summary(indexed)
+    # Mot-clé exact devant le titre, qui compte quand même
+    assert [rec["sujet"].titre for rec in vectorized] == ["Chaîne logistique", "Béton fibré"]
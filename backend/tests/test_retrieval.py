@@ -0,0 +1,42 @@
+# tests/test_retrieval.py
+from app import recommendation, retrieval
+from app.catalog_matrix import NUMPY_AVAILABLE, catalog_matrix
+from app.keyword_index import keyword_index
+from app.recommendation import RETRIEVAL_REASON, recommendation_cache, recommendation_engine
+from tests.conftest import make_sujet
+
+
+def test_vector_where_status_only_filters_catalog_documents():
+    where = retrieval.vector_where({"domaine": "Informatique"})
+    assert where == {"$and": [
+        {"domaine": "Informatique"},
+        {"$or": [{"source": {"$ne": retrieval.CATALOG_SOURCE}}, {"is_active": True}]},
+    ]}
+    assert retrieval.vector_where({}, is_active=None) is None
+
+
+def _recommend_with_related(db, monkeypatch, vectorized):
+    monkeypatch.setattr(recommendation, "NUMPY_AVAILABLE", vectorized)
+    catalog_matrix.is_built = False
+    keyword_index.is_built = False
+    recommendation_cache.clear()
+    plain = make_sujet(titre="Gestion de stock", keywords="logistique", niveau="M2", faculté="Sciences")
+    related = make_sujet(titre="Entrepôts connectés", keywords="iot", niveau="M2", faculté="Sciences")
+    db.add_all([plain, related])
+    db.commit()
+    monkeypatch.setattr(retrieval, "hybrid_sujet_ids", lambda db, texts, limit=50, **filters: [related.id])
+
+    results = recommendation_engine.recommend_sujets(db, ["chaîne logistique"], niveau="M2", faculté="Sciences")
+    by_id = {result["sujet"].id: result for result in results}
+    return by_id[related.id], by_id.get(plain.id)
+
+
+def test_hybrid_retrieval_bonus_in_vectorized_path(db, monkeypatch):
+    assert NUMPY_AVAILABLE
+    related, _ = _recommend_with_related(db, monkeypatch, vectorized=True)
+    assert RETRIEVAL_REASON in related["raisons"]
+
+
+def test_hybrid_retrieval_bonus_in_indexed_path(db, monkeypatch):
+    related, _ = _recommend_with_related(db, monkeypatch, vectorized=False)
+    assert RETRIEVAL_REASON in related["raisons"]
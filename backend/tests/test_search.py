@@ -0,0 +1,134 @@
+# tests/test_search.py
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from app import crud
+from app import search as fulltext
+from app.bm25 import bm25_index
+from app.models import Sujet
+from tests.conftest import make_sujet
+
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def _catalog(db, count=60):
+    """Sujets de pertinences variées pour "béton" (beaucoup d'égalités de score)"""
+    for i in range(count):
+        db.add(make_sujet(
+            titre=f"Sujet {i} " + "béton " * (i % 4),
+            keywords="béton, génie civil" if i % 3 else "génie civil",
+            description="Étude du béton armé" if i % 2 else "Étude des structures",
+        ))
+    db.commit()
+
+
+def _all_pages(db, search, limit=7):
+    ids, cursor = [], None
+    while True:
+        sujets, cursor = crud.get_sujets_page(db, cursor=cursor, limit=limit, search=search)
+        ids.extend(sujet.id for sujet in sujets)
+        if cursor is None:
+            return ids
+
+
+def _expected_ids(db, search):
+    query, _ = crud._sujets_query(db, search=search)
+    return {sujet.id for sujet in query.all()}
+
+
+@pytest.mark.parametrize("backend", ["sqlite_fts", "bm25"])
+def test_ranked_cursor_pages_each_id_once(db, monkeypatch, backend):
+    monkeypatch.setattr(fulltext, "SEARCH_BACKEND", backend)
+    bm25_index.is_built = False
+    _catalog(db)
+
+    ids = _all_pages(db, "béton")
+
+    assert len(ids) == len(set(ids))
+    assert set(ids) == _expected_ids(db, "béton")
+
+
+def test_sqlite_fts_follows_indexed_column_updates(db, monkeypatch):
+    monkeypatch.setattr(fulltext, "SEARCH_BACKEND", "sqlite_fts")
+    sujet = make_sujet(titre="Ponts en béton", keywords="génie civil")
+    db.add(sujet)
+    db.commit()
+
+    sujet.vue_count = 5
+    db.commit()
+    assert _expected_ids(db, "béton") == {sujet.id}
+
+    sujet.titre = "Ponts métalliques"
+    db.commit()
+    assert _expected_ids(db, "béton") == set()
+    assert _expected_ids(db, "métalliques") == {sujet.id}
+
+
+@pytest.mark.parametrize("numpy_available", [True, False])
+def test_bm25_cursor_pages_past_the_result_cap(db, monkeypatch, numpy_available):
+    monkeypatch.setattr(fulltext, "SEARCH_BACKEND", "bm25")
+    monkeypatch.setattr(fulltext, "BM25_MAX_RESULTS", 5)
+    monkeypatch.setattr("app.bm25.NUMPY_AVAILABLE", numpy_available)
+    bm25_index.is_built = False
+    _catalog(db)
+
+    ids = _all_pages(db, "béton")
+
+    assert len(ids) == len(set(ids))
+    monkeypatch.setattr(fulltext, "BM25_MAX_RESULTS", 1000)
+    assert set(ids) == _expected_ids(db, "béton")
+
+
+def test_postgres_rank_key_is_double_precision():
+    query = sessionmaker()().query(Sujet)
+    _, rank = fulltext.PostgresBackend()._filter(query, fulltext.PostgresBackend.text_query("béton"))
+    sql = str(rank.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("CAST(ts_rank_cd(") and sql.endswith("AS FLOAT(53))")
+
+
+def test_trigram_similarity_key_is_double_precision():
+    class _Db:
+        def execute(self, *args, **kwargs):
+            pass
+
+    query = sessionmaker()().query(Sujet)
+    _, similarity = fulltext.trigram_search(_Db(), query, "beton")
+    sql = str(similarity.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("CAST(greatest(word_similarity(") and sql.endswith("AS FLOAT(53))")
+
+
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL non défini (base migrée)")
+def test_postgres_ranked_cursor_pages_each_id_once(monkeypatch):
+    monkeypatch.setattr(fulltext, "SEARCH_BACKEND", "postgres")
+    session = sessionmaker(bind=create_engine(TEST_POSTGRES_URL))()
+    try:
+        _catalog(session)
+        ids = _all_pages(session, "béton")
+        assert len(ids) == len(set(ids))
+        assert set(ids) == _expected_ids(session, "béton")
+    finally:
+        session.rollback()
+        session.query(Sujet).filter(Sujet.titre.like("Sujet %")).delete(synchronize_session=False)
+        session.commit()
+        session.close()
+
+
+def test_facet_counts_ignore_their_own_filter(db):
+    db.add_all(
+        [make_sujet(domaine="Informatique", niveau="M2") for _ in range(3)]
+        + [make_sujet(domaine="Physique", niveau="M1") for _ in range(2)]
+        + [make_sujet(domaine="Informatique", niveau="M1")]
+    )
+    db.commit()
+
+    result = crud.get_sujet_facets(db, domaine="Informatique", niveau="M1")
+
+    counts = {field: {v["value"]: v["count"] for v in values} for field, values in result["facets"].items()}
+    assert result["total"] == 1
+    assert counts["domaine"] == {"Informatique": 1, "Physique": 2}
+    assert counts["niveau"] == {"M2": 3, "M1": 1}
+    assert counts["faculté"] == {"Sciences": 1}
@@ -0,0 +1,44 @@
+# tests/test_suggest.py
+from app import suggest
+from app.suggest import SuggestIndex, suggest_index
+from tests.conftest import make_sujet
+
+
+def _labels(index, prefix):
+    return [label for _, label, _, _ in index.suggest(prefix, 3)]
+
+
+def test_reweight_reorders_cached_prefixes(monkeypatch):
+    monkeypatch.setattr(suggest, "SCAN_LIMIT", 2)
+    index = SuggestIndex()
+    index.build([
+        (1, "Compilation", "", 10, 0),
+        (2, "Compression", "", 5, 0),
+        (3, "Comptabilité", "", 1, 0),
+        (4, "Commerce", "", 0, 0),
+    ])
+    assert _labels(index, "co") == ["Compilation", "Compression", "Comptabilité"]
+
+    assert index.reweight([(1, 10, 0), (3, 0, 10), (2, 0, 0)]) == 2
+    assert _labels(index, "co") == ["Comptabilité", "Compilation", "Commerce"]
+
+
+def test_counter_writes_reach_suggestions(db, monkeypatch):
+    monkeypatch.setattr(suggest_index, "is_built", False)
+    monkeypatch.setattr(suggest, "REWEIGHT_INTERVAL", 0.0)
+    scheduled = []
+    monkeypatch.setattr(suggest, "schedule_reweight", lambda: scheduled.append(True))
+    populaire = make_sujet(titre="Réseaux de capteurs", vue_count=50)
+    discret = make_sujet(titre="Réseaux de neurones", vue_count=1)
+    db.add_all([populaire, discret])
+    db.commit()
+    assert _labels(suggest.ensure_suggest_index(db), "reseaux")[0] == "Réseaux de capteurs"
+
+    discret.like_count = 100
+    db.commit()
+    # La requête sert les poids actuels et confie la relecture au thread de fond
+    assert _labels(suggest.ensure_suggest_index(db), "reseaux")[0] == "Réseaux de capteurs"
+    assert scheduled
+
+    assert suggest.reweight_from_db(db) == 1
+    assert _labels(suggest_index, "reseaux")[0] == "Réseaux de neurones"
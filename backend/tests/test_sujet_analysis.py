@@ -0,0 +1,53 @@
+# tests/test_sujet_analysis.py
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from app import llm_service, sujet_analysis
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.main import app
+from app.models import Sujet
+from tests.conftest import make_sujet
+
+
+def _ready(db, sujet):
+    entry = sujet_analysis._entry(
+        sujet_analysis.READY, sujet_analysis.content_hash(sujet),
+        llm_service.get_analysis_version(), {"resume": "Analyse"}
+    )
+    sujet_analysis._save(db, sujet, entry)
+
+
+def test_saving_analysis_keeps_updated_at(db):
+    updated_at = datetime(2024, 1, 15, 10, 30)
+    sujet = make_sujet(updated_at=updated_at)
+    db.add(sujet)
+    db.commit()
+
+    _ready(db, sujet)
+    db.expire_all()
+    stored = db.query(Sujet).filter(Sujet.id == sujet.id).one()
+    assert stored.updated_at.replace(tzinfo=None) == updated_at
+    assert sujet_analysis.stored_analysis(stored) == ({"resume": "Analyse"}, sujet_analysis.READY)
+
+
+def test_get_sujet_does_not_expose_raw_analysis(db):
+    sujet = make_sujet()
+    db.add(sujet)
+    db.commit()
+    _ready(db, sujet)
+
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1)
+    try:
+        response = TestClient(app).get(f"/api/v1/sujets/{sujet.id}")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["analyse"] == {"resume": "Analyse"}
+    assert body["sujet"]["id"] == sujet.id
+    assert "ai_analysis" not in body["sujet"]
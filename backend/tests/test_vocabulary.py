@@ -0,0 +1,67 @@
+# tests/test_vocabulary.py
+from app.recommendation import recommendation_engine
+from app.vocabulary import SymSpell, Vocabulary, edit_distance, vocabulary
+from tests.conftest import make_sujet
+
+
+def _vocabulary():
+    vocab = Vocabulary()
+    vocab.build([
+        (1, "Béton armé, génie civil"),
+        (2, "béton, Matériaux"),
+        (3, "Réseaux de neurones, apprentissage automatique"),
+        (4, "réseaux de neurones, vision"),
+    ])
+    return vocab
+
+
+def test_symspell_lookup_orders_by_distance_then_count():
+    terms = SymSpell()
+    for term, count in (("beton", 3), ("bidon", 1), ("baton", 1)):
+        terms.add(term, count)
+
+    assert terms.lookup("beton")[0] == ("beton", 0, 3)
+    assert [term for term, _, _ in terms.lookup("betton", 1)] == ["beton"]
+    assert [(term, distance) for term, distance, _ in terms.lookup("bton", 1)] == [("beton", 1), ("baton", 1)]
+
+
+def test_transpositions_count_as_one_edit():
+    assert edit_distance("reseau", "resaeu", 2) == 1
+    assert edit_distance("beton", "betno", 1) == 1
+    assert edit_distance("beton", "materiaux", 2) == 3
+
+
+def test_correct_ignores_accents_and_fixes_typos():
+    vocab = _vocabulary()
+    assert vocab.correct("BÉTON") == "beton"
+    assert vocab.correct("betton") == "beton"
+    assert vocab.correct("beton arme") == "beton arme"
+    assert vocab.correct("réseaux de nuerones") == "reseaux de neurones"
+    assert vocab.surface("reseaux de neurones") == "Réseaux de neurones"
+
+
+def test_correct_falls_back_to_tokens():
+    vocab = _vocabulary()
+    # Pas de mot-clé proche de la phrase entière: chaque token est corrigé
+    assert vocab.correct("vision materiuax") == "vision materiaux"
+    assert vocab.correct("ia") is None
+    assert vocab.correct("cryptographie") is None
+
+
+def test_removed_keywords_are_no_longer_suggested():
+    vocab = _vocabulary()
+    vocab.remove_sujet(2)
+    assert vocab.correct("materiaux") is None
+    assert vocab.correct("betton") == "beton"
+
+
+def test_correct_interests_uses_catalog_keywords(db, monkeypatch):
+    monkeypatch.setattr(vocabulary, "is_built", False)
+    db.add_all([
+        make_sujet(keywords="béton, génie civil"),
+        make_sujet(keywords="réseaux de neurones"),
+    ])
+    db.commit()
+
+    corrected = recommendation_engine.correct_interests(db, ["betton", "Réseaux de neurons", "cryptographie"])
+    assert corrected == ["beton", "reseaux de neurones", "cryptographie"]